@@ -2,7 +2,6 @@ import json
 import logging
 import os.path
 import re
-import time
 from typing import Optional, List
 
 import requests
@@ -247,8 +246,6 @@ def get_alpha_desc_related_info(session: AutoLoginSession, alpha:str, alpha_name
     field_desc = field_info.get('description')
     dataset = field_info.get('dataset')
 
-    time.sleep(3)  # 请求失败，状态码: 429 "message":"API rate limit exceeded"
-
     dataset_info = get_data_by_url(session, dataset_url, dataset.get('id'))
     dataset_desc = dataset_info.get('description')
     dataset.update({'description': dataset_desc})
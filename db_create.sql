@@ -29,8 +29,20 @@ CREATE TABLE `all_alphas` (
   `train_short` smallint(6) DEFAULT NULL,
   `test_long` smallint(6) DEFAULT NULL,
   `test_short` smallint(6) DEFAULT NULL,
+  `claim_token` varchar(32) DEFAULT NULL,
+  `lease_expires_at` datetime DEFAULT NULL,
+  `priority` float DEFAULT 0,
+  `score` float GENERATED ALWAYS AS (ABS(`sharp` * `fitness`)) STORED,
   PRIMARY KEY (`id`),
-  UNIQUE KEY `idx_unique_fields` (`region`, `delay`, `universe`, `neutralization`, `decay`, `alpha`) BLOCK_SIZE 16384 LOCAL
+  UNIQUE KEY `idx_unique_fields` (`region`, `delay`, `universe`, `neutralization`, `decay`, `alpha`) BLOCK_SIZE 16384 LOCAL,
+  KEY `idx_claim_token` (`claim_token`) BLOCK_SIZE 16384 LOCAL,
+  KEY `idx_simulated_priority` (`simulated`, `priority`) BLOCK_SIZE 16384 LOCAL,
+  KEY `idx_alpha_id` (`alpha_id`) BLOCK_SIZE 16384 LOCAL,
+  KEY `idx_claim_queue` (`simulated`, `phase`, `universe`, `delay`, `priority`) BLOCK_SIZE 16384 LOCAL,
+  KEY `idx_simulate_id` (`simulate_id`) BLOCK_SIZE 16384 LOCAL,
+  KEY `idx_passed_submitted` (`passed`, `submitted`, `universe`, `delay`, `phase`, `score`) BLOCK_SIZE 16384 LOCAL,
+  KEY `idx_dataset` (`dataset`, `universe`, `delay`, `phase`, `category`, `simulated`) BLOCK_SIZE 16384 LOCAL,
+  KEY `idx_universe_score` (`universe`, `delay`, `score`) BLOCK_SIZE 16384 LOCAL
 ) ORGANIZATION INDEX AUTO_INCREMENT = 3964 AUTO_INCREMENT_MODE = 'ORDER' DEFAULT CHARSET = utf8mb4 ROW_FORMAT = DYNAMIC COMPRESSION = 'zstd_1.3.8' REPLICA_NUM = 2 BLOCK_SIZE = 16384 USE_BLOOM_FILTER = FALSE ENABLE_MACRO_BLOCK_BLOOM_FILTER = FALSE TABLET_SIZE = 134217728 PCTFREE = 0;
 
 
@@ -44,4 +56,132 @@ CREATE TABLE `dataset_used` (
   `template` varchar(32) DEFAULT NULL,
   PRIMARY KEY (`id`),
   UNIQUE KEY `idx_unique_fields` (`region`, `universe`, `delay`, `dataset`, `template`)
-)
\ No newline at end of file
+);
+
+-- 回测记录表的版本化迁移记录：已有的 all_alphas 及各地区 xxx_alphas 表的字段与索引变更(认领租约、优先级、
+-- score 生成列、热点查询索引等)由 svc/migrations.py 按版本执行：brain-lit-migrate [表名 ...]，
+-- brain-lit-migrate --explain 检查热点查询是否退化为全表扫描
+CREATE TABLE `schema_migrations` (
+  `table_name` varchar(64) NOT NULL,
+  `version` int(11) NOT NULL,
+  `description` varchar(255) DEFAULT NULL,
+  `applied_at` datetime DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`table_name`, `version`)
+);
+
+
+-- 回测日志：记录已提交、尚未结束的回测，重启后据此继续查询进度
+CREATE TABLE `simulation_journal` (
+  `simulate_id` varchar(32) NOT NULL,
+  `task_id` varchar(32) DEFAULT NULL,
+  `region` varchar(3) DEFAULT NULL,
+  `table_name` varchar(32) DEFAULT NULL,
+  `query` json DEFAULT NULL,
+  `alpha_ids` json DEFAULT NULL,
+  `start_time` double DEFAULT NULL,
+  `account` varchar(64) DEFAULT NULL,
+  `status` varchar(16) DEFAULT 'RUNNING',
+  `claim_token` varchar(32) DEFAULT NULL,
+  `lease_expires_at` datetime DEFAULT NULL,
+  `created_at` datetime DEFAULT CURRENT_TIMESTAMP,
+  `updated_at` datetime DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`simulate_id`),
+  KEY `idx_status_claim` (`status`, `claim_token`)
+);
+
+-- 回测日志的提交账号字段(已有的 simulation_journal 表需执行)
+-- ALTER TABLE `simulation_journal` ADD COLUMN `account` varchar(64) DEFAULT NULL AFTER `start_time`;
+
+
+-- 流水线任务队列：页面提交任务，独立的 worker 进程(brain-lit-worker)认领执行
+CREATE TABLE `pipeline_jobs` (
+  `id` bigint(20) NOT NULL AUTO_INCREMENT,
+  `stage` varchar(16) NOT NULL,
+  `region` varchar(3) DEFAULT NULL,
+  `payload` json DEFAULT NULL,
+  `status` varchar(16) DEFAULT 'PENDING',
+  `progress` json DEFAULT NULL,
+  `worker` varchar(32) DEFAULT NULL,
+  `claim_token` varchar(32) DEFAULT NULL,
+  `lease_expires_at` datetime DEFAULT NULL,
+  `created_at` datetime DEFAULT CURRENT_TIMESTAMP,
+  `updated_at` datetime DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`id`),
+  KEY `idx_stage_status` (`stage`, `status`)
+);
+
+
+-- 回测结果缓存：键为规范化表达式与回测设置的哈希，相同表达式与设置的记录直接使用已有结果
+CREATE TABLE `simulation_cache` (
+  `cache_key` char(40) NOT NULL,
+  `result` json DEFAULT NULL,
+  `created_at` datetime DEFAULT CURRENT_TIMESTAMP,
+  `updated_at` datetime DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`cache_key`)
+);
+
+
+-- 检查结果缓存：每个Alpha最近一次的检查项(不含提交数量)与检查时的提交数量上下文，过期或提交了新的Alpha后重新检查
+CREATE TABLE `check_cache` (
+  `alpha_id` varchar(32) NOT NULL,
+  `checks` json DEFAULT NULL,
+  `submission_context` json DEFAULT NULL,
+  `checked_at` datetime DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`alpha_id`),
+  KEY `idx_checked_at` (`checked_at`)
+);
+
+
+-- 已提交Alpha：从平台增量同步(按提交时间高水位)，供检查与提交逻辑读取
+CREATE TABLE `submitted_alphas` (
+  `alpha_id` varchar(32) NOT NULL,
+  `region` varchar(3) DEFAULT NULL,
+  `universe` varchar(16) DEFAULT NULL,
+  `delay` tinyint(4) DEFAULT NULL,
+  `name` varchar(255) DEFAULT NULL,
+  `alpha` text,
+  `sharp` float DEFAULT NULL,
+  `fitness` float DEFAULT NULL,
+  `date_submitted` datetime DEFAULT NULL,
+  `data` json DEFAULT NULL,
+  `created_at` datetime DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`alpha_id`),
+  KEY `idx_region_date` (`region`, `date_submitted`),
+  KEY `idx_date_submitted` (`date_submitted`)
+);
+
+
+-- 分组最优Alpha：每个 (region, universe, delay, phase, neutralization, name, template) 中 abs(sharp*fitness) 最高的回测记录，
+-- 写入回测结果时增量维护；检查页面按阶段/neutralization筛选后再取每个 (region, universe, delay, name, template) 分组的最优记录，
+-- 不再对整张回测记录表执行 ROW_NUMBER() 窗口查询；已有数据需调用 svc.alpha_ranking.rebuild_alpha_rankings(表名) 初始化
+CREATE TABLE `alpha_rankings` (
+  `table_name` varchar(32) NOT NULL,
+  `region` varchar(3) NOT NULL,
+  `universe` varchar(32) NOT NULL,
+  `delay` tinyint(4) NOT NULL,
+  `phase` int(11) NOT NULL DEFAULT 0,
+  `neutralization` varchar(32) NOT NULL DEFAULT '',
+  `name` varchar(128) NOT NULL DEFAULT '',
+  `template` varchar(32) NOT NULL DEFAULT '',
+  `alpha_row_id` int(11) NOT NULL,
+  `score` float NOT NULL DEFAULT 0,
+  `updated_at` datetime DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`table_name`, `region`, `universe`, `delay`, `phase`, `neutralization`, `name`, `template`),
+  KEY `idx_table_score` (`table_name`, `region`, `universe`, `delay`, `score`)
+);
+
+
+-- 回测状态计数：按 (region, universe, delay, phase, category, simulated) 预聚合的记录数，
+-- 插入记录与回测状态变化时维护，回测统计直接读取；已有数据需调用 svc.simulation_stats.rebuild_simulation_stats(表名) 初始化
+CREATE TABLE `simulation_stats` (
+  `table_name` varchar(32) NOT NULL,
+  `region` varchar(3) NOT NULL,
+  `universe` varchar(32) NOT NULL,
+  `delay` tinyint(4) NOT NULL,
+  `phase` int(11) NOT NULL,
+  `category` varchar(32) NOT NULL,
+  `simulated` tinyint(4) NOT NULL,
+  `count` bigint(20) NOT NULL DEFAULT 0,
+  `updated_at` datetime DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`table_name`, `region`, `universe`, `delay`, `phase`, `category`, `simulated`)
+);
@@ -1,4 +1,4 @@
-from svc.database import get_db_connection
+from svc.database import db_connection
 from svc.logger import setup_logger
 
 logger = setup_logger(__name__)
@@ -152,42 +152,37 @@ def get_phase1_alphas(region, delay, sharp=1.0, fitness=0.7):
         table_name = f"{region.lower()}_alphas"
 
     try:
-        connection = get_db_connection()
-        if not connection:
-            return []
-
-        cursor = connection.cursor(dictionary=True)
-
-        # 构建查询语句
-        base_query = f"""
-        WITH ranked_alphas AS (
-            SELECT *,
-                   ROW_NUMBER() OVER (
-                       PARTITION BY region, universe, delay, name, template
-                       ORDER BY abs(sharp*fitness) DESC
-                   ) AS rn
-            FROM {table_name}  
-            WHERE delay=%s AND used=1 AND passed=1 AND sharp >= %s AND fitness >= %s
-        """
-
-        params = [delay, sharp, fitness]
-
-        base_query += """
-        )
-        SELECT * FROM ranked_alphas 
-        WHERE rn = 1 AND used=1
-        ORDER BY abs(sharp*fitness) DESC 
-        LIMIT 50
-        """
-
-        cursor.execute(base_query, tuple(params))
-        # logger.info('query_checkable_alpha_details SQL: %s', cursor.statement)
-        results = cursor.fetchall()
-
-        cursor.close()
-        connection.close()
-
-        return results
+        with db_connection() as connection:
+            cursor = connection.cursor(dictionary=True)
+
+            # 构建查询语句：按条件筛选后取每个分组 abs(sharp*fitness) 最高的记录。
+            # passed、sharp 等条件需在取分组最优之前筛选，分组最优Alpha表(svc.alpha_ranking)无法满足，仍使用窗口查询
+            base_query = f"""
+            WITH ranked_alphas AS (
+                SELECT *,
+                       ROW_NUMBER() OVER (
+                           PARTITION BY region, universe, delay, name, template
+                           ORDER BY score DESC
+                       ) AS rn
+                FROM {table_name}
+                WHERE delay=%s AND used=1 AND passed=1 AND sharp >= %s AND fitness >= %s
+            )
+            SELECT * FROM ranked_alphas
+            WHERE rn = 1 AND used=1
+            ORDER BY score DESC
+            LIMIT 50
+            """
+
+            params = [delay, sharp, fitness]
+
+            cursor.execute(base_query, tuple(params))
+            # logger.info('query_checkable_alpha_details SQL: %s', cursor.statement)
+            results = cursor.fetchall()
+
+            cursor.close()
+
+            return results
+
     except Exception as e:
         logger.error(f"查询可检查Alpha详情时出错: {e}")
         return []
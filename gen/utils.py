@@ -1,6 +1,15 @@
 import streamlit as st
 
-from svc.database import insert_record, batch_insert_records
+from gen.phase2_gen import get_group_second_order_factory
+from gen.phase3_gen import trade_when_factory
+from svc.database import insert_record, bulk_insert_records
+from svc.simulation_stats import refresh_simulation_stats, stats_group_key
+from svc.priority import compute_priority
+
+# 生成二阶Alpha时使用的分组算子
+GROUP_OPS = ["group_neutralize", "group_rank", "group_zscore"]
+# 生成高一阶记录时从低阶记录继承的字段；回测结果、认领租约及生成列(score)等不复制
+NEXT_LEVEL_INHERITED_FIELDS = ("region", "universe", "delay", "category", "dataset", "name", "neutralization", "decay")
 
 
 def build_alpha_record(
@@ -11,7 +20,7 @@ def build_alpha_record(
         phase=1,
         template="sentiment_gen"
 ):
-    return {
+    record = {
         "region": region,
         "universe": universe,
         "delay": delay,
@@ -26,9 +35,30 @@ def build_alpha_record(
         'used': 0,
         "template": template,
     }
+    record['priority'] = compute_priority(record)
+    return record
+
+
+def insert_progress_callback(total=None):
+    """
+    显示数据保存进度，返回用于 bulk_insert_records 的 on_progress 回调
+
+    Args:
+        total: 待保存的记录数，为None(如记录为迭代器)时只显示已保存的行数
+    """
+    progress_bar = st.progress(0, text="数据保存进度：0.00%" if total else "已保存 0 条")
+
+    def update_progress(result):
+        if total:
+            progress = min(result['rows'] / total, 1.0)
+            progress_bar.progress(progress, text=f"数据保存进度: {progress:.2%}")
+        else:
+            progress_bar.progress(0, text=f"已保存 {result['rows']} 条")
+
+    return update_progress
 
 
-def save_records_to_db(region, universe, delay, dataset, new_alphas, template="sentiment_gen"):
+def save_records_to_db(region, universe, delay, dataset, new_alphas, template="sentiment_gen", total=None):
     # 准备dataset_used表中要添加记录
     dataset_used_record = {
         "region": region,
@@ -42,13 +72,48 @@ def save_records_to_db(region, universe, delay, dataset, new_alphas, template="s
 
     alpha_table_name = f"{region.lower()}_alphas"
 
-    # 将new_alphas按每200个元素分批处理
-    batch_size = 200
-    progress_bar = st.progress(0, text="数据保存进度：0.00%")
-    for i in range(0, len(new_alphas), batch_size):
-        batch = new_alphas[i:i + batch_size]
-        affected_rows = batch_insert_records(alpha_table_name, batch)
+    # 多行INSERT批量写入，按已写入行数更新进度；new_alphas 为列表时以其长度作为总数
+    if total is None and isinstance(new_alphas, (list, tuple)):
+        total = len(new_alphas)
+    result = bulk_insert_records(alpha_table_name, new_alphas, on_progress=insert_progress_callback(total),
+                                 group_key=stats_group_key)
+    refresh_simulation_stats(alpha_table_name, result['groups'])
+    st.toast(f"新增 {result['inserted']} 条，重复忽略 {result['ignored']} 条")
+    return result
+
+
+def build_next_level_records(records, target_level, region, phase):
+    """
+    基于低一阶的Alpha记录生成高一阶的Alpha记录(2: 分组算子, 3: trade_when)
+
+    Args:
+        records: get_phase1_alphas/get_phase2_alphas 查询到的记录
+        target_level: 目标阶数，"2" 或 "3"
+        region: 地区
+        phase: 新记录的phase
+
+    Returns:
+        待保存的新记录列表
+    """
+    new_records = []
+
+    for r in records:
+        if str(target_level) == "2":
+            alphas = get_group_second_order_factory([r['alpha']], GROUP_OPS, region)
+        elif str(target_level) == "3":
+            alphas = trade_when_factory('trade_when', r['alpha'], region)
+        else:
+            raise ValueError(f"不支持的目标阶数: {target_level}")
+
+        for alpha in alphas:
+            new_record = {field: r.get(field) for field in NEXT_LEVEL_INHERITED_FIELDS}
+            new_record['alpha'] = alpha
+            new_record['phase'] = phase
+            new_record['template'] = f'phase{target_level}'
+            new_record['simulated'] = 0
+            new_record['submitted'] = 0
+            new_record['used'] = int(target_level)
+            new_record['priority'] = compute_priority(new_record, parent=r)
+            new_records.append(new_record)
 
-        progress = min((i + batch_size) / len(new_alphas), 1.0)
-        progress_text = f"数据保存进度: {progress:.2%}"
-        progress_bar.progress(progress, text=progress_text)
+    return new_records
@@ -3,7 +3,8 @@ import streamlit as st
 from gen.utils import build_alpha_record
 from svc.alpha_builder import process_field_by_coverage
 from svc.auth import get_auto_login_session
-from svc.database import batch_insert_records
+from svc.database import bulk_insert_records
+from svc.simulation_stats import refresh_simulation_stats, stats_group_key
 
 submitted_region = 'IND'
 category='model'
@@ -52,4 +53,5 @@ print(len(all_records),  "records generated.")
 
 if st.button("保存到数据库"):
     alpha_table_name = "all_alphas"
-    batch_insert_records(alpha_table_name, all_records)
\ No newline at end of file
+    result = bulk_insert_records(alpha_table_name, all_records, group_key=stats_group_key)
+    refresh_simulation_stats(alpha_table_name, result['groups'])
\ No newline at end of file
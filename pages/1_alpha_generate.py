@@ -5,10 +5,14 @@ from collections import defaultdict
 import streamlit as st
 
 from sidebar import render_sidebar
-from svc.database import insert_record, batch_insert_records, query_table
+from svc.database import insert_record, bulk_insert_records, count_table, query_table_page, iter_table_rows
+from svc.export import export_csv, export_path
+from gen.utils import insert_progress_callback
+from svc.simulation_stats import refresh_simulation_stats, stats_group_key
 from svc.datafields import get_single_set_fields, get_multi_set_fields
 from svc.logger import setup_logger
 from svc.neutralize import neutralization_array
+from svc.priority import compute_priority
 
 # 添加src目录到路径中
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -20,6 +24,9 @@ from svc.alpha_builder import get_alpha_templates, generate_simple_expressions,
 # 设置logger
 logger = setup_logger(__name__)
 
+# 查询结果每页显示的记录数
+QUERY_PAGE_SIZE = 500
+
 # 渲染共享的侧边栏
 render_sidebar()
 
@@ -318,6 +325,7 @@ if col_gen_alphas.button("生成Alpha", type="primary"):        # 获取当前
                         'used': 0,
                         "template": selected_template,
                     }
+                    alpha_record["priority"] = compute_priority(alpha_record, dataset=dataset)
                     alpha_records.append(alpha_record)
 
         st.success(f"使用{selected_template}模板生成了{len(alpha_records)}条Alpha表达式")
@@ -359,17 +367,13 @@ if col_save_alphas.button("保存Alpha"):
         else:
             alpha_table_name = "all_alphas"
 
-        # 将new_alphas按每200个元素分批处理
-        batch_size = 200
+        # 多行INSERT批量写入，按已写入行数更新进度条
         new_alphas = st.session_state.new_alphas_to_save
-        progress_bar = st.progress(0, text="数据保存进度：0.00%")
-        for i in range(0, len(new_alphas), batch_size):
-            batch = new_alphas[i:i + batch_size]
-            affected_rows = batch_insert_records(alpha_table_name, batch)
-
-            progress = min((i + batch_size) / len(new_alphas), 1.0)
-            progress_text = f"数据保存进度: {progress:.2%}"
-            progress_bar.progress(progress, text=progress_text)
+        update_progress = insert_progress_callback(total=len(new_alphas))
+        result = bulk_insert_records(alpha_table_name, new_alphas, on_progress=update_progress,
+                                     group_key=stats_group_key)
+        refresh_simulation_stats(alpha_table_name, result['groups'])
+        st.success(f"新增 {result['inserted']} 个Alpha，重复忽略 {result['ignored']} 个")
     else:
         st.warning("请先生成Alpha")
 
@@ -396,15 +400,18 @@ if col_query_alphas.button("查询Alpha"):
         table_name = f"{selected_region.lower()}_alphas"
     else:
         table_name = "all_alphas"
-    query_results = query_table(table_name, conditions= query)
-
-    if query_results:
-        st.session_state.query_results = query_results
+    # 按 id 键集分页：只记录查询条件与各页的起始位置，翻页时只读取当前页
+    query_count = count_table(table_name, query)
+
+    if query_count:
+        st.session_state.query_table_name = table_name
+        st.session_state.query_conditions = query
+        st.session_state.query_count = query_count
+        st.session_state.query_page_cursors = [None]
         st.session_state.show_query_results = True
         st.rerun()
     else:
         st.info("未找到相关的Alpha记录")
-        st.session_state.query_results = None
         st.session_state.show_query_results = False
 
 
@@ -415,17 +422,33 @@ with col_clear:
 # 显示查询结果
 if st.session_state.get("show_query_results", False):
     st.subheader("查询结果")
-    query_results = st.session_state.get("query_results", [])
+    query_table_name = st.session_state.query_table_name
+    query_conditions = st.session_state.query_conditions
+    page_cursors = st.session_state.query_page_cursors
+    query_results = query_table_page(query_table_name, query_conditions, after_id=page_cursors[-1], limit=QUERY_PAGE_SIZE)
 
     if query_results:
-        # 显示记录总数
-        st.write(f"共找到 {len(query_results)} 条记录")
+        # 显示记录总数与当前页
+        st.write(f"共找到 {st.session_state.query_count} 条记录，第 {len(page_cursors)} 页")
 
         # 使用pandas展示结果
         import pandas as pd
 
         # 创建DataFrame并显示
-        df = pd.DataFrame(query_results[:2000])
+        df = pd.DataFrame(query_results)
         st.dataframe(df, width='stretch')
+
+        col_prev_page, col_next_page, col_export, _ = st.columns([1, 1, 1, 3])
+        if col_prev_page.button("上一页", disabled=len(page_cursors) <= 1):
+            page_cursors.pop()
+            st.rerun()
+        if col_next_page.button("下一页", disabled=len(query_results) < QUERY_PAGE_SIZE):
+            page_cursors.append(query_results[-1]['id'])
+            st.rerun()
+        if col_export.button("导出CSV"):
+            path = export_path(query_table_name)
+            with st.spinner("正在导出..."):
+                exported = export_csv(iter_table_rows(query_table_name, query_conditions), path)
+            st.success(f"已导出 {exported} 条记录到 {path}")
     else:
         st.info("未找到相关记录")
\ No newline at end of file
@@ -12,21 +12,40 @@ from svc.logger import setup_logger
 from sidebar import render_sidebar
 from svc.alpha_query import query_alphas_simulation_stats
 from svc.simulate import get_simulate_task_manager
+from svc.pipeline import use_pipeline_worker, enqueue_job, request_stop, list_jobs
 
 # 设置logger
 logger = setup_logger(__name__)
 
 @st.dialog("回测状态")
 def show_status():
-    st.json(task_manager.simulate_tasks)
+    if use_worker:
+        # 由独立的 worker 进程执行回测，页面只展示任务进度
+        st.dataframe(list_jobs("simulate"))
+        return
+
+    status = task_manager.status()
+    concurrency = status["concurrency"]
+    col_window, col_in_flight, col_throttles = st.columns(3)
+    col_window.metric("并发窗口", f"{concurrency['window']} / {concurrency['max_window']}")
+    col_in_flight.metric("进行中", concurrency["in_flight"])
+    col_throttles.metric("429次数", concurrency["throttles"])
+    # 各账号的负载与限流情况
+    st.dataframe([
+        {"账号": name, "并发窗口": f"{item['window']} / {item['max_window']}", "进行中": item["in_flight"],
+         "成功提交": item["successes"], "429次数": item["throttles"]}
+        for name, item in concurrency["accounts"].items()
+    ])
+    st.json(status)
 
 st.title("🔬 回测Alpha")
 
 # 渲染共享的侧边栏
 render_sidebar()
 
-# 获取SimulateTaskManager实例
-task_manager = get_simulate_task_manager()
+# 开启 worker 模式时回测由 worker 进程执行，否则在当前进程中执行
+use_worker = use_pipeline_worker()
+task_manager = None if use_worker else get_simulate_task_manager()
 
 selected_region = st.session_state.selected_region
 selected_universe = st.session_state.selected_universe
@@ -72,8 +91,11 @@ with st.container(horizontal=True, horizontal_alignment="left"):
         if selected_category and selected_category != "All":
             query_params["category"] = selected_category
 
-        # 调用start_simulate方法
-        task_manager.start_simulate(query_params, n_tasks_max, batch_size=batch_size)
+        if use_worker:
+            enqueue_job("simulate", {"query": query_params, "n_tasks_max": n_tasks_max, "batch_size": batch_size})
+        else:
+            # 调用start_simulate方法
+            task_manager.start_simulate(query_params, n_tasks_max, batch_size=batch_size)
         st.toast("已开始回测任务")
 
     # 回测状态按钮
@@ -90,8 +112,11 @@ with st.container(horizontal=True, horizontal_alignment="left"):
             "category": selected_category if selected_category != "" else None  # 如果选择"All"则传递None
         }
 
-        # 调用stop_simulate方法
-        task_manager.stop_simulate(query_params)
+        if use_worker:
+            request_stop("simulate", region=selected_region)
+        else:
+            # 调用stop_simulate方法
+            task_manager.stop_simulate(query_params)
         st.toast("已停止回测任务")
 
 # 显示统计信息（如果存在且未被清除）
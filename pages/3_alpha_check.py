@@ -5,17 +5,23 @@ import pandas as pd
 import streamlit as st
 
 from svc.check import get_check_task_manager
+from svc.pipeline import use_pipeline_worker, enqueue_job, request_stop, list_jobs
 
 # 添加src目录到路径中
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from svc.logger import setup_logger
 from sidebar import render_sidebar
-from svc.alpha_query import query_checkable_alpha_stats, query_checkable_alpha_details
+from svc.alpha_query import query_checkable_alpha_stats, query_checkable_alpha_details, iter_checkable_alpha_details
+from svc.export import export_csv, export_path
+from svc.query_cache import get_query_cache_stats, invalidate_query_cache
 
 # 设置logger
 logger = setup_logger(__name__)
 
+# 可检查Alpha每页显示(及每次检查)的记录数
+CHECK_PAGE_SIZE = 500
+
 # 渲染共享的侧边栏
 render_sidebar()
 
@@ -119,8 +125,14 @@ if st.session_state.get('checkable_alpha_stats'):
         if st.session_state.get('select_all_categories', False):
             chosen_category = None
 
-        # 查询选中分类的详细Alpha信息
-        alpha_details = query_checkable_alpha_details(region, universe, delay, phase_value, chosen_category, sharp_val, fitness_val)
+        # 查询选中分类的详细Alpha信息：按分数键集分页，筛选条件变化时回到第一页
+        page_key = (region, universe, delay, phase_value, chosen_category, sharp_val, fitness_val)
+        if st.session_state.get('check_page_key') != page_key:
+            st.session_state.check_page_key = page_key
+            st.session_state.check_page_cursors = [None]
+        page_cursors = st.session_state.check_page_cursors
+        alpha_details = query_checkable_alpha_details(region, universe, delay, phase_value, chosen_category, sharp_val, fitness_val,
+                                                      limit=CHECK_PAGE_SIZE, after=page_cursors[-1])
 
         # 保存当前选中分类的详细信息到session_state
         st.session_state.current_category_details = alpha_details
@@ -128,18 +140,35 @@ if st.session_state.get('checkable_alpha_stats'):
         
         # 显示详细信息表格
         if alpha_details:
-            st.subheader(f"[{chosen_category or '全部'}]分类下的可检查Alpha")
+            st.subheader(f"[{chosen_category or '全部'}]分类下的可检查Alpha(第 {len(page_cursors)} 页)")
             df = pd.DataFrame(alpha_details)
             # 移除不需要的列
             columns_to_drop = [col for col in df.columns if col in ['rn', 'simulated']]
             df = df.drop(columns=columns_to_drop)
             st.dataframe(df)
+
+            col_prev_page, col_next_page, col_export, _ = st.columns([1, 1, 1, 3])
+            if col_prev_page.button("上一页", disabled=len(page_cursors) <= 1):
+                page_cursors.pop()
+                st.rerun()
+            if col_next_page.button("下一页", disabled=len(alpha_details) < CHECK_PAGE_SIZE):
+                page_cursors.append((alpha_details[-1]['rank_score'], alpha_details[-1]['id']))
+                st.rerun()
+            if col_export.button("导出CSV"):
+                path = export_path(f"checkable_{chosen_category or 'all'}")
+                with st.spinner("正在导出..."):
+                    exported = export_csv(iter_checkable_alpha_details(
+                        region=region, universe=universe, delay=delay, phase=phase_value, category=chosen_category,
+                        sharp_threshold=sharp_val, fitness_threshold=fitness_val), path)
+                st.success(f"已导出 {exported} 条记录到 {path}")
         else:
             st.info("该分类下暂无可检查的Alpha")
 
         col3, col4, col5 = st.columns([1, 1, 4])
 
-        task_manager = get_check_task_manager()
+        # 开启 worker 模式时检查由 worker 进程执行，否则在当前进程中执行
+        use_worker = use_pipeline_worker()
+        task_manager = None if use_worker else get_check_task_manager()
 
         with col3:
             if st.button("检查Alpha", type="primary"):
@@ -152,18 +181,35 @@ if st.session_state.get('checkable_alpha_stats'):
                     'phase_value': phase_value,
                     'chosen_category': chosen_category,
                     'sharp_val': sharp_val,
-                    'fitness_val': fitness_val
+                    'fitness_val': fitness_val,
+                    'after': page_cursors[-1],
                 }
-                task_manager.start(records=alpha_details, query=query_params)
+                if use_worker:
+                    enqueue_job("check", query_params)
+                else:
+                    task_manager.start(records=alpha_details, query=query_params)
 
         if col4.button("检查状态"):
             # 显示simulate_tasks信息
             st.write("当前检查状态信息:")
-            st.json(task_manager.status)
+            if use_worker:
+                st.dataframe(list_jobs("check"))
+            else:
+                st.json(task_manager.status)
 
         if col5.button("停止检查"):
-            task_manager.status["stop"] = True
-            task_manager.status["details"] = "Stopped by user"
+            if use_worker:
+                request_stop("check")
+            else:
+                task_manager.status["stop"] = True
+                task_manager.status["details"] = "Stopped by user"
 
     else:
-        st.info("暂无可检查的Alpha")
\ No newline at end of file
+        st.info("暂无可检查的Alpha")
+
+# 查询缓存统计：页面每次重新运行都会重复查询，相同条件的查询直接读取缓存
+with st.expander("查询缓存统计"):
+    st.json(get_query_cache_stats())
+    if st.button("清空查询缓存"):
+        invalidate_query_cache()
+        st.rerun()
@@ -11,6 +11,7 @@ from svc.logger import setup_logger
 from sidebar import render_sidebar
 from svc.alpha_query import query_submittable_alpha_stats, query_submittable_alpha_details
 from svc.submit import get_submit_task_manager
+from svc.pipeline import use_pipeline_worker, enqueue_job, request_stop, list_jobs
 
 # 设置logger
 logger = setup_logger(__name__)
@@ -156,7 +157,9 @@ col_max_submit_count, col4_submit, col6_submit_status, col5_stop_submit, _ = st.
 with col_max_submit_count:
     max_submit_count = st.number_input("提交数量", min_value=1, max_value=4, value=1, step=1)
 
-task_manager = get_submit_task_manager()
+# 开启 worker 模式时提交由 worker 进程执行，否则在当前进程中执行
+use_worker = use_pipeline_worker()
+task_manager = None if use_worker else get_submit_task_manager()
 
 if col4_submit.button("提交Alpha", type="primary"):
     # 获取选中的数据
@@ -167,7 +170,11 @@ if col4_submit.button("提交Alpha", type="primary"):
             records = selected_df.to_dict('records')
 
             # 提交选中的Alpha，使用指定的最大提交数量
-            task_manager.start(records=records, max_submit_count=max_submit_count, region=st.session_state.get('selected_region', None))
+            if use_worker:
+                enqueue_job("submit", {"records": records, "max_submit_count": max_submit_count,
+                                       "region": st.session_state.get('selected_region', None)})
+            else:
+                task_manager.start(records=records, max_submit_count=max_submit_count, region=st.session_state.get('selected_region', None))
 
             st.success(f"开始提交最多 {max_submit_count} 个Alpha")
         else:
@@ -178,9 +185,15 @@ if col4_submit.button("提交Alpha", type="primary"):
 if col6_submit_status.button("提交状态"):
     # 显示提交状态信息
     st.write("当前提交状态信息:")
-    st.json(task_manager.status)
+    if use_worker:
+        st.dataframe(list_jobs("submit"))
+    else:
+        st.json(task_manager.status)
 
 if col5_stop_submit.button("停止提交"):
     # 停止提交任务
-    task_manager.status["stop"] = True
+    if use_worker:
+        request_stop("submit")
+    else:
+        task_manager.status["stop"] = True
     st.success("已发送停止提交指令")
\ No newline at end of file
@@ -8,12 +8,17 @@ from svc.neutralize import neutralization_array, neutralize
 
 logger = setup_logger(__name__)
 
+# 最佳Alphas每页显示的记录数
+BEST_ALPHAS_PAGE_SIZE = 500
+
 # 添加src目录到路径中
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from sidebar import render_sidebar
 from svc.alpha_query import query_checkable_alpha_details
-from svc.database import batch_insert_records, update_table
+from svc.database import bulk_insert_records, update_table
+from gen.utils import insert_progress_callback
+from svc.simulation_stats import refresh_simulation_stats, stats_group_key
 
 # 渲染共享的侧边栏
 render_sidebar()
@@ -26,6 +31,18 @@ selected_universe = st.session_state.selected_universe
 selected_delay = st.session_state.selected_delay
 selected_category = st.session_state.selected_category
 
+
+def load_best_alphas():
+    """按保存的查询条件读取当前页的最佳Alphas"""
+    cursors = st.session_state.best_alphas_cursors
+    page = query_checkable_alpha_details(**st.session_state.best_alphas_query, limit=BEST_ALPHAS_PAGE_SIZE, after=cursors[-1])
+    # 下一页的起始位置取本页最后一条记录(过滤 used 之前)，本页不满时没有下一页
+    st.session_state.best_alphas_next = (page[-1]['rank_score'], page[-1]['id']) \
+        if len(page) == BEST_ALPHAS_PAGE_SIZE else None
+    # 排除best_alphas中used属性为'1'的记录
+    st.session_state.best_alphas = [alpha for alpha in page if alpha.get('used') == 0]
+
+
 # 查询条件
 st.subheader("查询条件")
 
@@ -46,29 +63,26 @@ with st.container(horizontal=True, horizontal_alignment="left", vertical_alignme
     # 查询按钮
     if st.button("查询最佳Alphas"):
         st.session_state.new_alphas_to_save = None
+        # 保存查询条件，翻页时按分数键集分页重新查询
+        st.session_state.best_alphas_query = dict(
+            region=selected_region,
+            universe=selected_universe,
+            delay=selected_delay,
+            phase=phase,
+            category=selected_category if selected_category != "" else None,  # 如果选择"All"则传递None
+            sharp_threshold=sharp_threshold,
+            fitness_threshold=fitness_threshold,
+            passed=passed,
+            neutralization=neutralization if neutralization != "NONE" else None
+        )
+        st.session_state.best_alphas_cursors = [None]
         with st.spinner("正在查询最佳Alphas..."):
-            # 调用查询函数获取最佳Alphas
-            best_alphas = query_checkable_alpha_details(
-                region=selected_region,
-                universe=selected_universe,
-                delay=selected_delay,
-                phase=phase,
-                category=selected_category if selected_category != "" else None,  # 如果选择"All"则传递None
-                sharp_threshold=sharp_threshold,
-                fitness_threshold=fitness_threshold,
-                passed=passed,
-                neutralization=neutralization if neutralization != "NONE" else None
-            )
-
-            # 排除best_alphas中used属性为'1'的记录
-            best_alphas = [alpha for alpha in best_alphas if alpha.get('used') == 0]
-
-            if best_alphas:
-                st.session_state.best_alphas = best_alphas
-                st.toast(f":green[成功查询到 {len(best_alphas)} 个最佳Alphas]", icon="✅")
-            else:
-                st.toast(f":orange[未找到符合查询条件的最佳Alphas]", icon="❌")
-                st.session_state.best_alphas = []
+            load_best_alphas()
+
+        if st.session_state.best_alphas:
+            st.toast(f":green[成功查询到 {len(st.session_state.best_alphas)} 个最佳Alphas]", icon="✅")
+        else:
+            st.toast(f":orange[未找到符合查询条件的最佳Alphas]", icon="❌")
 
 # 显示查询结果
 if "best_alphas" in st.session_state and st.session_state.best_alphas:
@@ -94,6 +108,17 @@ if "best_alphas" in st.session_state and st.session_state.best_alphas:
     # 保存选择的行索引
     st.session_state.selected_rows = event.selection.rows if event and event.selection else []
 
+if st.session_state.get("best_alphas_query"):
+    col_prev_page, col_next_page, _ = st.columns([1, 1, 4])
+    if col_prev_page.button("上一页", disabled=len(st.session_state.best_alphas_cursors) <= 1):
+        st.session_state.best_alphas_cursors.pop()
+        load_best_alphas()
+        st.rerun()
+    if col_next_page.button("下一页", disabled=st.session_state.get("best_alphas_next") is None):
+        st.session_state.best_alphas_cursors.append(st.session_state.best_alphas_next)
+        load_best_alphas()
+        st.rerun()
+
 # Neutralization选择
 st.subheader("Neutralization选项")
 st.info("请先查询最佳Alphas后再进行以下操作")
@@ -157,19 +182,12 @@ if st.button("保存到数据库"):
     # 处理保存操作
     if st.session_state.save_new_alphas and st.session_state.new_alphas_to_save:
         new_alphas_to_save = st.session_state.new_alphas_to_save
-        # 将new_alphas按每200个元素分批处理
-        batch_size = 200
-        progress_bar = st.progress(0, text="数据保存进度：0.00%")
-
+        # 多行INSERT批量写入，按已写入行数更新进度条
+        update_progress = insert_progress_callback(total=len(new_alphas_to_save))
         try:
-
-            for i in range(0, len(new_alphas_to_save), batch_size):
-                batch = new_alphas_to_save[i:i + batch_size]
-                affected_rows = batch_insert_records(table_name, batch)
-
-                progress = min((i + batch_size) / len(new_alphas_to_save), 1.0)
-                progress_text = f"数据保存进度: {progress:.2%}"
-                progress_bar.progress(progress, text=progress_text)
+            result = bulk_insert_records(table_name, new_alphas_to_save, on_progress=update_progress,
+                                         group_key=stats_group_key)
+            refresh_simulation_stats(table_name, result['groups'])
 
         except Exception as e:
             st.error(f"保存到数据库时发生异常: {str(e)}")
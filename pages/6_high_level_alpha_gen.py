@@ -1,9 +1,11 @@
 import streamlit as st
 
-from gen.phase2_gen import get_phase1_alphas, get_group_second_order_factory
-from gen.phase3_gen import get_phase2_alphas, trade_when_factory
+from gen.phase2_gen import get_phase1_alphas
+from gen.phase3_gen import get_phase2_alphas
+from gen.utils import build_next_level_records, insert_progress_callback
 from sidebar import render_sidebar
-from svc.database import batch_insert_records, update_table
+from svc.database import bulk_insert_records, update_table
+from svc.simulation_stats import refresh_simulation_stats, stats_group_key
 from svc.logger import setup_logger
 
 logger = setup_logger(__name__)
@@ -39,41 +41,7 @@ with st.container(horizontal= True, horizontal_alignment="left", vertical_alignm
     phase = st.number_input("Phase:", min_value=1, max_value=9, value=9, step=1, key="phase")
 
     if st.button("Gen", disabled=not select_rows):
-        new_records = []
-
-        if target_level == "2":
-            group_ops = ["group_neutralize", "group_rank", "group_zscore"]
-
-            for r in select_rows:
-                expr = r['alpha']
-                for alpha in get_group_second_order_factory([expr], group_ops, region):
-                    new_record = r.copy()
-                    new_record['alpha'] = alpha
-                    new_record['phase'] = phase
-                    new_record['template'] = f'phase{target_level}'
-                    new_record['simulated'] = 0
-                    new_record['submitted'] = 0
-                    new_record['used'] = int(target_level)
-                    new_record.pop('id')
-                    new_record.pop('rn')
-                    new_records.append(new_record)
-
-        elif target_level == "3":
-            for r in select_rows:
-                for alpha in trade_when_factory('trade_when', r['alpha'], region):
-                    new_record = r.copy()
-                    new_record['alpha'] = alpha
-                    new_record['phase'] = phase
-                    new_record['template'] = f'phase{target_level}'
-                    new_record['simulated'] = 0
-                    new_record['submitted'] = 0
-                    new_record['used'] = int(target_level)
-                    new_record.pop('id')
-                    new_record.pop('rn')
-                    new_records.append(new_record)
-
-        else:
-            st.toast("请选择正确的目标级别")
+        new_records = build_next_level_records(select_rows, target_level, region, phase)
 
         st.session_state.alphas_to_save = new_records
 
@@ -81,19 +49,12 @@ with st.container(horizontal= True, horizontal_alignment="left", vertical_alignm
         st.session_state.save_new_alphas = True
 
 if 'alphas_to_save' in st.session_state and 'save_new_alphas' in st.session_state and st.session_state.save_new_alphas:
-    # 将new_alphas按每200个元素分批处理
-    batch_size = 200
+    # 多行INSERT批量写入，按已写入行数更新进度条
     new_alphas = st.session_state.alphas_to_save
     table_name = f"{region.lower()}_alphas"
-    progress_bar = st.progress(0, text="数据保存进度：0.00%")
-
-    for i in range(0, len(new_alphas), batch_size):
-        batch = new_alphas[i:i + batch_size]
-        affected_rows = batch_insert_records(table_name, batch)
-
-        progress = min((i + batch_size) / len(new_alphas), 1.0)
-        progress_text = f"数据保存进度: {progress:.2%}"
-        progress_bar.progress(progress, text=progress_text)
+    update_progress = insert_progress_callback(total=len(new_alphas))
+    result = bulk_insert_records(table_name, new_alphas, on_progress=update_progress, group_key=stats_group_key)
+    refresh_simulation_stats(table_name, result['groups'])
 
     old_ids = [alpha.get('id') for alpha in select_rows]
     update_table(table_name, {'id': old_ids}, {"used": int(target_level)})
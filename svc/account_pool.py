@@ -0,0 +1,98 @@
+from typing import Any, Dict, List, Optional
+
+import streamlit as st
+
+from svc.auth import get_auto_login_session, get_rate_limit_config, AutoLoginSession
+from svc.concurrency import AIMDController
+from svc.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# 每个账号默认的同时回测上限
+DEFAULT_ACCOUNT_CONCURRENCY = 10
+
+
+@st.cache_resource
+def get_account_pool():
+    """
+    创建并返回全局共享的回测账号池：st.secrets["brain"] 为主账号，
+    可在 [[brain_accounts]] 中配置更多账号(username/password/max_concurrency)
+    """
+    primary = get_auto_login_session()
+    accounts = [Account(primary.username, primary,
+                        int(st.secrets["brain"].get("max_concurrency", DEFAULT_ACCOUNT_CONCURRENCY)))]
+
+    for config in st.secrets.get("brain_accounts", []):
+        if config["username"] == primary.username:
+            continue
+        try:
+            session = AutoLoginSession(config["username"], config["password"], rate_limits=get_rate_limit_config(),
+                                       pool_size=primary.pool_size)
+            accounts.append(Account(config["username"], session,
+                                    int(config.get("max_concurrency", DEFAULT_ACCOUNT_CONCURRENCY))))
+        except Exception as e:
+            logger.error("回测账号 %s 登录失败，已跳过: %s", config["username"], e)
+
+    return AccountPool(accounts)
+
+
+class Account:
+    """回测账号：登录会话与该账号独立的并发控制器"""
+
+    def __init__(self, name: str, session: AutoLoginSession, max_concurrency: int = DEFAULT_ACCOUNT_CONCURRENCY):
+        self.name = name
+        self.session = session
+        self.controller = AIMDController(initial_window=max_concurrency, max_window=max_concurrency)
+
+    def load(self) -> float:
+        """负载：进行中的回测数占并发窗口的比例"""
+        return self.controller.in_flight / max(self.controller.window, 1)
+
+
+class AccountPool:
+    """
+    多账号回测池：按账号分别计数并发槽位，提交时选择负载最低且有空闲槽位的账号
+
+    同时提供与 AIMDController 一致的汇总接口(has_capacity/window/snapshot)，供回测引擎判断总容量
+    """
+
+    def __init__(self, accounts: List[Account]):
+        if not accounts:
+            raise ValueError("回测账号池不能为空")
+        self.accounts = accounts
+        self._by_name = {account.name: account for account in accounts}
+
+    def get(self, name: Optional[str]) -> Account:
+        """按账号名返回账号，未知或为空时返回主账号"""
+        return self._by_name.get(name) or self.accounts[0]
+
+    def select(self) -> Optional[Account]:
+        """返回负载最低且有空闲槽位的账号，所有账号都已满时返回None"""
+        available = [account for account in self.accounts if account.controller.has_capacity()]
+        if not available:
+            return None
+        return min(available, key=lambda account: account.load())
+
+    def has_capacity(self) -> bool:
+        return any(account.controller.has_capacity() for account in self.accounts)
+
+    @property
+    def window(self) -> int:
+        return sum(account.controller.window for account in self.accounts)
+
+    @property
+    def in_flight(self) -> int:
+        return sum(account.controller.in_flight for account in self.accounts)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """汇总各账号的并发窗口与统计，accounts 字段为每个账号的详情"""
+        snapshots = {account.name: account.controller.snapshot() for account in self.accounts}
+        return {
+            "window": sum(item["window"] for item in snapshots.values()),
+            "in_flight": sum(item["in_flight"] for item in snapshots.values()),
+            "max_window": sum(item["max_window"] for item in snapshots.values()),
+            "successes": sum(item["successes"] for item in snapshots.values()),
+            "throttles": sum(item["throttles"] for item in snapshots.values()),
+            "backoffs": sum(item["backoffs"] for item in snapshots.values()),
+            "accounts": snapshots,
+        }
@@ -1,10 +1,15 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 
-from svc.database import get_db_connection
+from svc.alpha_ranking import best_rankings_subquery
+from svc.database import db_connection, iter_keyset_chunks
+from svc.simulation_stats import query_simulation_stats
 from svc.logger import setup_logger
+from svc.query_cache import cached_query
 
 logger = setup_logger(__name__)
 
+
+@cached_query
 def query_alphas_by_dataset(region: str = None, universe: str = None, delay: int = None, dataset: str = None) -> List[Dict[str, Any]]:
     """
     根据数据集查询Alpha记录
@@ -25,47 +30,45 @@ def query_alphas_by_dataset(region: str = None, universe: str = None, delay: int
         table_name = f"{region.lower()}_alphas"
     
     try:
-        connection = get_db_connection()
-        if not connection:
-            return []
-        
-        cursor = connection.cursor(dictionary=True)
-        
-        # 构建查询语句和参数
-        query = f"""
-        SELECT id, alpha, sharp, fitness, decay, neutralization, phase, created_at, updated_at 
-        FROM {table_name} 
-        WHERE 1=1
-        """
-        params = []
-        
-        # 根据参数是否为None来决定是否添加查询条件
-        if universe is not None:
-            query += " AND universe = %s"
-            params.append(universe)
-        if delay is not None:
-            query += " AND delay = %s"
-            params.append(delay)
-        if dataset is not None:
-            query += " AND dataset = %s"
-            params.append(dataset)
-        
-        query += " ORDER BY sharp*fitness DESC LIMIT 100"
-        
-        cursor.execute(query, params)
-        
-        # 获取结果
-        results = cursor.fetchall()
-        
-        cursor.close()
-        connection.close()
-        
-        return results
+        with db_connection() as connection:
+            cursor = connection.cursor(dictionary=True)
+
+            # 构建查询语句和参数
+            query = f"""
+            SELECT id, alpha, sharp, fitness, decay, neutralization, phase, created_at, updated_at 
+            FROM {table_name} 
+            WHERE 1=1
+            """
+            params = []
+
+            # 根据参数是否为None来决定是否添加查询条件
+            if universe is not None:
+                query += " AND universe = %s"
+                params.append(universe)
+            if delay is not None:
+                query += " AND delay = %s"
+                params.append(delay)
+            if dataset is not None:
+                query += " AND dataset = %s"
+                params.append(dataset)
+
+            query += " ORDER BY score DESC LIMIT 100"
+
+            cursor.execute(query, params)
+
+            # 获取结果
+            results = cursor.fetchall()
+
+            cursor.close()
+
+            return results
+
     except Exception as e:
         print(f"查询Alpha记录时出错: {e}")
         return []
 
 
+@cached_query
 def query_alphas_by_conditions(region: str = None, universe: str = None, delay: int = None, category: str = None, dataset_ids: List[str] = None) -> List[Dict[str, Any]]:
     """
     根据查询条件查询Alpha记录
@@ -87,53 +90,51 @@ def query_alphas_by_conditions(region: str = None, universe: str = None, delay:
         table_name = f"{region.lower()}_alphas"
     
     try:
-        connection = get_db_connection()
-        if not connection:
-            return []
-        
-        cursor = connection.cursor(dictionary=True)
-        
-        # 构建查询语句
-        query = f"""
-        SELECT * 
-        FROM {table_name} 
-        WHERE 1=1
-        """
-        params = []
-        
-        # 根据参数是否为None来决定是否添加查询条件
-        if universe is not None:
-            query += " AND universe = %s"
-            params.append(universe)
-        if delay is not None:
-            query += " AND delay = %s"
-            params.append(delay)
-        
-        # 如果指定了分类，添加分类条件
-        if category and category != "All":
-            query += " AND category = %s"
-            params.append(category.lower())
-        
-        # 如果指定了数据集ID列表，添加数据集条件
-        if dataset_ids:
-            placeholders = ','.join(['%s'] * len(dataset_ids))
-            query += f" AND dataset IN ({placeholders})"
-            params.extend(dataset_ids)
-        
-        query += " ORDER BY sharp*fitness DESC LIMIT 500"
-        
-        cursor.execute(query, params)
-        results = cursor.fetchall()
-        
-        cursor.close()
-        connection.close()
-        
-        return results
+        with db_connection() as connection:
+            cursor = connection.cursor(dictionary=True)
+
+            # 构建查询语句
+            query = f"""
+            SELECT * 
+            FROM {table_name} 
+            WHERE 1=1
+            """
+            params = []
+
+            # 根据参数是否为None来决定是否添加查询条件
+            if universe is not None:
+                query += " AND universe = %s"
+                params.append(universe)
+            if delay is not None:
+                query += " AND delay = %s"
+                params.append(delay)
+
+            # 如果指定了分类，添加分类条件
+            if category and category != "All":
+                query += " AND category = %s"
+                params.append(category.lower())
+
+            # 如果指定了数据集ID列表，添加数据集条件
+            if dataset_ids:
+                placeholders = ','.join(['%s'] * len(dataset_ids))
+                query += f" AND dataset IN ({placeholders})"
+                params.extend(dataset_ids)
+
+            query += " ORDER BY score DESC LIMIT 500"
+
+            cursor.execute(query, params)
+            results = cursor.fetchall()
+
+            cursor.close()
+
+            return results
+
     except Exception as e:
         print(f"根据条件查询Alpha记录时出错: {e}")
         return []
 
 
+@cached_query
 def query_alphas_simulation_stats(region: str = None, universe: str = None, delay: int = None, category: str = None, dataset_ids: List[str] = None, phase: int = 1) -> List[Dict[str, Any]]:
     """
     按simulated值和category进行汇总统计
@@ -154,60 +155,63 @@ def query_alphas_simulation_stats(region: str = None, universe: str = None, dela
         table_name = "all_alphas"
     else:
         table_name = f"{region.lower()}_alphas"
+
+    # 未按数据集筛选时直接读取预聚合的计数表，不扫描整张表
+    if not dataset_ids:
+        return query_simulation_stats(table_name, universe, delay, phase,
+                                      category.lower() if category and category != "All" else None)
     
     try:
-        connection = get_db_connection()
-        if not connection:
-            return []
-        
-        cursor = connection.cursor(dictionary=True)
-        
-        # 构建统计查询语句
-        query = f"""
-        SELECT category, simulated, COUNT(*) as count
-        FROM {table_name} 
-        WHERE 1=1
-        """
-        params = []
-        
-        # 根据参数是否为None来决定是否添加查询条件
-        if universe is not None:
-            query += " AND universe = %s"
-            params.append(universe)
-        if delay is not None:
-            query += " AND delay = %s"
-            params.append(delay)
-        
-        # phase参数默认值为1，所以如果为None则不添加条件
-        if phase is not None:
-            query += " AND phase = %s"
-            params.append(phase)
-        
-        # 如果指定了分类，添加分类条件
-        if category and category != "All":
-            query += " AND category = %s"
-            params.append(category.lower())
-        
-        # 如果指定了数据集ID列表，添加数据集条件
-        if dataset_ids:
-            placeholders = ','.join(['%s'] * len(dataset_ids))
-            query += f" AND dataset IN ({placeholders})"
-            params.extend(dataset_ids)
-        
-        query += " GROUP BY category, simulated ORDER BY category, simulated"
-        
-        cursor.execute(query, params)
-        results = cursor.fetchall()
-        
-        cursor.close()
-        connection.close()
-        
-        return results
+        with db_connection() as connection:
+            cursor = connection.cursor(dictionary=True)
+
+            # 构建统计查询语句
+            query = f"""
+            SELECT category, simulated, COUNT(*) as count
+            FROM {table_name} 
+            WHERE 1=1
+            """
+            params = []
+
+            # 根据参数是否为None来决定是否添加查询条件
+            if universe is not None:
+                query += " AND universe = %s"
+                params.append(universe)
+            if delay is not None:
+                query += " AND delay = %s"
+                params.append(delay)
+
+            # phase参数默认值为1，所以如果为None则不添加条件
+            if phase is not None:
+                query += " AND phase = %s"
+                params.append(phase)
+
+            # 如果指定了分类，添加分类条件
+            if category and category != "All":
+                query += " AND category = %s"
+                params.append(category.lower())
+
+            # 如果指定了数据集ID列表，添加数据集条件
+            if dataset_ids:
+                placeholders = ','.join(['%s'] * len(dataset_ids))
+                query += f" AND dataset IN ({placeholders})"
+                params.extend(dataset_ids)
+
+            query += " GROUP BY category, simulated ORDER BY category, simulated"
+
+            cursor.execute(query, params)
+            results = cursor.fetchall()
+
+            cursor.close()
+
+            return results
+
     except Exception as e:
         print(f"查询Alpha模拟状态统计时出错: {e}")
         return []
 
 
+@cached_query
 def query_checkable_alpha_stats(region: str = None, universe: str = None, delay: int = None, phase: str = None, sharp_threshold: float = 1.0, fitness_threshold: float = 0.8, passed: int = 0) -> List[Dict[str, Any]]:
     """
     查询可提交的Alpha统计数据（按分类分组）
@@ -231,64 +235,39 @@ def query_checkable_alpha_stats(region: str = None, universe: str = None, delay:
         table_name = f"{region.lower()}_alphas"
     
     try:
-        connection = get_db_connection()
-        if not connection:
-            return []
-        
-        cursor = connection.cursor(dictionary=True)
-        
-        # 构建查询语句
-        base_query = f"""
-        WITH ranked_alphas AS (
-            SELECT *,
-                   ROW_NUMBER() OVER (
-                       PARTITION BY region, universe, delay, name, template
-                       ORDER BY abs(sharp*fitness) DESC
-                   ) AS rn
-            FROM {table_name}  
-            WHERE 1=1
-        """
-        params = []
-        
-        # 根据参数是否为None来决定是否添加查询条件
-        if region is not None:
-            base_query += " AND region = %s"
-            params.append(region)
-        if universe is not None:
-            base_query += " AND universe = %s"
-            params.append(universe)
-        if delay is not None:
-            base_query += " AND delay = %s"
-            params.append(delay)
-        if phase is not None:
-            base_query += " AND phase = %s"
-            params.append(phase)
-        
-        base_query += " AND simulated = 1"
-        
-        base_query += """
-        )
-        SELECT category, COUNT(*) as count FROM ranked_alphas 
-        WHERE rn = 1 AND passed = %s AND sharp >= %s AND fitness >= %s
-        GROUP BY category
-        ORDER BY count DESC
-        """
-        
-        params.extend([passed, sharp_threshold, fitness_threshold])
-        cursor.execute(base_query, tuple(params))
-        results = cursor.fetchall()
-        
-        cursor.close()
-        connection.close()
-        
-        return results
+        with db_connection() as connection:
+            cursor = connection.cursor(dictionary=True)
+
+            # 构建查询语句：从分组最优Alpha表读取按条件筛选后每个分组 abs(sharp*fitness) 最高的记录
+            rankings, params = best_rankings_subquery(table_name, {
+                'region': region, 'universe': universe, 'delay': delay, 'phase': phase,
+            })
+            base_query = f"""
+            SELECT a.category, COUNT(*) as count
+            FROM {rankings}
+            JOIN {table_name} a ON a.id = r.alpha_row_id
+            WHERE a.simulated = 1 AND a.passed = %s AND a.sharp >= %s AND a.fitness >= %s
+            GROUP BY a.category
+            ORDER BY count DESC
+            """
+
+            params.extend([passed, sharp_threshold, fitness_threshold])
+            cursor.execute(base_query, tuple(params))
+            results = cursor.fetchall()
+
+            cursor.close()
+
+            return results
+
     except Exception as e:
         print(f"查询可提交Alpha统计时出错: {e}")
         return []
 
 
+@cached_query
 def query_checkable_alpha_details(
-        region: str = None, universe: str = None, delay: int = None, phase: str = None, category: str = None, sharp_threshold: float = 1.0, fitness_threshold: float = 0.8, passed: int = 0, neutralization: str = None
+        region: str = None, universe: str = None, delay: int = None, phase: str = None, category: str = None, sharp_threshold: float = 1.0, fitness_threshold: float = 0.8, passed: int = 0, neutralization: str = None,
+        limit: int = 500, after: Optional[Tuple[float, int]] = None
 ) -> List[Dict[str, Any]]:
     """
     查询指定分类下可提交的Alpha详细信息
@@ -303,9 +282,11 @@ def query_checkable_alpha_details(
         fitness_threshold: fitness阈值，默认为0.8
         passed: passed状态，默认为0
         neutralization: neutralization筛选条件，默认为None表示不筛选
+        limit: 每页记录数
+        after: 上一页最后一条记录的 (rank_score, id)，None表示第一页；按分数键集分页，翻页不需要 OFFSET
         
     Returns:
-        可提交Alpha的详细信息列表
+        可提交Alpha的详细信息列表(按 rank_score 从高到低，同分按id)
     """
     # 根据地区确定表名，如果region为None，则使用all_alphas表
     if region is None:
@@ -314,75 +295,61 @@ def query_checkable_alpha_details(
         table_name = f"{region.lower()}_alphas"
     
     try:
-        connection = get_db_connection()
-        if not connection:
-            return []
-        
-        cursor = connection.cursor(dictionary=True)
-        
-        # 构建查询语句
-        base_query = f"""
-        WITH ranked_alphas AS (
-            SELECT *,
-                   ROW_NUMBER() OVER (
-                       PARTITION BY region, universe, delay, name, template
-                       ORDER BY abs(sharp*fitness) DESC
-                   ) AS rn
-            FROM {table_name}  
-            WHERE 1=1
-        """
-        
-        params = []
-        
-        # 根据参数是否为None来决定是否添加查询条件
-        if region is not None:
-            base_query += " AND region = %s"
-            params.append(region)
-        if universe is not None:
-            base_query += " AND universe = %s"
-            params.append(universe)
-        if delay is not None:
-            base_query += " AND delay = %s"
-            params.append(delay)
-        if phase is not None:
-            base_query += " AND phase = %s"
-            params.append(phase)
-        
-        base_query += " AND simulated = 1"
-        
-        # 如果指定了分类，则添加分类条件
-        if category is not None:
-            base_query += " AND category = %s"
-            params.append(category)
-            
-        # 如果指定了neutralization，则添加筛选条件
-        if neutralization is not None:
-            base_query += " AND neutralization = %s"
-            params.append(neutralization)
-            
-        params.extend([passed, sharp_threshold, fitness_threshold])
-            
-        base_query += """
-        )
-        SELECT * FROM ranked_alphas 
-        WHERE rn = 1 AND passed = %s AND sharp >= %s AND fitness >= %s
-        ORDER BY abs(sharp*fitness) DESC 
-        LIMIT 500
-        """
-        
-        cursor.execute(base_query, tuple(params))
-        # logger.info('query_checkable_alpha_details SQL: %s', cursor.statement)
-        results = cursor.fetchall()
-        
-        cursor.close()
-        connection.close()
-        
-        return results
+        with db_connection() as connection:
+            cursor = connection.cursor(dictionary=True)
+
+            # 构建查询语句：从分组最优Alpha表读取按条件筛选后每个分组 abs(sharp*fitness) 最高的记录，
+            # 阶段与neutralization在取分组最优之前筛选
+            rankings, params = best_rankings_subquery(table_name, {
+                'region': region, 'universe': universe, 'delay': delay, 'phase': phase,
+                'neutralization': neutralization,
+            })
+            base_query = f"""
+            SELECT a.*, CAST(r.score AS DOUBLE) AS rank_score
+            FROM {rankings}
+            JOIN {table_name} a ON a.id = r.alpha_row_id
+            WHERE a.simulated = 1
+            """
+
+            # 如果指定了分类，则添加分类条件(同一字段的Alpha分类相同，分组内一致)
+            if category is not None:
+                base_query += " AND a.category = %s"
+                params.append(category)
+
+            params.extend([passed, sharp_threshold, fitness_threshold])
+
+            base_query += " AND a.passed = %s AND a.sharp >= %s AND a.fitness >= %s"
+
+            # rank_score 以 DOUBLE 返回，与 float 列比较时精确相等，翻页不会重复或遗漏同分记录
+            if after is not None:
+                base_query += " AND (r.score < %s OR (r.score = %s AND a.id > %s))"
+                params.extend([after[0], after[0], after[1]])
+
+            base_query += f" ORDER BY r.score DESC, a.id LIMIT {int(limit)}"
+
+            cursor.execute(base_query, tuple(params))
+            # logger.info('query_checkable_alpha_details SQL: %s', cursor.statement)
+            results = cursor.fetchall()
+
+            cursor.close()
+
+            return results
+
     except Exception as e:
         logger.error(f"查询可检查Alpha详情时出错: {e}")
         return []
 
 
+def iter_checkable_alpha_details(chunk_size: int = 1000, **filters) -> Iterator[List[Dict[str, Any]]]:
+    """
+    按 query_checkable_alpha_details 的排序逐块读取全部可检查Alpha(用于导出)，filters 同其查询参数；
+    逐块读取不经过查询缓存，避免导出的大量分页挤掉页面的缓存结果
+    """
+    return iter_keyset_chunks(lambda after, limit: query_checkable_alpha_details.__wrapped__(limit=limit, after=after, **filters),
+                              key=lambda row: (row['rank_score'], row['id']), chunk_size=chunk_size)
+
+
+@cached_query
 def query_submittable_alpha_stats(region: str = None, universe: str = None, delay: int = None, phase: str = None) -> List[Dict[str, Any]]:
     """
     查询可提交的Alpha统计数据（按分类分组）
@@ -403,50 +370,48 @@ def query_submittable_alpha_stats(region: str = None, universe: str = None, dela
         table_name = f"{region.lower()}_alphas"
     
     try:
-        connection = get_db_connection()
-        if not connection:
-            return []
-        
-        cursor = connection.cursor(dictionary=True)
-        
-        # 构建查询语句
-        query = f"""
-        SELECT category, COUNT(*) as count 
-        FROM {table_name} 
-        WHERE 1=1
-        """
-        params = []
-        
-        # 根据参数是否为None来决定是否添加查询条件
-        if region is not None:
-            query += " AND region = %s"
-            params.append(region)
-        if universe is not None:
-            query += " AND universe = %s"
-            params.append(universe)
-        if delay is not None:
-            query += " AND delay = %s"
-            params.append(delay)
-        if phase is not None:
-            query += " AND phase = %s"
-            params.append(phase)
-        
-        query += " AND passed = 1 AND submitted = 0"
-        
-        query += " GROUP BY category ORDER BY count DESC"
-        
-        cursor.execute(query, params)
-        results = cursor.fetchall()
-        
-        cursor.close()
-        connection.close()
-        
-        return results
+        with db_connection() as connection:
+            cursor = connection.cursor(dictionary=True)
+
+            # 构建查询语句
+            query = f"""
+            SELECT category, COUNT(*) as count 
+            FROM {table_name} 
+            WHERE 1=1
+            """
+            params = []
+
+            # 根据参数是否为None来决定是否添加查询条件
+            if region is not None:
+                query += " AND region = %s"
+                params.append(region)
+            if universe is not None:
+                query += " AND universe = %s"
+                params.append(universe)
+            if delay is not None:
+                query += " AND delay = %s"
+                params.append(delay)
+            if phase is not None:
+                query += " AND phase = %s"
+                params.append(phase)
+
+            query += " AND passed = 1 AND submitted = 0"
+
+            query += " GROUP BY category ORDER BY count DESC"
+
+            cursor.execute(query, params)
+            results = cursor.fetchall()
+
+            cursor.close()
+
+            return results
+
     except Exception as e:
         print(f"查询可提交Alpha统计时出错: {e}")
         return []
 
 
+@cached_query
 def query_submittable_alpha_details(region: str = None, universe: str = None, delay: int = None, phase: str = None, category: str = None) -> List[Dict[str, Any]]:
     """
     查询指定分类下可提交的Alpha详细信息
@@ -468,50 +433,47 @@ def query_submittable_alpha_details(region: str = None, universe: str = None, de
         table_name = f"{region.lower()}_alphas"
     
     try:
-        connection = get_db_connection()
-        if not connection:
-            return []
-        
-        cursor = connection.cursor(dictionary=True)
-        
-        # 构建查询语句
-        base_query = f"""
-        SELECT * 
-        FROM {table_name} 
-        WHERE 1=1
-        """
-        params = []
-        
-        # 根据参数是否为None来决定是否添加查询条件
-        if region is not None:
-            base_query += " AND region = %s"
-            params.append(region)
-        if universe is not None:
-            base_query += " AND universe = %s"
-            params.append(universe)
-        if delay is not None:
-            base_query += " AND delay = %s"
-            params.append(delay)
-        if phase is not None:
-            base_query += " AND phase = %s"
-            params.append(phase)
-        
-        base_query += " AND passed = 1 AND submitted = 0"
-        
-        # 如果指定了分类，则添加分类条件
-        if category is not None:
-            base_query += " AND category = %s"
-            params.append(category)
-            
-        base_query += " ORDER BY abs(sharp*fitness) DESC LIMIT 50"
-        
-        cursor.execute(base_query, params)
-        results = cursor.fetchall()
-        
-        cursor.close()
-        connection.close()
-        
-        return results
+        with db_connection() as connection:
+            cursor = connection.cursor(dictionary=True)
+
+            # 构建查询语句
+            base_query = f"""
+            SELECT * 
+            FROM {table_name} 
+            WHERE 1=1
+            """
+            params = []
+
+            # 根据参数是否为None来决定是否添加查询条件
+            if region is not None:
+                base_query += " AND region = %s"
+                params.append(region)
+            if universe is not None:
+                base_query += " AND universe = %s"
+                params.append(universe)
+            if delay is not None:
+                base_query += " AND delay = %s"
+                params.append(delay)
+            if phase is not None:
+                base_query += " AND phase = %s"
+                params.append(phase)
+
+            base_query += " AND passed = 1 AND submitted = 0"
+
+            # 如果指定了分类，则添加分类条件
+            if category is not None:
+                base_query += " AND category = %s"
+                params.append(category)
+
+            base_query += " ORDER BY score DESC LIMIT 50"
+
+            cursor.execute(base_query, params)
+            results = cursor.fetchall()
+
+            cursor.close()
+
+            return results
+
     except Exception as e:
         logger.error(f"查询可提交Alpha详情时出错: {e}")
         return []
\ No newline at end of file
@@ -0,0 +1,134 @@
+from typing import Any, Dict, List, Tuple
+
+from svc.database import db_connection
+from svc.logger import setup_logger
+from svc.query_cache import invalidate_query_cache
+
+logger = setup_logger(__name__)
+
+ALPHA_RANKINGS_TABLE = "alpha_rankings"
+# 分组字段：同一字段(name)、同一模板的Alpha中只保留 abs(sharp*fitness) 最高的一个参与检查
+RANKING_GROUP_FIELDS = ("region", "universe", "delay", "name", "template")
+# 维护的粒度：分组内再按阶段与中性化方式各保留一个最优记录，查询按阶段/中性化筛选后再取分组最优，
+# 避免更高阶段或其他中性化方式的记录占据分组而使筛选结果缺少该分组
+RANKING_KEY_FIELDS = ("region", "universe", "delay", "phase", "neutralization", "name", "template")
+
+
+def update_alpha_rankings(table_name: str, alpha_ids: List[Any]) -> int:
+    """
+    回测结果写入后更新分组最优Alpha：新分数更高时替换该分组的最优记录
+
+    Args:
+        table_name: 回测记录所在的表
+        alpha_ids: 刚写入回测结果的alpha_id列表
+
+    Returns:
+        受影响的行数
+    """
+    alpha_ids = [alpha_id for alpha_id in alpha_ids if alpha_id]
+    if not alpha_ids:
+        return 0
+
+    try:
+        with db_connection() as connection:
+            cursor = connection.cursor()
+            # 赋值按从左到右执行，alpha_row_id 先与旧分数比较，再更新分数
+            cursor.execute(
+                f"""
+                INSERT INTO {ALPHA_RANKINGS_TABLE}
+                    (table_name, region, universe, delay, phase, neutralization, name, template, alpha_row_id, score)
+                SELECT %s, IFNULL(region, ''), IFNULL(universe, ''), IFNULL(delay, 0), IFNULL(phase, 0),
+                       IFNULL(neutralization, ''), IFNULL(name, ''), IFNULL(template, ''), id, ABS(sharp * fitness)
+                FROM {table_name}
+                WHERE alpha_id IN ({','.join(['%s'] * len(alpha_ids))}) AND simulated = 1 AND sharp IS NOT NULL
+                ON DUPLICATE KEY UPDATE
+                    alpha_row_id = IF(VALUES(score) > score, VALUES(alpha_row_id), alpha_row_id),
+                    score = GREATEST(score, VALUES(score))
+                """,
+                [table_name] + alpha_ids
+            )
+            connection.commit()
+            affected_rows = cursor.rowcount
+            cursor.close()
+            invalidate_query_cache(table_name)
+            return affected_rows
+    except Exception as e:
+        logger.error(f"更新分组最优Alpha失败: {e}")
+        return 0
+
+
+def rebuild_alpha_rankings(table_name: str) -> int:
+    """
+    从回测记录表全量重建分组最优Alpha(首次启用或数据修复时使用)
+
+    Returns:
+        重建后的分组数
+    """
+    try:
+        with db_connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(f"DELETE FROM {ALPHA_RANKINGS_TABLE} WHERE table_name = %s", (table_name,))
+            cursor.execute(
+                f"""
+                INSERT INTO {ALPHA_RANKINGS_TABLE}
+                    (table_name, region, universe, delay, phase, neutralization, name, template, alpha_row_id, score)
+                SELECT %s, region, universe, delay, phase, neutralization, name, template, id, score FROM (
+                    SELECT id, IFNULL(region, '') AS region, IFNULL(universe, '') AS universe, IFNULL(delay, 0) AS delay,
+                           IFNULL(phase, 0) AS phase, IFNULL(neutralization, '') AS neutralization,
+                           IFNULL(name, '') AS name, IFNULL(template, '') AS template,
+                           ABS(sharp * fitness) AS score,
+                           ROW_NUMBER() OVER (
+                               PARTITION BY {', '.join(RANKING_KEY_FIELDS)}
+                               ORDER BY ABS(sharp * fitness) DESC
+                           ) AS rn
+                    FROM {table_name}
+                    WHERE simulated = 1 AND sharp IS NOT NULL AND alpha_id IS NOT NULL
+                ) ranked
+                WHERE rn = 1
+                """,
+                (table_name,)
+            )
+            connection.commit()
+            affected_rows = cursor.rowcount
+            cursor.close()
+            invalidate_query_cache(table_name)
+            logger.info("Rebuilt %s alpha rankings for %s.", affected_rows, table_name)
+            return affected_rows
+    except Exception as e:
+        logger.error(f"重建分组最优Alpha失败: {e}")
+        return 0
+
+
+def best_rankings_subquery(table_name: str, filters: Dict[str, Any]) -> Tuple[str, List[Any]]:
+    """
+    每个分组最优Alpha的子查询：先按 filters 筛选分组最优表，再在每个 RANKING_GROUP_FIELDS 分组中取分数最高的一条
+
+    Args:
+        table_name: 回测记录所在的表
+        filters: {RANKING_KEY_FIELDS中的字段: 值}，值为None的字段不筛选
+
+    Returns:
+        (子查询SQL(含别名r，字段 alpha_row_id、score), 参数列表)
+    """
+    conditions = ["table_name = %s"]
+    params = [table_name]
+    for field, value in filters.items():
+        if field not in RANKING_KEY_FIELDS:
+            raise ValueError(f"不支持的分组最优Alpha筛选字段: {field}")
+        if value is not None:
+            conditions.append(f"{field} = %s")
+            params.append(value)
+
+    sql = f"""(
+                SELECT alpha_row_id, score FROM (
+                    SELECT alpha_row_id, score,
+                           ROW_NUMBER() OVER (
+                               PARTITION BY {', '.join(RANKING_GROUP_FIELDS)}
+                               ORDER BY score DESC, alpha_row_id
+                           ) AS rn
+                    FROM {ALPHA_RANKINGS_TABLE}
+                    WHERE {' AND '.join(conditions)}
+                ) grouped
+                WHERE rn = 1
+            ) r"""
+    return sql, params
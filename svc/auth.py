@@ -1,24 +1,51 @@
+import threading
 import time
 from typing import Optional
 
 import requests
 import streamlit as st
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from svc.logger import setup_logger
+from svc.rate_limit import RateLimiter, get_retry_after
 
 logger = setup_logger(__name__)
 
+# 连接池大小，需不小于同时发送请求的线程数(回测引擎的IO线程数为32)
+DEFAULT_POOL_SIZE = 32
+# 502/503/504 自动重试次数与退避参数(退避秒数 = backoff_factor * 2^(n-1) + 随机抖动)
+HTTP_RETRY_TOTAL = 3
+HTTP_RETRY_BACKOFF = 1.0
+HTTP_RETRY_JITTER = 1.0
+
+def get_rate_limit_config() -> dict:
+    """可选的限速配置，如 [rate_limit.simulations] rate = 1 capacity = 3"""
+    return {family: dict(limit) for family, limit in st.secrets.get("rate_limit", {}).items()}
+
 @st.cache_resource
 def get_auto_login_session():
     username = st.secrets["brain"]["username"]
     password = st.secrets["brain"]["password"]
-    return AutoLoginSession(username, password)
+    pool_size = int(st.secrets["brain"].get("pool_size", DEFAULT_POOL_SIZE))
+    return AutoLoginSession(username, password, rate_limits=get_rate_limit_config(), pool_size=pool_size)
 
 class AutoLoginSession:
-    """自动登录会话，在会话失效时自动重新登录"""
+    """
+    自动登录会话，在会话失效时自动重新登录；所有请求按接口族限速，并遵守429的Retry-After
+
+    线程安全：重新登录由锁保证同一时刻只有一个线程执行，其余线程等待后直接使用新会话；
+    新会话登录成功后才替换旧会话，其他线程不会拿到未登录的会话
+    """
+
+    # 收到429时自动重试的请求方法(幂等)
+    THROTTLE_RETRY_METHODS = ('GET', 'HEAD', 'OPTIONS')
 
-    def __init__(self, username: str = None, password: str = None):
+    def __init__(self, username: str = None, password: str = None, rate_limits: dict = None,
+                 pool_size: int = DEFAULT_POOL_SIZE):
         self._session = None
+        self._login_lock = threading.RLock()
+        self.pool_size = pool_size
         self.last_login_time = 0
         self.login_refresh_interval = 3600 * 12  # 12小时刷新一次登录
         self.retry_count = 0
@@ -26,6 +53,8 @@ class AutoLoginSession:
         self.user_id: Optional[str] = None
         self.username: Optional[str] = username
         self.password: Optional[str] = password  # 添加密码存储字段
+        self.rate_limiter = RateLimiter(rate_limits)
+        self.max_throttle_retries = 3  # 429时最大重试次数
 
         if self.username and self.password:
             self.login()
@@ -41,38 +70,71 @@ class AutoLoginSession:
 
         return self.login()
 
-    def login(self):
-        logger.info("正在登录系统...")
-
-        if not self.username or not self.password:
-            logger.error("无用户名和密码信息")
-            raise ValueError("无用户名和密码信息")
-
-        # 创建新会话
-        self._session = requests.Session()
-        self._session.auth = (self.username, self.password)
-
-        # 发送登录请求
-        response = self._session.post('https://api.worldquantbrain.com/authentication')
-        # logger.info(response.content)
+    def _create_session(self) -> requests.Session:
+        """创建带连接池与502/503/504重试策略的会话"""
+        session = requests.Session()
+        session.auth = (self.username, self.password)
+
+        # 只重试幂等请求，POST(提交回测/提交Alpha)由调用方处理，避免重复提交
+        retry = Retry(
+            total=HTTP_RETRY_TOTAL,
+            status_forcelist=(502, 503, 504),
+            backoff_factor=HTTP_RETRY_BACKOFF,
+            backoff_jitter=HTTP_RETRY_JITTER,
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_size, max_retries=retry)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
 
-        if response.status_code != 201:
-            logger.error("登录失败: %s/%s", self.username, self.password)
-            raise ConnectionError(f"登录失败，状态码: {response.status_code}")
-
-        # 尝试提取用户ID
-        try:
-            response_json = response.json()
-            # logger.info('response_data: %s', response_json)
-            self.user_id = response_json.get('user', {}).get('id', 'UNKNOWN')
-            self.login_refresh_interval = response_json.get('token', {}).get('expiry', 3600 * 4)
-        except Exception:
-            self.user_id = 'UNKNOWN'
-
-        logger.info("登录成功!")
-        self.last_login_time = time.time()
-        self.retry_count = 0
-        return self._session
+    def login(self):
+        with self._login_lock:
+            logger.info("正在登录系统...")
+
+            if not self.username or not self.password:
+                logger.error("无用户名和密码信息")
+                raise ValueError("无用户名和密码信息")
+
+            # 创建新会话，登录成功后再替换旧会话
+            session = self._create_session()
+
+            # 发送登录请求
+            response = session.post('https://api.worldquantbrain.com/authentication')
+            # logger.info(response.content)
+
+            if response.status_code != 201:
+                session.close()
+                logger.error("登录失败: %s", self.username)
+                raise ConnectionError(f"登录失败，状态码: {response.status_code}")
+
+            # 尝试提取用户ID
+            try:
+                response_json = response.json()
+                # logger.info('response_data: %s', response_json)
+                self.user_id = response_json.get('user', {}).get('id', 'UNKNOWN')
+                self.login_refresh_interval = response_json.get('token', {}).get('expiry', 3600 * 4)
+            except Exception:
+                self.user_id = 'UNKNOWN'
+
+            # 原子替换会话；旧会话可能仍有其他线程在使用，不主动关闭
+            self._session = session
+
+            logger.info("登录成功!")
+            self.last_login_time = time.time()
+            self.retry_count = 0
+            return self._session
+
+    def _relogin(self, stale_session):
+        """
+        单次重新登录：多个线程同时发现会话失效时只有一个线程登录，
+        其余线程等待锁后发现会话已被替换，直接返回新会话
+        """
+        with self._login_lock:
+            if self._session is not stale_session and self._session is not None:
+                return self._session
+            return self.login()
 
     def get_time_until_expiry(self) -> int:
         """获取距离登录失效的剩余秒数"""
@@ -84,48 +146,72 @@ class AutoLoginSession:
 
     def ensure_valid_session(self):
         """确保会话有效，必要时重新登录"""
+        session = self._session
         current_time = time.time()
 
         # 检查是否需要刷新登录
-        if (current_time - self.last_login_time > self.login_refresh_interval
+        if (session is None or current_time - self.last_login_time > self.login_refresh_interval
                 or self.retry_count >= self.max_retries):
-            self.login()
+            session = self._relogin(session)
+        return session
 
     def request(self, method, url, **kwargs):
         """发送请求并在会话失效时自动重试登录"""
-        self.ensure_valid_session()
+        session = self.ensure_valid_session()
 
         try:
-            response = self._session.request(method, url, **kwargs)
+            response = self._send(session, method, url, **kwargs)
 
             # 检测到会话失效
             if response.status_code == 401: # , 403
-                print(f"会话过期 ({response.status_code})，尝试重新登录...")
-                self.login()
-                response = self._session.request(method, url, **kwargs)
+                logger.warning("会话过期 (%s)，尝试重新登录...", response.status_code)
+                session = self._relogin(session)
+                response = self._send(session, method, url, **kwargs)
 
             return response
         except requests.ConnectionError:
             self.retry_count += 1
-            print(f"连接失败，重试登录 ({self.retry_count}/{self.max_retries})")
-            self.login()
-            return self._session.request(method, url, **kwargs)
+            logger.warning("连接失败，重试登录 (%s/%s)", self.retry_count, self.max_retries)
+            session = self._relogin(session)
+            return self._send(session, method, url, **kwargs)
+
+    def _send(self, session, method, url, **kwargs):
+        """
+        按接口族限速后发送请求；收到429时按Retry-After暂停该接口族，幂等请求在等待后自动重试
+        """
+        for attempt in range(self.max_throttle_retries + 1):
+            self.rate_limiter.acquire(url)
+            response = session.request(method, url, **kwargs)
+
+            if response.status_code != 429:
+                return response
+
+            # 提交回测的429(并发数超限)没有Retry-After，交给调用方的并发控制处理
+            retryable = method.upper() in self.THROTTLE_RETRY_METHODS
+            if "Retry-After" in response.headers or retryable:
+                self.rate_limiter.on_throttled(url, get_retry_after(response))
+            if not retryable or attempt >= self.max_throttle_retries:
+                return response
+
+        return response
 
     def logout(self):
         """退出登录"""
-        if self._session:
-            self._session.delete("https://api.worldquantbrain.com/authentication")
-            self._session = None
-        self.user_id = None
-        self.last_login_time = 0
+        with self._login_lock:
+            if self._session:
+                self._session.delete("https://api.worldquantbrain.com/authentication")
+                self._session = None
+            self.user_id = None
+            self.last_login_time = 0
         logger.info("已退出登录")
 
     def close(self):
         """关闭会话"""
-        if self._session:
-            self._session.close()
-            self._session = None
-            logger.info("会话已关闭")
+        with self._login_lock:
+            if self._session:
+                self._session.close()
+                self._session = None
+                logger.info("会话已关闭")
 
     # 封装常用的HTTP方法
     def get(self, url, **kwargs):
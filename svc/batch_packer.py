@@ -0,0 +1,112 @@
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+# 可以合并为同一个多Alpha回测的设置字段
+BATCH_KEY_FIELDS = ("region", "universe", "delay")
+
+
+class BatchPacker:
+    """
+    待回测记录的预取缓冲区，按兼容设置(region/universe/delay)分组后打包成满批次
+
+    优先取出优先级最高的满批次；没有满批次时，只有在强制(已无更多记录或缓冲区已满)
+    或分组等待超过 max_wait 秒后才取出不满的批次，尽量让每个回测槽位都跑满 batch_size 个Alpha。
+    """
+
+    def __init__(self, batch_size: int = 10, capacity: int = 30, max_wait: float = 60):
+        """
+        Args:
+            batch_size: 每批Alpha数量
+            capacity: 缓冲区最多预取的记录数
+            max_wait: 不满的分组最长等待秒数
+        """
+        self.batch_size = batch_size
+        self.capacity = capacity
+        self.max_wait = max_wait
+        self._groups: Dict[Tuple, List[Dict[str, Any]]] = {}
+        self._since: Dict[Tuple, float] = {}
+        self._added: Dict[Any, float] = {}  # {记录id: 加入时间}
+
+    def __len__(self):
+        return sum(len(records) for records in self._groups.values())
+
+    @property
+    def free(self) -> int:
+        """缓冲区还能预取的记录数"""
+        return max(self.capacity - len(self), 0)
+
+    def add(self, records: List[Dict[str, Any]]):
+        """加入预取的记录，组内保持加入顺序(即认领时的优先级顺序)"""
+        now = time.monotonic()
+        for record in records:
+            key = tuple(record.get(field) for field in BATCH_KEY_FIELDS)
+            self._groups.setdefault(key, []).append(record)
+            self._since.setdefault(key, now)
+            self._added[record.get('id')] = now
+
+    def _take(self, key) -> List[Dict[str, Any]]:
+        records = self._groups[key]
+        batch, rest = records[:self.batch_size], records[self.batch_size:]
+        if rest:
+            self._groups[key] = rest
+        else:
+            self._groups.pop(key)
+            self._since.pop(key, None)
+        for record in batch:
+            self._added.pop(record.get('id'), None)
+        return batch
+
+    @staticmethod
+    def _group_priority(records: List[Dict[str, Any]]) -> float:
+        return max((record.get('priority') or 0) for record in records)
+
+    def pop_batch(self, force: bool = False) -> Optional[List[Dict[str, Any]]]:
+        """
+        取出一个待提交的批次
+
+        Args:
+            force: 没有满批次时是否取出不满的批次
+
+        Returns:
+            记录列表，暂无可提交的批次时返回None
+        """
+        if not self._groups:
+            return None
+
+        full = [key for key, records in self._groups.items() if len(records) >= self.batch_size]
+        if full:
+            return self._take(max(full, key=lambda key: self._group_priority(self._groups[key])))
+
+        now = time.monotonic()
+        expired = [key for key in self._groups if now - self._since[key] >= self.max_wait]
+        candidates = list(self._groups) if force or self.free == 0 else expired
+        if not candidates:
+            return None
+        return self._take(max(candidates, key=lambda key: (len(self._groups[key]), self._group_priority(self._groups[key]))))
+
+    def drain(self) -> List[Dict[str, Any]]:
+        """清空缓冲区并返回其中所有记录"""
+        records = [record for group in self._groups.values() for record in group]
+        self._groups.clear()
+        self._since.clear()
+        self._added.clear()
+        return records
+
+    def drain_stale(self, max_age: float) -> List[Dict[str, Any]]:
+        """取出在缓冲区中超过 max_age 秒的记录(认领租约即将过期，需释放后重新认领)"""
+        now = time.monotonic()
+        stale = []
+        for key in list(self._groups):
+            fresh = []
+            for record in self._groups[key]:
+                if now - self._added.get(record.get('id'), now) > max_age:
+                    stale.append(record)
+                    self._added.pop(record.get('id'), None)
+                else:
+                    fresh.append(record)
+            if fresh:
+                self._groups[key] = fresh
+            else:
+                self._groups.pop(key)
+                self._since.pop(key, None)
+        return stale
@@ -1,6 +1,7 @@
 import json
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from typing import Any, Dict, List
 
 import streamlit as st
@@ -8,11 +9,21 @@ import streamlit as st
 from ai.alpha_desc_updater import update_brain_alpha_desc
 from svc.alpha_query import query_checkable_alpha_details
 from svc.auth import get_auto_login_session, AutoLoginSession
+from svc.check_cache import lookup_check_cache, store_check_result
 from svc.database import update_table
 from svc.logger import setup_logger
+from svc.rate_limit import get_retry_after
+from svc.self_correlation import prescreen_self_correlation
 
 logger = setup_logger(__name__)
 
+# 同时进行的Alpha检查数
+CHECK_WORKERS = 8
+# 检查结果中表示已达到提交上限的项
+SUBMISSION_LIMIT_CHECKS = ('D0_SUBMISSION', 'REGULAR_SUBMISSION')
+# 检查进行中且响应缺少有效 Retry-After 时的等待秒数
+CHECK_RETRY_AFTER = 60
+
 @st.cache_resource
 def get_check_task_manager():
     return CheckTaskManager()
@@ -30,7 +41,7 @@ class CheckTaskManager:
             "details": "Preparing...",
         }
 
-    def start(self, records: List[Dict[str, Any]], query:dict[str, Any]):
+    def start(self, records: List[Dict[str, Any]], query:dict[str, Any], max_workers: int = CHECK_WORKERS):
         self.status.update({
             "query": query,
             "stop": False,
@@ -39,27 +50,37 @@ class CheckTaskManager:
         })
 
         if not self.thread or not self.thread.is_alive():
-            self.thread = threading.Thread(target=check_one_batch, args=(records, self.status, self), daemon=True)
+            self.thread = threading.Thread(target=check_one_batch, args=(records, self.status, self, max_workers),
+                                           daemon=True)
             self.thread.start()
 
 
-def check_one_batch(alpha_list, task: dict, manager=None):
+def check_one_batch(alpha_list, task: dict, manager=None, max_workers: int = CHECK_WORKERS, prescreen: bool = True):
     """
     检查并可能提交一批alpha策略。
 
+    最多 max_workers 个Alpha同时检查，每个Alpha检查完成后立即将结果写回数据库；
+    用户停止或达到提交上限时不再发起新的检查，进行中的检查在下一次等待时退出。
+    检查结果缓存中未过期且有未通过检查项的Alpha直接使用缓存结果，不再向平台检查；
+    缓存中全部通过的Alpha仍向平台检查，以获得当前的提交数量检查项(D0/REGULAR_SUBMISSION)判断是否达到提交上限。
+    检查前先用本地PnL估算与已提交Alpha的自相关性，过滤很可能不通过的Alpha，其余按自相关性从低到高检查。
+
     参数:
     - alpha_list: 一个包含alpha策略信息的列表。
-    - s: 一个表示当前会话或状态的对象。
     - task: 一个包含任务相关信息的字典。
     - manager: CheckTaskManager实例，用于在线程结束后将self.thread设为None
+    - max_workers: 同时进行的检查数
+    - prescreen: 是否先用本地PnL预筛自相关性
 
     返回:
     - 是否中止: 如果任务完成(提交了4个alpha或者出现不能继续的错误)或被人为停止，则返回True，否则返回False。
     """
-    # 初始化已提交计数
-    passed_count = task.get('passed_count', 0)
     session = get_auto_login_session()
     time_start = time.time()
+    passed_count = 0
+    finished = 0
+    aborted = False
+    table_name = f"{task.get('query').get('region').lower()}_alphas" if task.get('query').get('region') else 'all_alphas'
 
     task.update({
         "status": "RUNNING",
@@ -69,89 +90,126 @@ def check_one_batch(alpha_list, task: dict, manager=None):
         "details": "Preparing...",
     })
 
-    # 遍历alpha列表
-    for i, record in enumerate(alpha_list):
-        # 检查任务是否被停止
+    if prescreen:
+        try:
+            alpha_list, rejected = prescreen_self_correlation(session, alpha_list, task.get('query').get('region'))
+            task["prescreen_rejected"] = len(rejected)
+        except Exception as e:
+            logger.error(f"Self-correlation prescreen failed: {e}", exc_info=True)
+
+    cached_checks = {alpha_id: checks
+                     for alpha_id, checks in lookup_check_cache([record['alpha_id'] for record in alpha_list]).items()
+                     if any(check.get('result') == 'FAIL' for check in checks)}
+    task.update({
+        "progress": f'0 / {len(alpha_list)}',
+        "cached_count": len(cached_checks),
+    })
+
+    records = iter(alpha_list)
+    in_flight = set()
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="check") as executor:
+        while True:
+            # 补充进行中的检查，直到达到并发上限或已无待检查的Alpha
+            while not task.get('stop') and len(in_flight) < max_workers:
+                record = next(records, None)
+                if record is None:
+                    break
+                in_flight.add(executor.submit(check_record, session, record, task,
+                                              cached_checks.get(record['alpha_id'])))
+
+            if not in_flight:
+                break
+
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                finished += 1
+                try:
+                    record, success, fail_reasons = future.result()
+                except Exception as e:
+                    logger.error(f"Check alpha failed: {e}", exc_info=True)
+                    continue
+
+                if success is None:
+                    continue
+
+                fail_reason_names = [reason.get('name') for reason in fail_reasons]
+                if 'ALREADY_SUBMITTED' in fail_reason_names:
+                    # Alpha wrbOq51 check passed: False, Fail reasons: [{'name': 'ALREADY_SUBMITTED', 'result': 'FAIL'}]
+                    update_table(f"{record['region'].lower()}_alphas", {'alpha_id': record['alpha_id']},
+                                 {'passed': 1, 'submitted': 1})
+                    continue
+
+                if not success:
+                    continue
+
+                # 检查是否达到常规提交限制 [{'name': 'D0_SUBMISSION', 'result': 'FAIL', 'limit': 30, 'value': 30}, {'name': 'REGULAR_SUBMISSION', 'result': 'FAIL', 'limit': 4, 'value': 4}]
+                if any(reason.get('name') in SUBMISSION_LIMIT_CHECKS and reason.get('result') == 'FAIL'
+                       for reason in fail_reasons):
+                    if not aborted:
+                        logger.warning("SUBMISSION limit reached, breaking...")
+                        task.update({
+                            "status": "COMPLETED",
+                            "stop": True,
+                            "details": "SUBMISSION limit reached"
+                        })
+                        aborted = True
+                    continue
+
+                passed_count += 1 if len(fail_reasons) == 0 else 0
+                update_table(table_name, {'id': record['id']}, {
+                    'passed': 1 if len(fail_reasons) == 0 else -1,
+                    'fail_reasons': json.dumps(fail_reasons)
+                })
+
+            # 更新任务进度
+            task.update({
+                "time_used": round(time.time() - time_start),
+                "progress": f'{finished} / {len(alpha_list)}',
+                "passed_count": passed_count,
+            })
+            if not aborted:
+                task["details"] = f"Processing {finished} out of {len(alpha_list)} Alphas"
+
+    if not aborted:
         if task.get('stop'):
-            # 更新任务状态为停止，并返回True
             task.update({
                 "status": "STOPPED",
                 "details": "Stopped by user"
             })
-            
-            # 任务完成后将manager.thread设为None
-            if manager:
-                manager.thread = None
-                
-            return True
-
-        if not update_brain_alpha_desc(session, record['alpha_id'], record['name']):
-            continue
-
-        # 检查alpha策略的有效性
-        success, fail_reasons = check_alpha(session, record['alpha_id'], task=task)
-        logger.info(f"Alpha {record['alpha_id']} check passed: {len(fail_reasons) == 0}, Fail reasons: {fail_reasons}")
-
-        fail_reason_names = [reason.get('name') for reason in fail_reasons]
-        if 'ALREADY_SUBMITTED' in fail_reason_names:
-            # Alpha wrbOq51 check passed: False, Fail reasons: [{'name': 'ALREADY_SUBMITTED', 'result': 'FAIL'}]
-            update_table(
-                f"{record['region'].lower()}_alphas",
-                {'alpha_id': record['alpha_id']},
-                {'passed': 1, 'submitted': 1}
-            )
-            continue
-
-        if success:
-            # 检查是否达到常规提交限制 [{'name': 'D0_SUBMISSION', 'result': 'FAIL', 'limit': 30, 'value': 30}, {'name': 'REGULAR_SUBMISSION', 'result': 'FAIL', 'limit': 4, 'value': 4}]
-            submission_limits = ['D0_SUBMISSION', 'REGULAR_SUBMISSION']
-            if any(reason.get('name') in submission_limits and reason.get('result') == 'FAIL' for reason in fail_reasons):
-            # if fail_reasons == [{'name': 'REGULAR_SUBMISSION', 'result': 'FAIL', 'limit': 4, 'value': 4}]:
-                logger.warning("SUBMISSION limit reached, breaking...")
-                task.update({
-                    "status": "COMPLETED",
-                    "stop": True,
-                    "details": "SUBMISSION limit reached"
-                })
-                
-                # 任务完成后将manager.thread设为None
-                if manager:
-                    manager.thread = None
-                    
-                return True
-
-            # 准备要更新的数据
-            set_data = {
-                'passed': 1 if len(fail_reasons) == 0 else -1,
-                'fail_reasons': json.dumps(fail_reasons)
-            }
-
-            passed_count += 1 if len(fail_reasons) == 0 else 0
-
-            # 更新数据库
-            table_name = f'{task.get('query').get('region').lower()}_alphas' if task.get('query').get('region') else 'all_alphas'
-            update_table(table_name, {'id': record['id']}, set_data)
-
-        # 更新任务进度
-        task.update({
-            "time_used": round(time.time() - time_start),
-            "progress": f'{i + 1} / {len(alpha_list)}',
-            "passed_count": passed_count,
-            "details": f"Processing {i+1} out of {len(alpha_list)} Alphas"
-        })
+        else:
+            task.update({
+                "status": "COMPLETED",
+                "stop": True,
+                "details": "All alphas checked"
+            })
 
-    # 如果所有alphas都被处理，则返回False
-    task.update({
-        "status": "COMPLETED",
-        "stop": True,
-        "details": "All alphas checked"
-    })
-    
     # 任务完成后将manager.thread设为None
     if manager:
         manager.thread = None
-        
-    return False
+
+    return aborted or task.get('status') == "STOPPED"
+
+
+def check_record(session: AutoLoginSession, record: Dict[str, Any], task: dict,
+                 cached_checks: List[Dict[str, Any]] = None):
+    """
+    更新Alpha描述后检查单个Alpha，有缓存的检查结果时直接使用缓存
+
+    Returns:
+        (record, 是否检查成功, 失败原因)；描述更新失败时是否检查成功为None
+    """
+    if task.get('stop'):
+        return record, False, [{'name': 'STOPPED_BY_USER'}]
+
+    if cached_checks is not None:
+        return record, True, [check for check in cached_checks if check.get('result') == 'FAIL']
+
+    if not update_brain_alpha_desc(session, record['alpha_id'], record['name']):
+        return record, None, []
+
+    success, fail_reasons = check_alpha(session, record['alpha_id'], task=task)
+    logger.info(f"Alpha {record['alpha_id']} check passed: {len(fail_reasons) == 0}, Fail reasons: {fail_reasons}")
+    return record, success, fail_reasons
 
 
 def check_alpha(s: AutoLoginSession, alpha_id, task:dict):
@@ -161,14 +219,10 @@ def check_alpha(s: AutoLoginSession, alpha_id, task:dict):
     response = s.get(url)
     logger.info(f"Alpha {alpha_id} check status: {response.status_code}")
 
-    try_count = 0
-    while response.status_code == 504:
-        try_count += 1
-        logger.warning(f"504 Gateway Timeout for CHECK. Retrying...{try_count}")
-        time.sleep(1)
-        response = s.get(url)
-        if try_count > 3:
-            return False, [{'name': '504_GATEWAY_TIMEOUT'}]
+    # 504 已由会话的重试策略按退避重试，仍为504时放弃
+    if response.status_code == 504:
+        logger.warning("504 Gateway Timeout for CHECK alpha %s.", alpha_id)
+        return False, [{'name': '504_GATEWAY_TIMEOUT'}]
 
     while "retry-after" in response.headers and not task.get('stop'):
 
@@ -181,9 +235,14 @@ def check_alpha(s: AutoLoginSession, alpha_id, task:dict):
             # "details": f"Alpha {alpha_id} is checking. Waiting..."
         })
         logger.info(f"Alpha {alpha_id} is checking. Waiting...  {round(time.time() - time_start)}")
-        time.sleep(60) # float(response.headers["Retry-After"])
+        if not wait_unless_stopped(task, get_retry_after(response, CHECK_RETRY_AFTER)):
+            break
         response = s.get(url)
 
+    if "retry-after" in response.headers:
+        # 检查尚未完成就被停止，响应中没有检查结果
+        return False, [{'name': 'STOPPED_BY_USER'}]
+
     if response.status_code == 200:
         try:
             data = response.json()
@@ -191,6 +250,7 @@ def check_alpha(s: AutoLoginSession, alpha_id, task:dict):
             checks = data.get('is', {}).get('checks', [])
             # passed = all(item["result"] == "PASS" for item in checks)
             fail_reasons = [check for check in checks if check.get('result') == 'FAIL']
+            store_check_result(alpha_id, checks)
 
             return True, fail_reasons
         except json.JSONDecodeError:
@@ -199,4 +259,15 @@ def check_alpha(s: AutoLoginSession, alpha_id, task:dict):
     else:
         logger.error(f"Failed to check alpha {alpha_id} status_code: {response.status_code}")
         logger.error(f"Failed to check alpha {alpha_id} response content: {response.content.decode('utf-8') if response.content else 'Empty response'}")
-        return False, [{'name': f'{response.status_code}_ERROR'}]
\ No newline at end of file
+        return False, [{'name': f'{response.status_code}_ERROR'}]
+
+
+def wait_unless_stopped(task: dict, seconds: float, step: float = 1.0) -> bool:
+    """等待 seconds 秒，期间任务被停止时立即返回False"""
+    deadline = time.time() + seconds
+    while not task.get('stop'):
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            return True
+        time.sleep(min(step, remaining))
+    return False
@@ -0,0 +1,128 @@
+import json
+from typing import Any, Dict, List, Optional
+
+from svc.database import db_connection
+from svc.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+CHECK_CACHE_TABLE = "check_cache"
+# 检查结果的有效秒数，超时后重新向平台检查
+CHECK_CACHE_TTL = 6 * 3600
+# 表示账号提交数量的检查项，是账号级别的状态而不是Alpha自身的检查结果，不随结果缓存
+SUBMISSION_CHECK_NAMES = ('D0_SUBMISSION', 'REGULAR_SUBMISSION')
+
+
+def split_submission_checks(checks: List[Dict[str, Any]]) -> tuple:
+    """
+    将检查结果拆分为Alpha自身的检查项与提交数量上下文
+
+    Returns:
+        (Alpha自身的检查项列表, {提交数量检查项名: 已提交数量})
+    """
+    alpha_checks = [check for check in checks if check.get('name') not in SUBMISSION_CHECK_NAMES]
+    context = {check['name']: check.get('value') for check in checks if check.get('name') in SUBMISSION_CHECK_NAMES}
+    return alpha_checks, context
+
+
+def is_cacheable(checks: List[Dict[str, Any]]) -> bool:
+    """检查结果中仍有未完成(PENDING)的检查项时不缓存"""
+    return bool(checks) and all(check.get('result') != 'PENDING' for check in checks)
+
+
+def lookup_check_cache(alpha_ids: List[str], ttl: int = CHECK_CACHE_TTL) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    查找未过期的检查结果
+
+    Returns:
+        {alpha_id: Alpha自身的检查项列表}
+    """
+    alpha_ids = list({alpha_id for alpha_id in alpha_ids if alpha_id})
+    if not alpha_ids:
+        return {}
+
+    try:
+        with db_connection() as connection:
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute(
+                f"SELECT alpha_id, checks FROM {CHECK_CACHE_TABLE} "
+                f"WHERE alpha_id IN ({','.join(['%s'] * len(alpha_ids))}) "
+                f"AND checked_at > DATE_SUB(NOW(), INTERVAL %s SECOND)",
+                alpha_ids + [ttl]
+            )
+            cached = {row['alpha_id']: json.loads(row['checks']) for row in cursor.fetchall()}
+            cursor.close()
+            return cached
+    except Exception as e:
+        logger.error(f"查询检查结果缓存失败: {e}")
+        return {}
+
+
+def store_check_result(alpha_id: str, checks: List[Dict[str, Any]]) -> bool:
+    """
+    写入一个Alpha的检查结果
+
+    提交数量上下文与已缓存结果不一致时(在其他地方提交了Alpha)，说明已提交集合已变化，
+    依赖已提交集合的检查项(如自相关性)可能已失效，先清空整个缓存再写入。
+    """
+    alpha_checks, context = split_submission_checks(checks)
+    if not is_cacheable(alpha_checks):
+        return False
+
+    try:
+        with db_connection() as connection:
+            cursor = connection.cursor()
+            if context and _submission_context_changed(cursor, context):
+                logger.info("Submission count changed %s, invalidating check cache.", context)
+                cursor.execute(f"DELETE FROM {CHECK_CACHE_TABLE}")
+
+            cursor.execute(
+                f"INSERT INTO {CHECK_CACHE_TABLE} (alpha_id, checks, submission_context, checked_at) "
+                f"VALUES (%s, %s, %s, NOW()) "
+                f"ON DUPLICATE KEY UPDATE checks = VALUES(checks), submission_context = VALUES(submission_context), "
+                f"checked_at = VALUES(checked_at)",
+                (alpha_id, json.dumps(alpha_checks), json.dumps(context) if context else None)
+            )
+            connection.commit()
+            cursor.close()
+            return True
+    except Exception as e:
+        logger.error(f"写入检查结果缓存失败 {alpha_id}: {e}")
+        return False
+
+
+def _submission_context_changed(cursor, context: Dict[str, Any]) -> bool:
+    cursor.execute(
+        f"SELECT DISTINCT submission_context FROM {CHECK_CACHE_TABLE} WHERE submission_context IS NOT NULL"
+    )
+    for (row,) in cursor.fetchall():
+        cached = json.loads(row)
+        if any(name in cached and cached[name] != value for name, value in context.items()):
+            return True
+    return False
+
+
+def invalidate_check_cache(alpha_ids: Optional[List[str]] = None) -> int:
+    """
+    清除检查结果缓存，已提交集合变化(提交了新的Alpha)时调用
+
+    Args:
+        alpha_ids: 只清除这些Alpha的结果，为None时清除全部
+    """
+    try:
+        with db_connection() as connection:
+            cursor = connection.cursor()
+            if alpha_ids:
+                cursor.execute(
+                    f"DELETE FROM {CHECK_CACHE_TABLE} WHERE alpha_id IN ({','.join(['%s'] * len(alpha_ids))})",
+                    list(alpha_ids)
+                )
+            else:
+                cursor.execute(f"DELETE FROM {CHECK_CACHE_TABLE}")
+            connection.commit()
+            affected_rows = cursor.rowcount
+            cursor.close()
+            return affected_rows
+    except Exception as e:
+        logger.error(f"清除检查结果缓存失败: {e}")
+        return 0
@@ -0,0 +1,101 @@
+import math
+import threading
+import time
+from typing import Any, Dict
+
+
+class AIMDController:
+    """
+    AIMD(加性增、乘性减)并发控制器
+
+    控制同时进行的回测数量：每次提交成功后窗口缓慢增大(约每个窗口的成功数+1)，
+    收到429(CONCURRENT_SIMULATION_LIMIT_EXCEEDED)时窗口减半，
+    因此偶发的429只会暂时降低并发，之后会重新向上探测。线程安全，可被多个任务共享。
+    """
+
+    def __init__(self, initial_window: float = 8, min_window: float = 1, max_window: float = 10,
+                 increase: float = 1.0, decrease: float = 0.5, backoff_cooldown: float = 5.0):
+        """
+        Args:
+            initial_window: 初始窗口大小
+            min_window: 窗口下限
+            max_window: 窗口上限
+            increase: 每个窗口的成功提交后窗口增加的量
+            decrease: 收到429时窗口乘以的系数
+            backoff_cooldown: 两次减小窗口之间的最短秒数，避免同一波429连续减半
+        """
+        self.min_window = min_window
+        self.max_window = max_window
+        self.increase = increase
+        self.decrease = decrease
+        self.backoff_cooldown = backoff_cooldown
+        self._window = float(min(max(initial_window, min_window), max_window))
+        self._in_flight = 0
+        self._last_backoff = 0.0
+        self._stats = {"successes": 0, "throttles": 0, "backoffs": 0}
+        self._lock = threading.Lock()
+
+    @property
+    def window(self) -> int:
+        """当前允许同时进行的回测数量"""
+        with self._lock:
+            return self._limit()
+
+    @property
+    def in_flight(self) -> int:
+        with self._lock:
+            return self._in_flight
+
+    def _limit(self) -> int:
+        return max(int(math.floor(self._window)), int(self.min_window))
+
+    def has_capacity(self) -> bool:
+        with self._lock:
+            return self._in_flight < self._limit()
+
+    def try_acquire(self) -> bool:
+        """占用一个槽位，窗口已满时返回False"""
+        with self._lock:
+            if self._in_flight >= self._limit():
+                return False
+            self._in_flight += 1
+            return True
+
+    def force_acquire(self):
+        """不受窗口限制地占用一个槽位，用于接管已在平台上运行的回测"""
+        with self._lock:
+            self._in_flight += 1
+
+    def release(self):
+        """回测结束或提交失败后释放槽位"""
+        with self._lock:
+            self._in_flight = max(self._in_flight - 1, 0)
+
+    def on_success(self):
+        """提交成功：窗口加性增大"""
+        with self._lock:
+            self._stats["successes"] += 1
+            self._window = min(self._window + self.increase / max(self._window, 1.0), self.max_window)
+
+    def on_throttled(self):
+        """收到429：窗口乘性减小(冷却时间内只减小一次)"""
+        with self._lock:
+            self._stats["throttles"] += 1
+            now = time.time()
+            if now - self._last_backoff < self.backoff_cooldown:
+                return
+            self._last_backoff = now
+            self._stats["backoffs"] += 1
+            self._window = max(self._window * self.decrease, self.min_window)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """返回当前窗口与统计信息，用于状态展示"""
+        with self._lock:
+            return {
+                "window": self._limit(),
+                "window_exact": round(self._window, 2),
+                "in_flight": self._in_flight,
+                "min_window": self.min_window,
+                "max_window": self.max_window,
+                **self._stats,
+            }
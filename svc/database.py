@@ -1,45 +1,61 @@
-from typing import Dict, Any, List, Optional
-
-import mysql.connector
-import streamlit as st
+import itertools
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Iterable, Iterator, Callable
 
+from svc.db_pool import get_db_pool, PooledConnection
 from svc.logger import setup_logger
+from svc.query_cache import invalidate_query_cache
 
 logger = setup_logger(__name__)
 
 
-# @st.cache_resource
-def get_db_connection():
+def get_db_connection() -> Optional[PooledConnection]:
     """
-    创建并返回数据库连接
+    从连接池借出并返回数据库连接，connection.close() 会将连接归还连接池
     """
     try:
-        connection = mysql.connector.connect(
-            host=st.secrets["mysql"]["host"],
-            port=st.secrets["mysql"]["port"],
-            database=st.secrets["mysql"]["database"],
-            user=st.secrets["mysql"]["username"],
-            password=st.secrets["mysql"]["password"]
-        )
-        return connection
+        pool = get_db_pool()
+        return PooledConnection(pool, pool.acquire())
     except Exception as e:
         print(f"数据库连接失败: {e}")
         # 数据库连接失败: 2013: Lost connection to MySQL server during query
         return None
 
+
+@contextmanager
+def db_connection():
+    """
+    以上下文管理器方式从连接池借出连接，退出时自动归还
+
+    Example:
+        with db_connection() as connection:
+            cursor = connection.cursor(dictionary=True)
+    """
+    with get_db_pool().connection() as connection:
+        yield connection
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    """
+    返回数据库连接池统计信息(checkouts/waits/creates等)
+    """
+    return get_db_pool().stats()
+
+
 def query_by_sql(sql: str) -> List[Dict[str, Any]]:
     """
     :param sql:
     :return:
     """
     try:
-        connection = get_db_connection()
-        if not connection:
-            return []
-        cursor = connection.cursor(dictionary=True)
-        cursor.execute(sql)
-        results = cursor.fetchall()
-        return results
+        with db_connection() as connection:
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute(sql)
+            results = cursor.fetchall()
+            cursor.close()
+            return results
+
     except Exception as e:
         print(f"查询数据库时出错: {e}")
         return []
@@ -59,176 +75,171 @@ def query_table(table_name: str, conditions: Dict[str, Any], limit: Optional[int
         查询结果列表，每个元素是一个字典，表示一行记录
     """
     try:
-        connection = get_db_connection()
-        if not connection:
-            return []
-        
-        cursor = connection.cursor(dictionary=True)
-        
-        # 构建WHERE子句
-        where_clauses = []
-        params = []
-        
-        for key, value in conditions.items():
-            if value is not None:
-                # 如果值是列表，使用IN操作符
-                if isinstance(value, list):
-                    if value:  # 确保列表不为空
-                        placeholders = ','.join(['%s'] * len(value))
-                        where_clauses.append(f"{key} IN ({placeholders})")
-                        params.extend(value)
+        with db_connection() as connection:
+            cursor = connection.cursor(dictionary=True)
+
+            # 构建WHERE子句
+            where_clauses = []
+            params = []
+
+            for key, value in conditions.items():
+                if value is not None:
+                    # 如果值是列表，使用IN操作符
+                    if isinstance(value, list):
+                        if value:  # 确保列表不为空
+                            placeholders = ','.join(['%s'] * len(value))
+                            where_clauses.append(f"{key} IN ({placeholders})")
+                            params.extend(value)
+                        else:
+                            # 如果列表为空，则不添加此条件
+                            pass
                     else:
-                        # 如果列表为空，则不添加此条件
-                        pass
-                else:
-                    # 单个值使用=操作符
-                    where_clauses.append(f"{key} = %s")
-                    params.append(value)
-            # 如果值为None，则跳过此条件，不添加到查询中
-        
-        # 构建SQL查询语句
-        query = f"SELECT * FROM {table_name}"
-        
-        if where_clauses:
-            query += " WHERE " + " AND ".join(where_clauses)
-        
-        query += " ORDER BY region"
-
-        # 添加LIMIT和OFFSET
-        if limit is not None:
-            query += f" LIMIT {limit}"
-            if offset is not None:
-                query += f" OFFSET {offset}"
-        
-        # 执行查询
-        cursor.execute(query, params)
-        logger.info(f"Executing query: {cursor.statement}")
-        results = cursor.fetchall()
-        
-        cursor.close()
-        connection.close()
-        
-        return results
-    
+                        # 单个值使用=操作符
+                        where_clauses.append(f"{key} = %s")
+                        params.append(value)
+                # 如果值为None，则跳过此条件，不添加到查询中
+
+            # 构建SQL查询语句
+            query = f"SELECT * FROM {table_name}"
+
+            if where_clauses:
+                query += " WHERE " + " AND ".join(where_clauses)
+
+            query += " ORDER BY region"
+
+            # 添加LIMIT和OFFSET
+            if limit is not None:
+                query += f" LIMIT {limit}"
+                if offset is not None:
+                    query += f" OFFSET {offset}"
+
+            # 执行查询
+            cursor.execute(query, params)
+            logger.info(f"Executing query: {cursor.statement}")
+            results = cursor.fetchall()
+
+            cursor.close()
+
+            return results
+
     except Exception as e:
         print(f"查询数据库时出错: {e}")
         return []
 
 
-def update_table(table_name: str, conditions: Dict[str, Any], updates: Dict[str, Any]) -> int:
+def query_table_page(table_name: str, conditions: Dict[str, Any], after_id: Optional[int] = None,
+                     limit: int = 500) -> List[Dict[str, Any]]:
     """
-    通用的数据更新方法
-    
+    按 id 键集分页查询：WHERE id > after_id ORDER BY id LIMIT n，翻到任意深度的页都只读取一页数据，
+    不像 LIMIT n OFFSET m 需要先扫描并丢弃前 m 行
+
     Args:
         table_name: 表名
-        conditions: 更新条件字典，用于确定哪些记录需要被更新
-        updates: 更新字段字典，键为字段名，值为要更新的值
-                例如: {'conditions': {'id': 1}, 'updates': {'name': 'new_name'}}
-    
+        conditions: 查询条件字典，值为None的条件跳过，值为列表时使用IN操作符
+        after_id: 上一页最后一条记录的id，None表示第一页
+        limit: 每页记录数
+
     Returns:
-        受影响的行数
+        本页记录列表，下一页的 after_id 为本页最后一条记录的id
     """
     try:
-        connection = get_db_connection()
-        if not connection:
-            return 0
-        
-        cursor = connection.cursor()
-        
-        # 构建SET子句
-        set_clauses = []
-        update_params = []
-        
-        for key, value in updates.items():
-            set_clauses.append(f"{key} = %s")
-            update_params.append(value)
-        
-        # 构建WHERE子句
-        where_clauses = []
-        condition_params = []
-        
-        for key, value in conditions.items():
-            if value is not None:
-                # 如果值是列表，使用IN操作符
-                if isinstance(value, list):
-                    if value:  # 确保列表不为空
-                        placeholders = ','.join(['%s'] * len(value))
-                        where_clauses.append(f"{key} IN ({placeholders})")
-                        condition_params.extend(value)
-                    else:
-                        # 如果列表为空，则不添加此条件
-                        pass
-                else:
-                    # 单个值使用=操作符
-                    where_clauses.append(f"{key} = %s")
-                    condition_params.append(value)
-            # 如果值为None，则跳过此条件，不添加到查询中
-        
-        # 构建完整的UPDATE语句
-        set_clause = ", ".join(set_clauses)
-        where_clause = " AND ".join(where_clauses)
-        
-        query = f"UPDATE {table_name} SET {set_clause}"
-        if where_clause:
-            query += f" WHERE {where_clause}"
-        
-        # 合并参数
-        params = update_params + condition_params
-        
-        # 执行更新
-        cursor.execute(query, params)
-        logger.debug(f"Executing query: {cursor.statement}")
-        affected_rows = cursor.rowcount
-        
-        connection.commit()
-        cursor.close()
-        connection.close()
-        
-        return affected_rows
-    
+        with db_connection() as connection:
+            cursor = connection.cursor(dictionary=True)
+
+            where_clause, params = _build_condition_clause({k: v for k, v in conditions.items() if v is not None})
+            if after_id is not None:
+                where_clause += " AND id > %s"
+                params.append(after_id)
+
+            cursor.execute(f"SELECT * FROM {table_name} WHERE {where_clause} ORDER BY id LIMIT {int(limit)}", params)
+            results = cursor.fetchall()
+            cursor.close()
+            return results
+
     except Exception as e:
-        print(f"更新数据库时出错: {e}")
+        print(f"分页查询数据库时出错: {e}")
+        return []
+
+
+def count_table(table_name: str, conditions: Dict[str, Any]) -> int:
+    """
+    统计满足条件的记录数，条件规则同 query_table_page
+    """
+    try:
+        with db_connection() as connection:
+            cursor = connection.cursor()
+            where_clause, params = _build_condition_clause({k: v for k, v in conditions.items() if v is not None})
+            cursor.execute(f"SELECT COUNT(*) FROM {table_name} WHERE {where_clause}", params)
+            (count,) = cursor.fetchone()
+            cursor.close()
+            return count
+
+    except Exception as e:
+        print(f"统计数据库记录时出错: {e}")
         return 0
 
 
-def batch_update_table(table_name: str, updates: List[Dict[str, Any]]) -> int:
+def iter_keyset_chunks(fetch_page: Callable[[Optional[Any], int], List[Dict[str, Any]]],
+                       key: Callable[[Dict[str, Any]], Any], chunk_size: int = 1000) -> Iterator[List[Dict[str, Any]]]:
     """
-    批量更新数据方法
+    按键集分页逐块读取记录：fetch_page(after, limit) 返回 after 之后的一页，key(row) 返回下一页的 after。
+    每块使用一次短查询，不在两块之间占用连接，调用方处理速度慢或中途停止迭代都不会占住连接池中的连接，
+    内存只保留一块记录
+
+    Yields:
+        每块最多 chunk_size 条记录
+    """
+    after = None
+    while True:
+        rows = fetch_page(after, chunk_size)
+        if rows:
+            yield rows
+        if len(rows) < chunk_size:
+            return
+        after = key(rows[-1])
+
+
+def iter_table_rows(table_name: str, conditions: Dict[str, Any], chunk_size: int = 1000) -> Iterator[List[Dict[str, Any]]]:
+    """
+    按 id 顺序逐块读取满足条件的全部记录(用于导出等需要遍历大量记录的场景)，条件规则同 query_table_page
+
+    Example:
+        for rows in iter_table_rows('usa_alphas', {'phase': 1}):
+            ...
+    """
+    return iter_keyset_chunks(lambda after, limit: query_table_page(table_name, conditions, after, limit),
+                              key=lambda row: row['id'], chunk_size=chunk_size)
+
+
+def update_table(table_name: str, conditions: Dict[str, Any], updates: Dict[str, Any]) -> int:
+    """
+    通用的数据更新方法
     
     Args:
         table_name: 表名
-        updates: 更新操作列表，每个元素是一个字典，包含'conditions'和'updates'两个键
-                例如: [{'conditions': {'id': 1}, 'updates': {'name': 'new_name'}},
-                      {'conditions': {'id': 2}, 'updates': {'name': 'another_name'}}]
+        conditions: 更新条件字典，用于确定哪些记录需要被更新
+        updates: 更新字段字典，键为字段名，值为要更新的值
+                例如: {'conditions': {'id': 1}, 'updates': {'name': 'new_name'}}
     
     Returns:
-        所有更新操作影响的总行数
+        受影响的行数
     """
     try:
-        connection = get_db_connection()
-        if not connection:
-            return 0
-        
-        cursor = connection.cursor()
-        
-        total_affected_rows = 0
-        
-        for update_item in updates:
-            conditions = update_item.get('conditions', {})
-            updates_data = update_item.get('updates', {})
-            
+        with db_connection() as connection:
+            cursor = connection.cursor()
+
             # 构建SET子句
             set_clauses = []
             update_params = []
-            
-            for key, value in updates_data.items():
+
+            for key, value in updates.items():
                 set_clauses.append(f"{key} = %s")
                 update_params.append(value)
-            
+
             # 构建WHERE子句
             where_clauses = []
             condition_params = []
-            
+
             for key, value in conditions.items():
                 if value is not None:
                     # 如果值是列表，使用IN操作符
@@ -244,36 +255,217 @@ def batch_update_table(table_name: str, updates: List[Dict[str, Any]]) -> int:
                         # 单个值使用=操作符
                         where_clauses.append(f"{key} = %s")
                         condition_params.append(value)
-                else:
-                    # 处理为NULL的情况
-                    where_clauses.append(f"{key} IS NULL")
-            
+                # 如果值为None，则跳过此条件，不添加到查询中
+
             # 构建完整的UPDATE语句
             set_clause = ", ".join(set_clauses)
             where_clause = " AND ".join(where_clauses)
-            
+
             query = f"UPDATE {table_name} SET {set_clause}"
             if where_clause:
                 query += f" WHERE {where_clause}"
-            
+
             # 合并参数
             params = update_params + condition_params
-            
+
             # 执行更新
             cursor.execute(query, params)
-            total_affected_rows += cursor.rowcount
-        
-        connection.commit()
-        cursor.close()
-        connection.close()
-        
-        return total_affected_rows
+            logger.debug(f"Executing query: {cursor.statement}")
+            affected_rows = cursor.rowcount
+
+            connection.commit()
+            cursor.close()
+
+            if affected_rows > 0:
+                invalidate_query_cache(table_name)
+            return affected_rows
+
+    except Exception as e:
+        print(f"更新数据库时出错: {e}")
+        return 0
+
+
+def batch_update_table(table_name: str, updates: List[Dict[str, Any]], chunk_size: int = 500) -> int:
+    """
+    批量更新数据方法
+
+    更新字段集合与条件字段集合相同的更新操作会被合并，每 chunk_size 个操作生成一条
+    UPDATE ... SET col = CASE WHEN ... END WHERE ... 语句，所有语句在同一事务中提交。
+    同一行被多个操作匹配时，以列表中靠后的操作为准。
+    
+    Args:
+        table_name: 表名
+        updates: 更新操作列表，每个元素是一个字典，包含'conditions'和'updates'两个键
+                例如: [{'conditions': {'id': 1}, 'updates': {'name': 'new_name'}},
+                      {'conditions': {'id': 2}, 'updates': {'name': 'another_name'}}]
+                条件值为列表时使用IN，为None时使用IS NULL
+        chunk_size: 每条UPDATE语句合并的最大操作数
     
+    Returns:
+        所有更新操作影响的总行数
+    """
+    # 按(更新字段, 条件字段)分组，相同结构的更新合并到同一条语句
+    groups: Dict[tuple, List[Dict[str, Any]]] = {}
+    for update_item in updates:
+        conditions = update_item.get('conditions', {})
+        updates_data = update_item.get('updates', {})
+        if not updates_data:
+            continue
+        key = (tuple(updates_data.keys()), tuple(conditions.keys()))
+        groups.setdefault(key, []).append(update_item)
+
+    try:
+        with db_connection() as connection:
+            cursor = connection.cursor()
+
+            total_affected_rows = 0
+
+            for (set_columns, condition_columns), items in groups.items():
+                for i in range(0, len(items), chunk_size):
+                    query, params = _build_case_update(table_name, set_columns, condition_columns, items[i:i + chunk_size])
+                    cursor.execute(query, params)
+                    total_affected_rows += cursor.rowcount
+
+            connection.commit()
+            cursor.close()
+
+            if total_affected_rows > 0:
+                invalidate_query_cache(table_name)
+            return total_affected_rows
+
     except Exception as e:
         print(f"批量更新数据库时出错: {e}")
         return 0
 
 
+def _build_condition_clause(conditions: Dict[str, Any]) -> tuple:
+    """
+    构建单个更新操作的条件子句，返回(子句, 参数列表)
+    """
+    clauses = []
+    params = []
+    for key, value in conditions.items():
+        if value is None:
+            clauses.append(f"{key} IS NULL")
+        elif isinstance(value, list):
+            if value:
+                clauses.append(f"{key} IN ({','.join(['%s'] * len(value))})")
+                params.extend(value)
+        else:
+            clauses.append(f"{key} = %s")
+            params.append(value)
+    return " AND ".join(clauses) or "1=1", params
+
+
+def _build_case_update(table_name: str, set_columns: tuple, condition_columns: tuple, items: List[Dict[str, Any]]) -> tuple:
+    """
+    将多个结构相同的更新操作合并为一条 UPDATE ... CASE WHEN 语句，返回(语句, 参数列表)
+    """
+    # 倒序生成WHEN分支，使同一行被多次更新时靠后的操作生效
+    ordered_items = list(reversed(items))
+
+    single_key = condition_columns[0] if len(condition_columns) == 1 else None
+    if single_key and all(not isinstance(item['conditions'][single_key], list)
+                          and item['conditions'][single_key] is not None for item in items):
+        # 单一等值条件(如 id)使用 CASE key WHEN ... 与 key IN (...) 的紧凑形式
+        set_clauses = []
+        params = []
+        for column in set_columns:
+            whens = []
+            for item in ordered_items:
+                whens.append("WHEN %s THEN %s")
+                params.extend([item['conditions'][single_key], item['updates'][column]])
+            set_clauses.append(f"{column} = CASE {single_key} {' '.join(whens)} ELSE {column} END")
+
+        keys = [item['conditions'][single_key] for item in items]
+        query = (f"UPDATE {table_name} SET {', '.join(set_clauses)} "
+                 f"WHERE {single_key} IN ({','.join(['%s'] * len(keys))})")
+        return query, params + keys
+
+    condition_clauses = [_build_condition_clause(item['conditions']) for item in ordered_items]
+
+    set_clauses = []
+    params = []
+    for column in set_columns:
+        whens = []
+        for item, (clause, clause_params) in zip(ordered_items, condition_clauses):
+            whens.append(f"WHEN {clause} THEN %s")
+            params.extend(clause_params)
+            params.append(item['updates'][column])
+        set_clauses.append(f"{column} = CASE {' '.join(whens)} ELSE {column} END")
+
+    where_clauses = []
+    for clause, clause_params in condition_clauses:
+        where_clauses.append(f"({clause})")
+        params.extend(clause_params)
+
+    query = f"UPDATE {table_name} SET {', '.join(set_clauses)} WHERE {' OR '.join(where_clauses)}"
+    return query, params
+
+
+def claim_table_rows(table_name: str, conditions: Dict[str, Any], limit: int = 10, lease_seconds: int = 300,
+                     order_by: str = "region", token: Optional[str] = None) -> tuple:
+    """
+    原子地认领满足条件的记录：一条 UPDATE ... LIMIT 为记录写入认领令牌与租约到期时间，
+    再按令牌查询认领到的记录。多个进程/主机同时认领时得到互不重叠的记录，
+    租约过期(认领者崩溃或未及时处理)的记录会被重新认领。
+
+    Args:
+        table_name: 表名，需包含 claim_token 与 lease_expires_at 字段
+        conditions: 查询条件字典，规则同 query_table
+        limit: 最多认领的记录数
+        lease_seconds: 租约时长(秒)
+        order_by: 认领顺序
+        token: 认领令牌，默认生成新的随机令牌
+
+    Returns:
+        (认领令牌, 认领到的记录列表)
+    """
+    token = token or uuid.uuid4().hex
+
+    try:
+        with db_connection() as connection:
+            cursor = connection.cursor(dictionary=True)
+
+            where_clause, params = _build_condition_clause({k: v for k, v in conditions.items() if v is not None})
+
+            query = (f"UPDATE {table_name} SET claim_token = %s, "
+                     f"lease_expires_at = DATE_ADD(NOW(), INTERVAL %s SECOND) "
+                     f"WHERE {where_clause} AND (claim_token IS NULL OR lease_expires_at < NOW()) "
+                     f"ORDER BY {order_by} LIMIT {int(limit)}")
+            cursor.execute(query, [token, lease_seconds] + params)
+            connection.commit()
+
+            if cursor.rowcount <= 0:
+                cursor.close()
+                return token, []
+
+            cursor.execute(f"SELECT * FROM {table_name} WHERE claim_token = %s", [token])
+            results = cursor.fetchall()
+            cursor.close()
+
+            return token, results
+
+    except Exception as e:
+        print(f"认领数据库记录时出错: {e}")
+        return token, []
+
+
+def release_claim(table_name: str, token: str, ids: Optional[List[Any]] = None) -> int:
+    """
+    释放认领令牌对应的记录(可限定id)，使其可以立即被重新认领
+
+    Returns:
+        受影响的行数
+    """
+    conditions = {'claim_token': token}
+    if ids is not None:
+        if not ids:
+            return 0
+        conditions['id'] = ids
+    return update_table(table_name, conditions, {'claim_token': None, 'lease_expires_at': None})
+
+
 def insert_record(table_name: str, data: Dict[str, Any]) -> int:
     """
     通用的数据插入方法
@@ -287,81 +479,178 @@ def insert_record(table_name: str, data: Dict[str, Any]) -> int:
         受影响的行数(通常为1)
     """
     try:
-        connection = get_db_connection()
-        if not connection:
-            return 0
-        
-        cursor = connection.cursor()
-        
-        # 构建INSERT语句
-        columns = list(data.keys())
-        values = list(data.values())
-        
-        column_names = ', '.join(columns)
-        placeholders = ', '.join(['%s'] * len(columns))
-        
-        query = f"INSERT INTO {table_name} ({column_names}) VALUES ({placeholders})"
-        
-        # 执行插入
-        cursor.execute(query, values)
-        affected_rows = cursor.rowcount
-        
-        connection.commit()
-        cursor.close()
-        connection.close()
-        
-        return affected_rows
-    
+        with db_connection() as connection:
+            cursor = connection.cursor()
+
+            # 构建INSERT语句
+            columns = list(data.keys())
+            values = list(data.values())
+
+            column_names = ', '.join(columns)
+            placeholders = ', '.join(['%s'] * len(columns))
+
+            query = f"INSERT INTO {table_name} ({column_names}) VALUES ({placeholders})"
+
+            # 执行插入
+            cursor.execute(query, values)
+            affected_rows = cursor.rowcount
+
+            connection.commit()
+            cursor.close()
+
+            if affected_rows > 0:
+                invalidate_query_cache(table_name)
+            return affected_rows
+
     except Exception as e:
         print(f"插入数据时出错: {e}")
         return 0
 
 
-def batch_insert_records(table_name: str, data_list: List[Dict[str, Any]]) -> int:
+def batch_insert_records(table_name: str, data_list: Iterable[Dict[str, Any]]) -> int:
     """
-    通用的批量数据插入方法
+    通用的批量数据插入方法，内部使用 bulk_insert_records 以多行 INSERT IGNORE 写入
     
     Args:
         table_name: 表名
-        data_list: 要插入的数据字典列表，每个元素是一个字典
+        data_list: 要插入的数据字典列表(或迭代器)，每个元素是一个字典
                   例如: [{'name': 'example1', 'age': 25}, {'name': 'example2', 'age': 30}]
     
     Returns:
-        受影响的行数
+        实际插入的行数(因唯一键重复被忽略的行不计入)
     """
+    return bulk_insert_records(table_name, data_list)['inserted']
+
+
+def bulk_insert_records(
+        table_name: str,
+        records: Iterable[Dict[str, Any]],
+        on_progress: Optional[Callable[[Dict[str, int]], None]] = None,
+        group_key: Optional[Callable[[Dict[str, Any]], Any]] = None,
+) -> Dict[str, Any]:
+    """
+    批量插入数据，将记录打包成多行 INSERT IGNORE 语句，单条语句大小受 max_allowed_packet 限制
+
+    Args:
+        table_name: 表名
+        records: 要插入的数据字典列表或迭代器，以第一条记录的键作为字段列表，流式读取不会整体加载到内存
+        on_progress: 每执行完一条INSERT语句后的回调，参数为当前统计结果
+        group_key: 记录的分组函数，指定时同一条语句只包含同一分组的记录，以统计每个分组实际插入的记录数；
+            相邻记录分组相同时才能合并为一条语句
+
+    Returns:
+        统计结果字典: rows(读取的记录数), inserted(插入数), ignored(因重复被忽略数), statements(执行的语句数)，
+        指定 group_key 时另有 groups({分组: 插入数})
+    """
+    result = {'rows': 0, 'inserted': 0, 'ignored': 0, 'statements': 0}
+    if group_key:
+        result['groups'] = {}
+
+    iterator = iter(records)
+    first = next(iterator, None)
+    if first is None:
+        return result
+
+    columns = list(first.keys())
+    prefix = f"INSERT IGNORE INTO {table_name} ({', '.join(columns)}) VALUES "
+    row_placeholder = f"({', '.join(['%s'] * len(columns))})"
+
     try:
-        connection = get_db_connection()
-        if not connection:
-            return 0
-        
-        cursor = connection.cursor()
-        
-        total_affected_rows = 0
-        
-        # 检查是否有数据需要插入
-        if not data_list:
-            return 0
-        
-        # 获取字段名（假设所有字典具有相同的键）
-        columns = list(data_list[0].keys())
-        column_names = ', '.join(columns)
-        placeholders = ', '.join(['%s'] * len(columns))
-        
-        # 构建INSERT语句
-        query = f"INSERT IGNORE INTO {table_name} ({column_names}) VALUES ({placeholders})"
-        
-        # 为每个数据字典执行插入
-        for data in data_list:
-            values = [data[col] for col in columns]
-            cursor.execute(query, values)
-            total_affected_rows += cursor.rowcount
-        
-        connection.commit()
-        cursor.close()
-        connection.close()
-        
-        return total_affected_rows
-    
+        with db_connection() as connection:
+            cursor = connection.cursor()
+            packet_budget = _get_insert_packet_budget(cursor)
+
+            batch_values = []
+            batch_rows = 0
+            batch_bytes = len(prefix)
+            batch_group = None
+
+            def flush():
+                inserted = _execute_bulk_insert(connection, cursor, prefix, row_placeholder, batch_values, batch_rows,
+                                                result)
+                if group_key:
+                    result['groups'][batch_group] = result['groups'].get(batch_group, 0) + inserted
+                if on_progress:
+                    on_progress(result)
+
+            for data in itertools.chain([first], iterator):
+                values = [data.get(col) for col in columns]
+                row_bytes = _estimate_row_bytes(values)
+                group = group_key(data) if group_key else None
+
+                if batch_rows and (batch_bytes + row_bytes > packet_budget or batch_rows >= BULK_INSERT_MAX_ROWS
+                                   or group != batch_group):
+                    flush()
+                    batch_values, batch_rows, batch_bytes = [], 0, len(prefix)
+
+                batch_values.extend(values)
+                batch_rows += 1
+                batch_bytes += row_bytes
+                batch_group = group
+
+            if batch_rows:
+                flush()
+
+            cursor.close()
+
     except Exception as e:
         print(f"批量插入数据时出错: {e}")
-        return 0
+
+    # 出错前已提交的语句同样需要使查询缓存失效
+    if result['inserted']:
+        invalidate_query_cache(table_name)
+    return result
+
+
+# 单条多行INSERT语句的最大行数，以及按 max_allowed_packet 估算语句大小时使用的比例
+BULK_INSERT_MAX_ROWS = 5000
+BULK_INSERT_PACKET_RATIO = 0.5
+
+_max_allowed_packet: Optional[int] = None
+
+
+def _get_insert_packet_budget(cursor) -> int:
+    """
+    读取服务器 max_allowed_packet 并按比例留出余量，作为单条INSERT语句的字节预算
+    """
+    global _max_allowed_packet
+    if _max_allowed_packet is None:
+        try:
+            cursor.execute("SELECT @@max_allowed_packet")
+            _max_allowed_packet = int(cursor.fetchone()[0])
+        except Exception as e:
+            logger.warning(f"读取max_allowed_packet失败，使用默认值4MB: {e}")
+            _max_allowed_packet = 4 * 1024 * 1024
+    return max(int(_max_allowed_packet * BULK_INSERT_PACKET_RATIO), 64 * 1024)
+
+
+def _estimate_row_bytes(values: List[Any]) -> int:
+    """
+    估算一行数据在SQL语句中占用的字节数(字符串按转义后最坏情况计算)
+    """
+    size = 4
+    for value in values:
+        if value is None:
+            size += 5
+        elif isinstance(value, (int, float)):
+            size += 26
+        else:
+            size += len(str(value).encode('utf-8')) * 2 + 3
+    return size
+
+
+def _execute_bulk_insert(connection, cursor, prefix: str, row_placeholder: str, values: List[Any], n_rows: int,
+                         result: Dict[str, Any]) -> int:
+    """
+    执行一条多行INSERT IGNORE语句并累计插入/忽略行数，返回本条语句插入的行数
+    """
+    query = prefix + ', '.join([row_placeholder] * n_rows)
+    cursor.execute(query, values)
+    connection.commit()
+
+    inserted = max(cursor.rowcount, 0)
+    result['rows'] += n_rows
+    result['inserted'] += inserted
+    result['ignored'] += n_rows - inserted
+    result['statements'] += 1
+    return inserted
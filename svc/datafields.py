@@ -1,5 +1,4 @@
 import json
-import time
 
 from svc.auth import get_auto_login_session
 from svc.logger import setup_logger
@@ -86,7 +85,6 @@ def get_single_set_fields(dataset='other699', delay=0, instrument_type='EQUITY',
         # 更新offset以获取下一页数据
         offset += limit
         logger.info(f"Getting 50 data fields of {dataset} with offset {offset}")
-        time.sleep(3)
     
     # 只取"type"为"MATRIX"与"type"为"VECTOR"的字段
     result = {k: v for k, v in result.items() if v['type'] in typs}
@@ -114,7 +112,6 @@ def get_multi_set_fields(dataset_ids, delay=0, instrument_type='EQUITY', region=
     for dataset_id in dataset_ids:
         dataset_fields = get_single_set_fields(dataset_id, delay, instrument_type, region, universe)
         result.update(dataset_fields)
-        time.sleep(3)
     
     return result
 
@@ -3,7 +3,7 @@ from urllib.parse import urlencode
 import streamlit as st
 
 from svc.auth import get_auto_login_session
-from svc.database import get_db_connection
+from svc.database import db_connection
 from svc.logger import setup_logger
 
 logger = setup_logger(__name__)
@@ -99,28 +99,25 @@ def get_used_dataset_ids(region: str, universe: str, delay: int, template: str)
         已使用的数据集ID集合
     """
     try:
-        connection = get_db_connection()
-        if not connection:
-            return set()
-        
-        cursor = connection.cursor()
-        
-        # 查询已使用的数据集
-        query = """
-        SELECT dataset FROM dataset_used 
-        WHERE region = %s AND universe = %s AND delay = %s AND template = %s
-        """
-        cursor.execute(query, (region, universe, delay, template))
-        
-        # 获取结果
-        used_dataset_ids = set()
-        for (dataset_id,) in cursor.fetchall():
-            used_dataset_ids.add(dataset_id)
-        
-        cursor.close()
-        connection.close()
-        
-        return used_dataset_ids
+        with db_connection() as connection:
+            cursor = connection.cursor()
+
+            # 查询已使用的数据集
+            query = """
+            SELECT dataset FROM dataset_used 
+            WHERE region = %s AND universe = %s AND delay = %s AND template = %s
+            """
+            cursor.execute(query, (region, universe, delay, template))
+
+            # 获取结果
+            used_dataset_ids = set()
+            for (dataset_id,) in cursor.fetchall():
+                used_dataset_ids.add(dataset_id)
+
+            cursor.close()
+
+            return used_dataset_ids
+
     except Exception as e:
         print(f"查询已使用的数据集时出错: {e}")
         return set()
\ No newline at end of file
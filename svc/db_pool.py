@@ -0,0 +1,231 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List
+
+import mysql.connector
+import streamlit as st
+from mysql.connector import errorcode
+
+from svc.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# 2006: MySQL server has gone away / 2013: Lost connection to MySQL server during query
+LOST_CONNECTION_ERRORS = (errorcode.CR_SERVER_GONE_ERROR, errorcode.CR_SERVER_LOST)
+
+
+@st.cache_resource
+def get_db_pool():
+    """
+    创建并返回全局共享的数据库连接池，连接参数与池配置来自 st.secrets["mysql"]
+    """
+    config = st.secrets["mysql"]
+    return ConnectionPool(
+        size=int(config.get("pool_size", 10)),
+        checkout_timeout=float(config.get("pool_timeout", 30)),
+        ping_interval=float(config.get("pool_ping_interval", 10)),
+        host=config["host"],
+        port=config["port"],
+        database=config["database"],
+        user=config["username"],
+        password=config["password"],
+    )
+
+
+def is_connection_lost(error: Exception) -> bool:
+    """判断异常是否由连接断开引起(2006/2013)"""
+    return getattr(error, "errno", None) in LOST_CONNECTION_ERRORS
+
+
+class PooledConnection:
+    """
+    连接池中连接的代理对象，close() 时将连接归还连接池而不是真正关闭，
+    因此沿用 get_db_connection()/connection.close() 写法的旧代码无需修改
+    """
+
+    def __init__(self, pool: "ConnectionPool", connection):
+        self._pool = pool
+        self._connection = connection
+        self.broken = False
+
+    def __getattr__(self, name):
+        if self._connection is None:
+            raise mysql.connector.errors.OperationalError("连接已归还连接池")
+        return getattr(self._connection, name)
+
+    def close(self):
+        """归还连接到连接池"""
+        if self._connection is not None:
+            connection, self._connection = self._connection, None
+            self._pool.release(connection, discard=self.broken)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_val is not None and is_connection_lost(exc_val):
+            self.broken = True
+        self.close()
+
+
+class ConnectionPool:
+    """线程安全的MySQL连接池，支持借出时健康检查、断线重连与使用统计"""
+
+    def __init__(self, size: int = 10, checkout_timeout: float = 30, ping_interval: float = 10, **connect_kwargs):
+        """
+        Args:
+            size: 连接池最大连接数
+            checkout_timeout: 借出连接时等待空闲连接的最长秒数
+            ping_interval: 连接空闲超过该秒数后，借出前先 ping 检查(必要时自动重连)
+            connect_kwargs: 传给 mysql.connector.connect 的连接参数
+        """
+        self.size = size
+        self.checkout_timeout = checkout_timeout
+        self.ping_interval = ping_interval
+        self._connect_kwargs = connect_kwargs
+        self._idle: List[tuple] = []  # [(connection, last_used_time)]
+        self._n_open = 0
+        self._cond = threading.Condition()
+        self._stats = {
+            "checkouts": 0,
+            "waits": 0,
+            "wait_time": 0.0,
+            "creates": 0,
+            "reconnects": 0,
+            "discards": 0,
+            "timeouts": 0,
+        }
+
+    def _create(self):
+        connection = mysql.connector.connect(**self._connect_kwargs)
+        with self._cond:
+            self._stats["creates"] += 1
+        return connection
+
+    def _check_health(self, connection, last_used: float) -> bool:
+        """空闲时间较长的连接在借出前 ping 一次，断开时自动重连"""
+        if time.time() - last_used < self.ping_interval:
+            return True
+        try:
+            if connection.is_connected():
+                return True
+            connection.ping(reconnect=True, attempts=3, delay=1)
+            with self._cond:
+                self._stats["reconnects"] += 1
+            return True
+        except Exception as e:
+            logger.warning("数据库连接健康检查失败，丢弃连接: %s", e)
+            return False
+
+    def acquire(self):
+        """
+        从连接池借出一个连接，没有空闲连接且已达上限时阻塞等待
+
+        Returns:
+            原始的 mysql.connector 连接对象，使用完毕后需调用 release 归还
+        """
+        wait_start = None
+        deadline = time.time() + self.checkout_timeout
+
+        while True:
+            with self._cond:
+                if self._idle:
+                    connection, last_used = self._idle.pop()
+                elif self._n_open < self.size:
+                    self._n_open += 1
+                    connection, last_used = None, None
+                else:
+                    if wait_start is None:
+                        wait_start = time.time()
+                        self._stats["waits"] += 1
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise mysql.connector.errors.PoolError(f"等待数据库连接超时({self.checkout_timeout}s)")
+                    self._cond.wait(remaining)
+                    continue
+
+            if connection is None:
+                try:
+                    connection = self._create()
+                except Exception:
+                    with self._cond:
+                        self._n_open -= 1
+                        self._cond.notify()
+                    raise
+            elif not self._check_health(connection, last_used):
+                self._close_quietly(connection)
+                with self._cond:
+                    self._n_open -= 1
+                    self._stats["discards"] += 1
+                    self._cond.notify()
+                continue
+
+            with self._cond:
+                self._stats["checkouts"] += 1
+                if wait_start is not None:
+                    self._stats["wait_time"] += time.time() - wait_start
+            return connection
+
+    def release(self, connection, discard: bool = False):
+        """归还连接，未提交的事务会被回滚；discard 为 True 或连接已断开时直接关闭"""
+        if not discard:
+            try:
+                if connection.in_transaction:
+                    connection.rollback()
+            except Exception as e:
+                if not is_connection_lost(e):
+                    logger.warning("归还数据库连接时回滚失败: %s", e)
+                discard = True
+
+        with self._cond:
+            if discard:
+                self._n_open -= 1
+                self._stats["discards"] += 1
+            else:
+                self._idle.append((connection, time.time()))
+            self._cond.notify()
+
+        if discard:
+            self._close_quietly(connection)
+
+    @contextmanager
+    def connection(self):
+        """
+        以上下文管理器方式借出连接，退出时自动归还；连接断开(2006/2013)时丢弃该连接
+
+        Example:
+            with pool.connection() as connection:
+                cursor = connection.cursor(dictionary=True)
+        """
+        pooled = PooledConnection(self, self.acquire())
+        with pooled:
+            yield pooled
+
+    def stats(self) -> Dict[str, Any]:
+        """返回连接池使用统计"""
+        with self._cond:
+            return {
+                **self._stats,
+                "wait_time": round(self._stats["wait_time"], 3),
+                "size": self.size,
+                "open": self._n_open,
+                "idle": len(self._idle),
+                "in_use": self._n_open - len(self._idle),
+            }
+
+    def close_all(self):
+        """关闭所有空闲连接"""
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._n_open -= len(idle)
+        for connection, _ in idle:
+            self._close_quietly(connection)
+
+    @staticmethod
+    def _close_quietly(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
@@ -0,0 +1,44 @@
+import csv
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from svc.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# 导出文件目录
+EXPORT_DIR = Path(__file__).resolve().parent.parent / "data" / "exports"
+
+
+def export_path(name: str) -> Path:
+    """导出文件路径：data/exports/{name}_{时间}.csv"""
+    return EXPORT_DIR / f"{name}_{time.strftime('%Y%m%d_%H%M%S')}.csv"
+
+
+def export_csv(chunks: Iterable[List[Dict[str, Any]]], path: Path, columns: Optional[List[str]] = None) -> int:
+    """
+    将逐块读取的记录(如 iter_table_rows 的结果)写入CSV文件，边读边写，内存只保留一块记录
+
+    Args:
+        chunks: 记录块的迭代器
+        path: CSV文件路径
+        columns: 导出的列，默认为第一条记录的全部字段
+
+    Returns:
+        导出的记录数
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    count = 0
+    # utf-8-sig 使 Excel 正确识别中文
+    with open(path, "w", newline="", encoding="utf-8-sig") as file:
+        writer = None
+        for rows in chunks:
+            if writer is None:
+                writer = csv.DictWriter(file, fieldnames=columns or list(rows[0].keys()), extrasaction="ignore")
+                writer.writeheader()
+            writer.writerows(rows)
+            count += len(rows)
+
+    logger.info("Exported %s rows to %s.", count, path)
+    return count
@@ -0,0 +1,91 @@
+import json
+import uuid
+from typing import Any, Dict, List
+
+from svc.database import db_connection, claim_table_rows, update_table
+from svc.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+JOURNAL_TABLE = "simulation_journal"
+# 日志条目的租约秒数，持有者需在到期前续约，否则视为进程已退出，条目可被其他进程接管
+JOURNAL_LEASE_SECONDS = 180
+
+
+class SimulationJournal:
+    """
+    回测日志：持久化记录已提交到平台、尚未结束的回测(simulate_id、对应记录id、开始时间)
+
+    每条进行中的条目带有持有者令牌与租约，持有进程定期续约；进程重启或崩溃后，
+    新进程通过 recover() 接管租约已过期的条目并继续查询这些回测，而不是重新回测。
+    """
+
+    def __init__(self):
+        self.owner_token = uuid.uuid4().hex
+
+    def record_submitted(self, simulate_id: str, task_id: str, table_name: str, query: Dict[str, Any],
+                         ids: List[Any], start_time: float, account: str = None) -> bool:
+        """记录一条已提交的回测，account 为提交该回测的账号(恢复后需用同一账号查询)"""
+        try:
+            with db_connection() as connection:
+                cursor = connection.cursor()
+                cursor.execute(
+                    f"""
+                    INSERT INTO {JOURNAL_TABLE}
+                        (simulate_id, task_id, region, table_name, query, alpha_ids, start_time, account, status,
+                         claim_token, lease_expires_at)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, 'RUNNING', %s, DATE_ADD(NOW(), INTERVAL %s SECOND))
+                    ON DUPLICATE KEY UPDATE status = 'RUNNING', claim_token = VALUES(claim_token),
+                        lease_expires_at = VALUES(lease_expires_at)
+                    """,
+                    (simulate_id, task_id, query.get('region'), table_name, json.dumps(query), json.dumps(ids),
+                     start_time, account, self.owner_token, JOURNAL_LEASE_SECONDS)
+                )
+                connection.commit()
+                cursor.close()
+                return True
+        except Exception as e:
+            logger.error(f"写入回测日志失败 {simulate_id}: {e}")
+            return False
+
+    def record_finished(self, simulate_id: str, status: str = "COMPLETED") -> int:
+        """回测结束(完成/失败/超时)后更新日志状态，不再参与恢复"""
+        return update_table(JOURNAL_TABLE, {'simulate_id': simulate_id},
+                            {'status': status, 'claim_token': None, 'lease_expires_at': None})
+
+    def renew(self) -> int:
+        """为本进程持有的所有进行中条目续约"""
+        try:
+            with db_connection() as connection:
+                cursor = connection.cursor()
+                cursor.execute(
+                    f"""
+                    UPDATE {JOURNAL_TABLE} SET lease_expires_at = DATE_ADD(NOW(), INTERVAL %s SECOND)
+                    WHERE claim_token = %s AND status = 'RUNNING'
+                    """,
+                    (JOURNAL_LEASE_SECONDS, self.owner_token)
+                )
+                connection.commit()
+                affected_rows = cursor.rowcount
+                cursor.close()
+                return affected_rows
+        except Exception as e:
+            logger.error(f"回测日志续约失败: {e}")
+            return 0
+
+    def recover(self, limit: int = 10000) -> List[Dict[str, Any]]:
+        """
+        接管租约已过期(持有进程已退出)的进行中条目
+
+        Returns:
+            条目列表，query 与 alpha_ids 字段已解析为Python对象
+        """
+        _, entries = claim_table_rows(JOURNAL_TABLE, {'status': 'RUNNING'}, limit=limit,
+                                      lease_seconds=JOURNAL_LEASE_SECONDS, order_by="start_time",
+                                      token=self.owner_token)
+        for entry in entries:
+            entry['query'] = json.loads(entry['query']) if entry.get('query') else {}
+            entry['alpha_ids'] = json.loads(entry['alpha_ids']) if entry.get('alpha_ids') else []
+        if entries:
+            logger.info("Recovered %s running simulations from journal.", len(entries))
+        return entries
@@ -0,0 +1,236 @@
+import argparse
+from typing import Any, Dict, List, Tuple
+
+from mysql.connector import errorcode
+
+from svc.database import db_connection
+from svc.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+SCHEMA_MIGRATIONS_TABLE = "schema_migrations"
+
+# 回测记录表(all_alphas 及各地区 xxx_alphas)的版本化迁移：(版本号, 说明, 语句列表)，语句中的 {table} 替换为表名。
+# 按版本号顺序执行，每张表已执行的版本记录在 schema_migrations 表中；
+# 按 db_create.sql 新建的表已包含部分字段/索引，执行时重复字段/索引的错误视为该步骤已完成
+ALPHA_TABLE_MIGRATIONS: List[Tuple[int, str, List[str]]] = [
+    (1, "回测认领租约字段", [
+        "ALTER TABLE {table} ADD COLUMN claim_token varchar(32) DEFAULT NULL",
+        "ALTER TABLE {table} ADD COLUMN lease_expires_at datetime DEFAULT NULL",
+        "ALTER TABLE {table} ADD INDEX idx_claim_token (claim_token)",
+    ]),
+    (2, "回测优先级字段，已有记录按阶段与模板回填", [
+        "ALTER TABLE {table} ADD COLUMN priority float DEFAULT 0",
+        "ALTER TABLE {table} ADD INDEX idx_simulated_priority (simulated, priority)",
+        "UPDATE {table} SET priority = 10 * IFNULL(phase, 0) + "
+        "CASE template WHEN 'phase2' THEN 10 WHEN 'phase3' THEN 20 ELSE 0 END WHERE simulated = 0 AND priority = 0",
+    ]),
+    (3, "按 alpha_id 维护分组最优Alpha所需的索引", [
+        "ALTER TABLE {table} ADD INDEX idx_alpha_id (alpha_id)",
+    ]),
+    (4, "abs(sharp*fitness) 生成列，排序可使用索引", [
+        "ALTER TABLE {table} ADD COLUMN score float GENERATED ALWAYS AS (ABS(sharp * fitness)) STORED",
+    ]),
+    (5, "热点查询的覆盖索引", [
+        # 回测认领：simulated = 0 AND phase = ? AND universe = ? AND delay = ? ORDER BY priority DESC
+        "ALTER TABLE {table} ADD INDEX idx_claim_queue (simulated, phase, universe, delay, priority)",
+        # 回测提交后按 simulate_id 查询记录
+        "ALTER TABLE {table} ADD INDEX idx_simulate_id (simulate_id)",
+        # 可提交Alpha：passed = 1 AND submitted = 0 ... ORDER BY score DESC
+        "ALTER TABLE {table} ADD INDEX idx_passed_submitted (passed, submitted, universe, delay, phase, score)",
+        # 按数据集查询与统计：dataset IN (...) AND universe = ? AND delay = ? AND phase = ? GROUP BY category, simulated
+        "ALTER TABLE {table} ADD INDEX idx_dataset (dataset, universe, delay, phase, category, simulated)",
+        # 按条件查询：universe = ? AND delay = ? [AND category = ?] ORDER BY score DESC
+        "ALTER TABLE {table} ADD INDEX idx_universe_score (universe, delay, score)",
+    ]),
+]
+
+# 已执行过的DDL(字段/索引已存在)的错误码
+ALREADY_APPLIED_ERRORS = (errorcode.ER_DUP_FIELDNAME, errorcode.ER_DUP_KEYNAME)
+
+# 热点查询：与 svc/alpha_query.py、svc/simulate.py 中的查询条件一致，EXPLAIN 检查其是否退化为全表扫描
+HOT_QUERIES: Dict[str, Tuple[str, List[Any]]] = {
+    "claim_unsimulated": (
+        "SELECT id FROM {table} WHERE simulated = 0 AND phase = %s AND universe = %s AND delay = %s "
+        "AND (claim_token IS NULL OR lease_expires_at < NOW()) ORDER BY priority DESC, id LIMIT 10",
+        [1, "TOP3000", 1]),
+    "by_simulate_id": (
+        "SELECT * FROM {table} WHERE simulate_id = %s",
+        ["abc123"]),
+    "by_alpha_id": (
+        "SELECT * FROM {table} WHERE alpha_id = %s",
+        ["abc123"]),
+    "by_claim_token": (
+        "SELECT * FROM {table} WHERE claim_token = %s",
+        ["abc123"]),
+    "submittable_details": (
+        "SELECT * FROM {table} WHERE universe = %s AND delay = %s AND phase = %s AND passed = 1 AND submitted = 0 "
+        "ORDER BY score DESC LIMIT 50",
+        ["TOP3000", 1, 1]),
+    "dataset_stats": (
+        "SELECT category, simulated, COUNT(*) as count FROM {table} "
+        "WHERE universe = %s AND delay = %s AND phase = %s AND dataset IN (%s, %s) "
+        "GROUP BY category, simulated ORDER BY category, simulated",
+        ["TOP3000", 1, 1, "fundamental6", "analyst4"]),
+    "by_conditions": (
+        "SELECT * FROM {table} WHERE universe = %s AND delay = %s AND category = %s ORDER BY score DESC LIMIT 500",
+        ["TOP3000", 1, "fundamental"]),
+}
+
+
+def ensure_migrations_table(cursor):
+    cursor.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {SCHEMA_MIGRATIONS_TABLE} (
+            table_name varchar(64) NOT NULL,
+            version int(11) NOT NULL,
+            description varchar(255) DEFAULT NULL,
+            applied_at datetime DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (table_name, version)
+        )
+        """
+    )
+
+
+def list_alpha_tables() -> List[str]:
+    """当前数据库中的回测记录表(all_alphas 及各地区 xxx_alphas)"""
+    try:
+        with db_connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(
+                """
+                SELECT DISTINCT table_name FROM information_schema.columns
+                WHERE table_schema = DATABASE() AND column_name = 'simulate_id' AND table_name LIKE %s
+                ORDER BY table_name
+                """,
+                ("%\\_alphas",)
+            )
+            tables = [row[0] for row in cursor.fetchall()]
+            cursor.close()
+            return tables
+    except Exception as e:
+        logger.error(f"查询回测记录表失败: {e}")
+        return []
+
+
+def get_applied_versions(table_name: str) -> List[int]:
+    """表已执行的迁移版本号"""
+    with db_connection() as connection:
+        cursor = connection.cursor()
+        ensure_migrations_table(cursor)
+        cursor.execute(f"SELECT version FROM {SCHEMA_MIGRATIONS_TABLE} WHERE table_name = %s ORDER BY version",
+                       (table_name,))
+        versions = [row[0] for row in cursor.fetchall()]
+        connection.commit()
+        cursor.close()
+        return versions
+
+
+def apply_migrations(table_name: str, target_version: int = None) -> List[int]:
+    """
+    对一张回测记录表按版本号顺序执行尚未执行的迁移
+
+    Args:
+        table_name: 回测记录表
+        target_version: 执行到的最高版本，None表示执行全部
+
+    Returns:
+        本次执行的版本号列表，某一版本执行失败时停止，已执行的版本保留
+    """
+    applied = set(get_applied_versions(table_name))
+    executed = []
+
+    for version, description, statements in ALPHA_TABLE_MIGRATIONS:
+        if version in applied or (target_version is not None and version > target_version):
+            continue
+
+        try:
+            with db_connection() as connection:
+                cursor = connection.cursor()
+                for statement in statements:
+                    try:
+                        cursor.execute(statement.format(table=table_name))
+                    except Exception as e:
+                        if getattr(e, "errno", None) not in ALREADY_APPLIED_ERRORS:
+                            raise
+                        logger.info("Migration %s on %s already applied: %s", version, table_name, e)
+                cursor.execute(
+                    f"INSERT INTO {SCHEMA_MIGRATIONS_TABLE} (table_name, version, description) VALUES (%s, %s, %s)",
+                    (table_name, version, description)
+                )
+                connection.commit()
+                cursor.close()
+        except Exception as e:
+            logger.error(f"表 {table_name} 执行迁移 {version}({description}) 失败: {e}")
+            break
+
+        logger.info("Applied migration %s on %s: %s", version, table_name, description)
+        executed.append(version)
+
+    return executed
+
+
+def migrate_alpha_tables(tables: List[str] = None, target_version: int = None) -> Dict[str, List[int]]:
+    """
+    对所有(或指定的)回测记录表执行迁移
+
+    Returns:
+        {表名: 本次执行的版本号列表}
+    """
+    return {table_name: apply_migrations(table_name, target_version) for table_name in tables or list_alpha_tables()}
+
+
+def is_full_scan(plan: List[Dict[str, Any]]) -> bool:
+    """
+    判断 EXPLAIN 结果是否包含全表扫描：
+    MySQL 为每个表一行，type 为 ALL；OceanBase 返回文本执行计划，包含 TABLE FULL SCAN
+    """
+    for row in plan:
+        if str(row.get('type') or '').upper() == 'ALL':
+            return True
+        if any('TABLE FULL SCAN' in str(value).upper() for value in row.values()):
+            return True
+    return False
+
+
+def explain_hot_queries(table_name: str) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    对表执行所有热点查询的 EXPLAIN
+
+    Returns:
+        {查询名: EXPLAIN 结果行}
+    """
+    plans = {}
+    with db_connection() as connection:
+        cursor = connection.cursor(dictionary=True)
+        for name, (query, params) in HOT_QUERIES.items():
+            cursor.execute("EXPLAIN " + query.format(table=table_name), params)
+            plans[name] = cursor.fetchall()
+        cursor.close()
+    return plans
+
+
+def find_full_scans(table_name: str) -> List[str]:
+    """返回在该表上退化为全表扫描的热点查询名"""
+    return [name for name, plan in explain_hot_queries(table_name).items() if is_full_scan(plan)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="回测记录表的版本化迁移与热点查询索引检查")
+    parser.add_argument("tables", nargs="*", help="要迁移的表，默认为所有回测记录表")
+    parser.add_argument("--target", type=int, default=None, help="执行到的最高版本，默认执行全部")
+    parser.add_argument("--explain", action="store_true", help="只检查热点查询是否全表扫描，不执行迁移")
+    args = parser.parse_args(argv)
+
+    tables = args.tables or list_alpha_tables()
+    for table_name in tables:
+        if args.explain:
+            full_scans = find_full_scans(table_name)
+            print(f"{table_name}: {'全表扫描: ' + ', '.join(full_scans) if full_scans else '所有热点查询均使用索引'}")
+        else:
+            executed = apply_migrations(table_name, args.target)
+            print(f"{table_name}: 执行迁移 {executed or '无'}，已执行版本 {get_applied_versions(table_name)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 from svc.database import update_table
+from svc.priority import compute_priority
 
 neutralization_array = [
     "NONE",
@@ -37,6 +38,7 @@ def neutralize(selected_alphas, selected_neutralization_opts, new_phase=2):
                 'used': 1,
                 'template': alpha.get('template'),
             }
+            new_alpha['priority'] = compute_priority(new_alpha, parent=alpha)
             new_alphas.append(new_alpha)
 
     return new_alphas
@@ -0,0 +1,252 @@
+import json
+import threading
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+import streamlit as st
+
+from svc.database import db_connection, claim_table_rows, update_table
+from svc.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+PIPELINE_TABLE = "pipeline_jobs"
+STAGES = ("generate", "simulate", "check", "submit")
+# 任务租约秒数，worker 需在到期前续约，否则视为 worker 已退出，任务可被其他 worker 重新认领
+JOB_LEASE_SECONDS = 120
+# worker 续约并同步任务进度的间隔秒数
+JOB_HEARTBEAT_INTERVAL = 10
+
+
+def use_pipeline_worker() -> bool:
+    """
+    是否由独立的 worker 进程执行流水线任务(st.secrets["pipeline"]["use_worker"])，
+    开启后页面只负责提交任务、查看进度与发送停止指令
+    """
+    try:
+        return bool(st.secrets.get("pipeline", {}).get("use_worker", False))
+    except Exception:
+        return False
+
+
+def enqueue_job(stage: str, payload: Dict[str, Any]) -> Optional[int]:
+    """
+    提交一个流水线任务，由对应阶段的 worker 认领执行
+
+    Args:
+        stage: 阶段，generate/simulate/check/submit
+        payload: 任务参数，不同阶段见 worker 中的执行函数
+
+    Returns:
+        任务id，失败时返回None
+    """
+    if stage not in STAGES:
+        raise ValueError(f"未知的流水线阶段: {stage}")
+
+    try:
+        with db_connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(
+                f"INSERT INTO {PIPELINE_TABLE} (stage, region, payload, status) VALUES (%s, %s, %s, 'PENDING')",
+                (stage, payload.get('region') or payload.get('query', {}).get('region'), json.dumps(payload, default=str))
+            )
+            connection.commit()
+            job_id = cursor.lastrowid
+            cursor.close()
+            logger.info("Pipeline job %s(%s) is enqueued.", job_id, stage)
+            return job_id
+    except Exception as e:
+        logger.error(f"提交流水线任务失败: {e}")
+        return None
+
+
+def request_stop(stage: str, job_id: int = None, region: str = None) -> int:
+    """
+    停止某阶段的任务(可按任务id或地区筛选)：未开始的直接标记为STOPPED，执行中的标记为STOPPING由 worker 停止
+    """
+    conditions = {'stage': stage}
+    if job_id is not None:
+        conditions['id'] = job_id
+    if region:
+        conditions['region'] = region
+
+    stopped = update_table(PIPELINE_TABLE, {**conditions, 'status': 'PENDING'}, {'status': 'STOPPED'})
+    stopping = update_table(PIPELINE_TABLE, {**conditions, 'status': 'RUNNING'}, {'status': 'STOPPING'})
+    return stopped + stopping
+
+
+def list_jobs(stage: str = None, limit: int = 20) -> List[Dict[str, Any]]:
+    """
+    按提交时间倒序返回最近的流水线任务，progress 字段已解析为字典
+    """
+    try:
+        with db_connection() as connection:
+            cursor = connection.cursor(dictionary=True)
+            sql = f"SELECT id, stage, region, status, progress, worker, created_at, updated_at FROM {PIPELINE_TABLE}"
+            params = []
+            if stage:
+                sql += " WHERE stage = %s"
+                params.append(stage)
+            sql += " ORDER BY id DESC LIMIT %s"
+            params.append(limit)
+            cursor.execute(sql, tuple(params))
+            jobs = cursor.fetchall()
+            cursor.close()
+    except Exception as e:
+        logger.error(f"查询流水线任务失败: {e}")
+        return []
+
+    for job in jobs:
+        job['progress'] = json.loads(job['progress']) if job.get('progress') else {}
+    return jobs
+
+
+def finalize_stale_stopping_jobs(stage: str) -> int:
+    """
+    将租约已过期的STOPPING任务标记为STOPPED：worker 在停止过程中崩溃或被终止后，任务不再由任何 worker 结束
+
+    Returns:
+        结束的任务数
+    """
+    try:
+        with db_connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(
+                f"""
+                UPDATE {PIPELINE_TABLE} SET status = 'STOPPED', claim_token = NULL, lease_expires_at = NULL
+                WHERE stage = %s AND status = 'STOPPING' AND (lease_expires_at IS NULL OR lease_expires_at < NOW())
+                """,
+                (stage,)
+            )
+            connection.commit()
+            affected_rows = cursor.rowcount
+            cursor.close()
+            if affected_rows:
+                logger.info("Finalized %s stale STOPPING %s jobs.", affected_rows, stage)
+            return affected_rows
+    except Exception as e:
+        logger.error(f"结束已停止的流水线任务失败: {e}")
+        return 0
+
+
+def claim_job(stage: str, token: str, worker: str = None) -> Optional[Dict[str, Any]]:
+    """
+    认领一个待执行的任务；执行中但租约已过期(worker 已退出)的任务也会被重新认领，
+    停止中但租约已过期的任务直接标记为STOPPED
+    """
+    finalize_stale_stopping_jobs(stage)
+    _, jobs = claim_table_rows(PIPELINE_TABLE, {'stage': stage, 'status': ['PENDING', 'RUNNING']}, limit=1,
+                               lease_seconds=JOB_LEASE_SECONDS, order_by="id", token=token)
+    if not jobs:
+        return None
+
+    job = jobs[0]
+    update_table(PIPELINE_TABLE, {'id': job['id']}, {'status': 'RUNNING', 'worker': worker})
+    job['payload'] = json.loads(job['payload']) if job.get('payload') else {}
+    return job
+
+
+def heartbeat(job_id: int, token: str, progress: Dict[str, Any]) -> Optional[str]:
+    """
+    续约任务并写入最新进度
+
+    Returns:
+        任务当前状态(页面可能已将其改为STOPPING)，任务已不属于该 worker 时返回None
+    """
+    try:
+        with db_connection() as connection:
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute(
+                f"""
+                UPDATE {PIPELINE_TABLE} SET progress = %s, lease_expires_at = DATE_ADD(NOW(), INTERVAL %s SECOND)
+                WHERE id = %s AND claim_token = %s
+                """,
+                (json.dumps(progress, default=str), JOB_LEASE_SECONDS, job_id, token)
+            )
+            connection.commit()
+            cursor.execute(f"SELECT status FROM {PIPELINE_TABLE} WHERE id = %s AND claim_token = %s", (job_id, token))
+            row = cursor.fetchone()
+            cursor.close()
+            return row['status'] if row else None
+    except Exception as e:
+        logger.error(f"流水线任务 {job_id} 续约失败: {e}")
+        return 'RUNNING'
+
+
+def finish_job(job_id: int, token: str, status: str, progress: Dict[str, Any]) -> int:
+    """结束任务并释放租约；status 为 PENDING 时任务重新排队"""
+    return update_table(PIPELINE_TABLE, {'id': job_id, 'claim_token': token}, {
+        'status': status,
+        'progress': json.dumps(progress, default=str),
+        'claim_token': None,
+        'lease_expires_at': None,
+    })
+
+
+def run_job(job: Dict[str, Any], token: str, runner: Callable[[Dict[str, Any], Dict[str, Any]], Any],
+            shutdown: threading.Event) -> str:
+    """
+    在线程中执行任务，期间定期续约并同步进度；页面发送停止指令或 worker 退出时设置 status['stop']
+
+    runner(payload, status) 与 check_one_batch/submit_task 一样通过 status['stop'] 感知停止，
+    worker 退出时还会设置 status['shutdown']，任务未完成则重新排队由其他 worker 继续
+
+    Returns:
+        任务的最终状态
+    """
+    job_id = job['id']
+    status = {"stop": False, "shutdown": False, "status": "RUNNING", "details": "Starting..."}
+    error = []
+
+    def target():
+        try:
+            runner(job['payload'], status)
+        except Exception as e:
+            logger.error("Pipeline job %s failed: %s", job_id, e, exc_info=True)
+            error.append(str(e))
+
+    thread = threading.Thread(target=target, name=f"pipeline-job-{job_id}", daemon=True)
+    thread.start()
+
+    stop_requested = False
+    while thread.is_alive():
+        thread.join(JOB_HEARTBEAT_INTERVAL)
+        current = heartbeat(job_id, token, status)
+        if current in (None, 'STOPPING', 'STOPPED'):
+            stop_requested = True
+            status['stop'] = True
+        if shutdown.is_set():
+            status.update({'stop': True, 'shutdown': True})
+
+    if error:
+        final_status = 'FAILED'
+        status['details'] = error[0]
+    elif stop_requested:
+        final_status = 'STOPPED'
+    elif status['shutdown'] and status.get('status') != 'COMPLETED':
+        final_status = 'PENDING'
+    else:
+        final_status = 'COMPLETED'
+
+    finish_job(job_id, token, final_status, status)
+    logger.info("Pipeline job %s(%s) is %s.", job_id, job['stage'], final_status)
+    return final_status
+
+
+def run_stage_worker(stage: str, runner: Callable[[Dict[str, Any], Dict[str, Any]], Any],
+                     shutdown: threading.Event, poll_interval: float = 5, worker: str = None):
+    """
+    阶段 worker 主循环：不断认领并执行该阶段的任务，直到 shutdown 被设置
+    """
+    token = uuid.uuid4().hex
+    logger.info("Pipeline %s worker %s is started.", stage, worker)
+
+    while not shutdown.is_set():
+        job = claim_job(stage, token, worker)
+        if not job:
+            shutdown.wait(poll_interval)
+            continue
+        logger.info("Pipeline job %s(%s) is claimed by %s.", job['id'], stage, worker)
+        run_job(job, token, runner, shutdown)
+
+    logger.info("Pipeline %s worker %s is stopped.", stage, worker)
@@ -0,0 +1,110 @@
+import asyncio
+import heapq
+import itertools
+from typing import Any, Callable, Dict
+
+from svc.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class PollScheduler:
+    """
+    按截止时间调度回测进度查询的最小堆调度器
+
+    每个回测按平台返回的 Retry-After 在截止时间到达时才查询一次，而不是固定间隔轮询；
+    截止时间落在同一个 tick 内的查询合并为一批并发发送。需在事件循环中运行 run()。
+    """
+
+    def __init__(self, poll_func: Callable[[Any], Any], tick: float = 0.5, max_batch: int = 32):
+        """
+        Args:
+            poll_func: 同步的查询函数 poll_func(key)，在线程池中执行
+            tick: 合并查询的时间窗口秒数，截止时间在窗口内的查询提前合并发送
+            max_batch: 同时进行中的查询上限(包括尚未完成的前几批)
+        """
+        self.poll_func = poll_func
+        self.tick = tick
+        self.max_batch = max_batch
+        self._heap = []  # [(deadline, seq, key, future)]
+        self._counter = itertools.count()
+        # 在 run() 中创建，使 Event 绑定到运行调度循环的事件循环
+        self._wakeup = None
+        self._tasks = {}  # {进行中的批次task: 查询数}
+        self._stats = {"scheduled": 0, "polls": 0, "batches": 0, "errors": 0}
+
+    async def poll(self, key, delay: float = 0) -> Any:
+        """在 delay 秒后查询 key，返回 poll_func(key) 的结果"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        entry = (loop.time() + max(delay, 0), next(self._counter), key, future)
+        heapq.heappush(self._heap, entry)
+        self._stats["scheduled"] += 1
+
+        # 新的截止时间最早时唤醒调度循环重新计算等待时间
+        if self._heap[0] is entry and self._wakeup is not None:
+            self._wakeup.set()
+        return await future
+
+    async def run(self):
+        """调度循环：等待到最早的截止时间，取出一个 tick 内到期的查询并发执行，进行中的查询不超过 max_batch"""
+        loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        try:
+            await self._schedule(loop)
+        finally:
+            for task in list(self._tasks):
+                task.cancel()
+
+    async def _schedule(self, loop):
+        while True:
+            self._wakeup.clear()
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+
+            delay = self._heap[0][0] - loop.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            capacity = self.max_batch - self._in_flight()
+            if capacity <= 0:
+                await asyncio.wait(list(self._tasks), return_when=asyncio.FIRST_COMPLETED)
+                continue
+
+            horizon = loop.time() + self.tick
+            due = []
+            while self._heap and self._heap[0][0] <= horizon and len(due) < capacity:
+                entry = heapq.heappop(self._heap)
+                if not entry[3].done():
+                    due.append(entry)
+
+            if due:
+                self._stats["batches"] += 1
+                task = asyncio.create_task(self._poll_batch(due))
+                self._tasks[task] = len(due)
+                task.add_done_callback(self._tasks.pop)
+
+    def _in_flight(self) -> int:
+        return sum(self._tasks.values())
+
+    async def _poll_batch(self, due):
+        results = await asyncio.gather(*(asyncio.to_thread(self.poll_func, key) for _, _, key, _ in due),
+                                       return_exceptions=True)
+        for (_, _, key, future), result in zip(due, results):
+            self._stats["polls"] += 1
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                self._stats["errors"] += 1
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """返回调度统计与等待中的查询数"""
+        return {**self._stats, "pending": len(self._heap), "in_flight": self._in_flight()}
@@ -0,0 +1,47 @@
+from typing import Any, Dict, Optional
+
+# 优先级各项权重：阶段越高、模板越进阶、数据集价值越高、父Alpha表现越好，越先回测
+PHASE_WEIGHT = 10.0
+TEMPLATE_BONUS = {
+    "phase2": 10.0,
+    "phase3": 20.0,
+}
+VALUE_SCORE_WEIGHT = 2.0
+PYRAMID_MULTIPLIER_WEIGHT = 5.0
+PARENT_SCORE_WEIGHT = 5.0
+# 父Alpha sharp*fitness 的上限，避免个别异常值压过其他因素
+PARENT_SCORE_CAP = 5.0
+
+
+def _to_float(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def compute_priority(record: Dict[str, Any], dataset: Optional[Dict[str, Any]] = None,
+                     parent: Optional[Dict[str, Any]] = None) -> float:
+    """
+    计算待回测记录的优先级，保存在记录的 priority 字段，回测时按优先级从高到低认领
+
+    Args:
+        record: 待回测记录(需包含 phase、template)
+        dataset: 平台返回的数据集信息(valueScore、pyramidMultiplier)
+        parent: 生成该记录的低阶Alpha记录(sharp、fitness)
+
+    Returns:
+        优先级分数
+    """
+    priority = PHASE_WEIGHT * _to_float(record.get('phase'))
+    priority += TEMPLATE_BONUS.get(record.get('template') or "", 0.0)
+
+    if dataset:
+        priority += VALUE_SCORE_WEIGHT * _to_float(dataset.get('valueScore'))
+        priority += PYRAMID_MULTIPLIER_WEIGHT * _to_float(dataset.get('pyramidMultiplier'))
+
+    if parent:
+        parent_score = abs(_to_float(parent.get('sharp')) * _to_float(parent.get('fitness')))
+        priority += PARENT_SCORE_WEIGHT * min(parent_score, PARENT_SCORE_CAP)
+
+    return round(priority, 4)
@@ -0,0 +1,144 @@
+import functools
+import inspect
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+import streamlit as st
+
+from svc.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# 查询结果的默认有效秒数：本进程的写入会立即使相关结果失效，
+# 其他进程(如 worker)的写入无法通知到本进程，最多延迟该秒数后可见
+DEFAULT_QUERY_CACHE_TTL = 60
+# 默认最多缓存的查询结果数，超出时淘汰最久未使用的结果
+DEFAULT_QUERY_CACHE_ENTRIES = 256
+
+
+@st.cache_resource
+def get_query_cache():
+    """
+    创建并返回全局共享(所有会话共用)的查询结果缓存，配置来自 st.secrets["query_cache"]: ttl、max_entries
+    """
+    config = st.secrets.get("query_cache", {})
+    return QueryCache(ttl=float(config.get("ttl", DEFAULT_QUERY_CACHE_TTL)),
+                      max_entries=int(config.get("max_entries", DEFAULT_QUERY_CACHE_ENTRIES)))
+
+
+def normalize_params(params: Dict[str, Any]) -> tuple:
+    """将查询参数规范化为可哈希的键：按参数名排序，列表/元组转为元组"""
+    return tuple(sorted((name, tuple(value) if isinstance(value, (list, tuple)) else value)
+                        for name, value in params.items()))
+
+
+class QueryCache:
+    """线程安全的查询结果缓存，键为 (函数名, 规范化参数)，按表名失效"""
+
+    def __init__(self, ttl: float = DEFAULT_QUERY_CACHE_TTL, max_entries: int = DEFAULT_QUERY_CACHE_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # 键 -> (过期时间, 表名, 结果)
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0, "evictions": 0}
+
+    def get(self, key: tuple) -> Optional[Any]:
+        """返回未过期的结果，没有时返回None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.time():
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry[2]
+
+    def put(self, key: tuple, table_name: str, value: Any):
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, table_name, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def invalidate(self, table_name: str = None) -> int:
+        """
+        使某张表(None表示全部)相关的查询结果失效
+
+        Returns:
+            失效的结果数
+        """
+        with self._lock:
+            keys = [key for key, entry in self._entries.items() if table_name is None or entry[1] == table_name]
+            for key in keys:
+                del self._entries[key]
+            self._stats["invalidations"] += len(keys)
+            return len(keys)
+
+    def stats(self) -> Dict[str, Any]:
+        """返回缓存命中统计"""
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "hit_rate": round(self._stats["hits"] / lookups, 3) if lookups else 0.0,
+                "entries": len(self._entries),
+                "ttl": self.ttl,
+            }
+
+
+def alpha_table_name(region: str = None) -> str:
+    """地区对应的回测记录表，region为None时为 all_alphas"""
+    return f"{region.lower()}_alphas" if region else "all_alphas"
+
+
+def cached_query(func: Callable) -> Callable:
+    """
+    svc.alpha_query 查询函数的读穿透缓存：以 (函数名, 规范化参数) 为键，结果按 region 对应的表失效。
+    返回结果的浅拷贝，调用方修改返回的记录不会影响缓存；空结果(包括查询出错)不缓存。
+    原函数可通过 func.__wrapped__ 绕过缓存调用
+    """
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        key = (func.__name__, normalize_params(bound.arguments))
+
+        try:
+            cache = get_query_cache()
+        except Exception as e:
+            logger.warning(f"查询缓存不可用: {e}")
+            return func(*args, **kwargs)
+
+        results = cache.get(key)
+        if results is None:
+            results = func(*args, **kwargs)
+            if results:
+                cache.put(key, alpha_table_name(bound.arguments.get('region')), results)
+        return [dict(row) for row in results]
+
+    return wrapper
+
+
+def invalidate_query_cache(table_name: str = None) -> int:
+    """
+    写入某张表后使其相关的查询结果失效(由 svc.database 的写入方法调用)，table_name 为None时清空全部
+
+    Returns:
+        失效的结果数
+    """
+    try:
+        return get_query_cache().invalidate(table_name)
+    except Exception as e:
+        logger.warning(f"清除查询缓存失败: {e}")
+        return 0
+
+
+def get_query_cache_stats() -> Dict[str, Any]:
+    """返回查询缓存的命中/未命中等统计"""
+    return get_query_cache().stats()
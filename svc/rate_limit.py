@@ -0,0 +1,137 @@
+import threading
+import time
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse
+
+from svc.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# 各接口族的默认限速：rate 为每秒补充的令牌数，capacity 为允许的突发请求数
+DEFAULT_RATE_LIMITS = {
+    "simulations": {"rate": 2.0, "capacity": 5},
+    "alphas": {"rate": 2.0, "capacity": 5},
+    "data-fields": {"rate": 0.5, "capacity": 2},
+    "data-sets": {"rate": 0.5, "capacity": 2},
+    "default": {"rate": 2.0, "capacity": 5},
+}
+# 429 响应没有 Retry-After 时的默认等待秒数
+DEFAULT_RETRY_AFTER = 5.0
+
+
+def get_endpoint_family(url: str) -> str:
+    """
+    根据URL路径返回接口族，如 https://api.worldquantbrain.com/alphas/xxx/check -> alphas，
+    /users/self/alphas 也归入 alphas
+    """
+    parts = [part for part in urlparse(url).path.split("/") if part]
+    for part in parts:
+        if part in DEFAULT_RATE_LIMITS:
+            return part
+    return "default"
+
+
+def get_retry_after(response, default: float = DEFAULT_RETRY_AFTER) -> float:
+    """读取响应的 Retry-After 秒数，缺失或无法解析时返回 default"""
+    try:
+        return float(response.headers.get("Retry-After", default))
+    except (TypeError, ValueError):
+        return default
+
+
+class TokenBucket:
+    """线程安全的令牌桶，令牌不足时阻塞等待"""
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        Args:
+            rate: 每秒补充的令牌数
+            capacity: 桶容量，即允许的突发请求数
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self) -> float:
+        """
+        预占一个令牌
+
+        Returns:
+            调用方需要等待的秒数(0表示可以立即发送请求)
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1
+            wait = max(-self._tokens / self.rate if self._tokens < 0 else 0.0, self._blocked_until - now)
+            return max(wait, 0.0)
+
+    def acquire(self) -> float:
+        """获取一个令牌，必要时阻塞，返回实际等待的秒数"""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def block(self, seconds: float):
+        """收到429后暂停该桶，seconds 秒内的请求都需等待，并清空已积累的令牌"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens = min(self._tokens, 0.0)
+            self._blocked_until = max(self._blocked_until, now + seconds)
+
+
+class RateLimiter:
+    """按接口族划分令牌桶的限速器，被同一会话的所有线程共享"""
+
+    def __init__(self, limits: Optional[Dict[str, Dict[str, float]]] = None):
+        """
+        Args:
+            limits: 覆盖默认配置的限速，如 {"simulations": {"rate": 1, "capacity": 3}}
+        """
+        config = {family: dict(limit) for family, limit in DEFAULT_RATE_LIMITS.items()}
+        for family, limit in (limits or {}).items():
+            config.setdefault(family, {}).update(limit)
+
+        self._buckets = {
+            family: TokenBucket(float(limit["rate"]), float(limit["capacity"])) for family, limit in config.items()
+        }
+        self._stats = {family: {"requests": 0, "waits": 0, "wait_time": 0.0, "throttles": 0} for family in config}
+        self._lock = threading.Lock()
+
+    def _bucket(self, url: str):
+        family = get_endpoint_family(url)
+        return family, self._buckets.get(family, self._buckets["default"])
+
+    def acquire(self, url: str) -> float:
+        """请求前调用，按接口族限速"""
+        family, bucket = self._bucket(url)
+        wait = bucket.acquire()
+        with self._lock:
+            stats = self._stats.setdefault(family, {"requests": 0, "waits": 0, "wait_time": 0.0, "throttles": 0})
+            stats["requests"] += 1
+            if wait > 0:
+                stats["waits"] += 1
+                stats["wait_time"] += wait
+        return wait
+
+    def on_throttled(self, url: str, retry_after: float):
+        """收到429：该接口族暂停 retry_after 秒"""
+        family, bucket = self._bucket(url)
+        bucket.block(retry_after)
+        with self._lock:
+            self._stats.setdefault(family, {"requests": 0, "waits": 0, "wait_time": 0.0, "throttles": 0})["throttles"] += 1
+        logger.warning("Rate limited on %s, pausing %s seconds.", family, retry_after)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """返回各接口族的请求、等待与429统计"""
+        with self._lock:
+            return {family: {**stats, "wait_time": round(stats["wait_time"], 3)} for family, stats in self._stats.items()}
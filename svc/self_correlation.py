@@ -0,0 +1,211 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from svc.auth import AutoLoginSession
+from svc.logger import setup_logger
+from svc.rate_limit import get_retry_after
+from svc.submit import get_submitted_alphas_brain
+
+logger = setup_logger(__name__)
+
+# PnL 缓存目录：每个Alpha一个 .npz 文件(日期 int32 yyyymmdd、累计PnL float32)
+PNL_CACHE_DIR = Path(__file__).resolve().parent.parent / "data" / "pnl"
+# 平台的自相关性上限为0.7，本地估算留出余量，避免误过滤可通过的Alpha
+SELF_CORRELATION_THRESHOLD = 0.75
+# 计算相关性使用的最近交易日数(约4年)
+PNL_LOOKBACK_DAYS = 4 * 252
+# 计算相关性所需的最少重叠交易日数
+MIN_OVERLAP_DAYS = 60
+# 并发获取PnL的线程数
+PNL_FETCH_WORKERS = 8
+# PnL 生成中且响应缺少有效 Retry-After 时的等待秒数，以及最长等待秒数
+PNL_RETRY_AFTER = 5
+PNL_MAX_WAIT = 120
+
+PnlSeries = Tuple[np.ndarray, np.ndarray]
+
+
+def parse_pnl_records(data: Dict[str, Any]) -> Optional[PnlSeries]:
+    """
+    解析平台返回的PnL记录集 {"schema": {"properties": [{"name": "date"}, {"name": "pnl"}]}, "records": [["2020-01-02", 1.5], ...]}
+
+    Returns:
+        (日期数组 int32 yyyymmdd, 累计PnL数组 float32)，没有记录时返回None
+    """
+    records = data.get('records') or []
+    if not records:
+        return None
+
+    names = [prop.get('name') for prop in data.get('schema', {}).get('properties', [])]
+    date_index = names.index('date') if 'date' in names else 0
+    pnl_index = names.index('pnl') if 'pnl' in names else 1
+
+    dates = np.array([int(str(record[date_index]).replace('-', '')) for record in records], dtype=np.int32)
+    pnl = np.array([record[pnl_index] if record[pnl_index] is not None else np.nan for record in records],
+                   dtype=np.float32)
+    order = np.argsort(dates, kind='stable')
+    return dates[order], pnl[order]
+
+
+def load_pnl(alpha_id: str) -> Optional[PnlSeries]:
+    """从磁盘缓存读取PnL"""
+    path = PNL_CACHE_DIR / f"{alpha_id}.npz"
+    if not path.exists():
+        return None
+    try:
+        with np.load(path) as data:
+            return data['dates'], data['pnl']
+    except Exception as e:
+        logger.warning(f"读取PnL缓存失败 {alpha_id}: {e}")
+        return None
+
+
+def save_pnl(alpha_id: str, series: PnlSeries):
+    """保存PnL到磁盘缓存，已完成回测的Alpha的PnL不会再变化，因此不设过期时间"""
+    PNL_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    dates, pnl = series
+    np.savez(PNL_CACHE_DIR / f"{alpha_id}.npz", dates=dates.astype(np.int32), pnl=pnl.astype(np.float32))
+
+
+def fetch_pnl(s: AutoLoginSession, alpha_id: str) -> Optional[PnlSeries]:
+    """从平台获取Alpha的PnL记录集，生成中时按 Retry-After 等待"""
+    url = f"https://api.worldquantbrain.com/alphas/{alpha_id}/recordsets/pnl"
+    time_start = time.time()
+
+    response = s.get(url)
+    while "retry-after" in response.headers and time.time() - time_start < PNL_MAX_WAIT:
+        time.sleep(get_retry_after(response, PNL_RETRY_AFTER))
+        response = s.get(url)
+
+    if response.status_code != 200 or "retry-after" in response.headers:
+        logger.warning(f"Failed to fetch PnL for alpha {alpha_id}: {response.status_code}")
+        return None
+
+    try:
+        return parse_pnl_records(response.json())
+    except Exception as e:
+        logger.error(f"Failed to parse PnL for alpha {alpha_id}: {e}")
+        return None
+
+
+def get_pnl(s: AutoLoginSession, alpha_id: str) -> Optional[PnlSeries]:
+    """读取PnL，磁盘缓存中没有时从平台获取并缓存"""
+    series = load_pnl(alpha_id)
+    if series is None:
+        series = fetch_pnl(s, alpha_id)
+        if series is not None:
+            save_pnl(alpha_id, series)
+    return series
+
+
+def get_pnls(s: AutoLoginSession, alpha_ids: List[str], max_workers: int = PNL_FETCH_WORKERS) -> Dict[str, PnlSeries]:
+    """并发读取多个Alpha的PnL，返回 {alpha_id: PnL}，获取失败的Alpha不在结果中"""
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pnl") as executor:
+        results = dict(zip(alpha_ids, executor.map(lambda alpha_id: get_pnl(s, alpha_id), alpha_ids)))
+    return {alpha_id: series for alpha_id, series in results.items() if series is not None}
+
+
+def daily_returns(series: PnlSeries) -> PnlSeries:
+    """累计PnL转换为每日PnL变化"""
+    dates, pnl = series
+    return dates[1:], np.diff(pnl.astype(np.float64)).astype(np.float32)
+
+
+def build_return_matrix(pnls: List[PnlSeries], lookback: int = PNL_LOOKBACK_DAYS) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    将多个Alpha的每日PnL对齐到共同的日期轴上
+
+    Returns:
+        (日期轴, 矩阵 float32 [Alpha数 x 日期数]，缺失日期为NaN)，只保留最近 lookback 个日期
+    """
+    returns = [daily_returns(series) for series in pnls]
+    if not returns:
+        return np.array([], dtype=np.int32), np.empty((0, 0), dtype=np.float32)
+
+    axis = np.unique(np.concatenate([dates for dates, _ in returns]))[-lookback:]
+    matrix = np.full((len(returns), len(axis)), np.nan, dtype=np.float32)
+    for row, (dates, values) in enumerate(returns):
+        matrix[row] = align_to_axis(axis, dates, values)
+    return axis, matrix
+
+
+def align_to_axis(axis: np.ndarray, dates: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """将序列对齐到日期轴，轴上没有对应值的位置为NaN"""
+    aligned = np.full(len(axis), np.nan, dtype=np.float32)
+    if len(axis) == 0 or len(dates) == 0:
+        return aligned
+    positions = np.searchsorted(axis, dates)
+    positions = np.clip(positions, 0, len(axis) - 1)
+    matched = axis[positions] == dates
+    aligned[positions[matched]] = values[matched]
+    return aligned
+
+
+def correlations(matrix: np.ndarray, vector: np.ndarray, min_overlap: int = MIN_OVERLAP_DAYS) -> np.ndarray:
+    """
+    计算向量与矩阵每一行在共同非NaN日期上的皮尔逊相关系数(向量化)
+
+    Returns:
+        长度为矩阵行数的数组，重叠日期不足 min_overlap 的行为NaN
+    """
+    valid = ~np.isnan(matrix) & ~np.isnan(vector)
+    n = valid.sum(axis=1).astype(np.float64)
+    x = np.where(valid, vector, 0.0).astype(np.float64)
+    y = np.where(valid, matrix, 0.0).astype(np.float64)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        sx, sy = x.sum(axis=1), y.sum(axis=1)
+        cov = (x * y).sum(axis=1) - sx * sy / n
+        var_x = (x * x).sum(axis=1) - sx * sx / n
+        var_y = (y * y).sum(axis=1) - sy * sy / n
+        corr = cov / np.sqrt(var_x * var_y)
+
+    corr[n < min_overlap] = np.nan
+    return corr
+
+
+def get_submitted_alpha_ids(s: AutoLoginSession, region: str = None) -> List[str]:
+    """已提交Alpha的id，指定地区时只返回该地区的(平台只在同一地区内计算自相关性)"""
+    return [alpha['id'] for alpha in get_submitted_alphas_brain(s, region) if alpha.get('id')]
+
+
+def prescreen_self_correlation(s: AutoLoginSession, records: List[Dict[str, Any]], region: str = None,
+                               threshold: float = SELF_CORRELATION_THRESHOLD) -> Tuple[List[Dict[str, Any]], Dict[str, float]]:
+    """
+    用本地缓存的PnL估算候选Alpha与已提交Alpha的最大自相关性，过滤很可能无法通过自相关性检查的Alpha
+
+    Args:
+        s: 登录会话
+        records: query_checkable_alpha_details 的结果(需包含 alpha_id)
+        region: 地区，None时与所有已提交Alpha比较
+        threshold: 最大自相关性超过该值的Alpha被过滤
+
+    Returns:
+        (按最大自相关性从低到高排序的保留记录, {被过滤的alpha_id: 最大自相关性})；
+        无法获取PnL的Alpha保留在末尾，交由平台检查
+    """
+    submitted_ids = get_submitted_alpha_ids(s, region)
+    submitted = get_pnls(s, submitted_ids)
+    if not submitted:
+        return records, {}
+
+    axis, matrix = build_return_matrix(list(submitted.values()))
+    candidates = get_pnls(s, [record['alpha_id'] for record in records if record.get('alpha_id')])
+
+    scores = {}
+    for alpha_id, series in candidates.items():
+        dates, values = daily_returns(series)
+        corr = correlations(matrix, align_to_axis(axis, dates, values))
+        scores[alpha_id] = float(np.nanmax(corr)) if not np.all(np.isnan(corr)) else None
+
+    rejected = {alpha_id: score for alpha_id, score in scores.items() if score is not None and score > threshold}
+    kept = [record for record in records if record.get('alpha_id') not in rejected]
+    kept.sort(key=lambda record: (scores.get(record.get('alpha_id')) is None,
+                                  scores.get(record.get('alpha_id')) or 0.0))
+
+    logger.info("Self-correlation prescreen: %s kept, %s rejected (threshold %s).", len(kept), len(rejected), threshold)
+    return kept, rejected
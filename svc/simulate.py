@@ -1,14 +1,25 @@
+import asyncio
 import json
+import math
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, Future
 from json import JSONDecodeError
 from time import sleep
-from typing import DefaultDict
+from typing import DefaultDict, Dict, Optional
 
 import streamlit as st
 
+from svc.account_pool import get_account_pool, AccountPool
+from svc.alpha_ranking import update_alpha_rankings
 from svc.auth import get_auto_login_session, AutoLoginSession
-from svc.database import query_table, update_table
+from svc.concurrency import AIMDController
+from svc.database import query_table, update_table, batch_update_table, claim_table_rows, release_claim
+from svc.batch_packer import BatchPacker
+from svc.journal import SimulationJournal
+from svc.poll_scheduler import PollScheduler
+from svc.simulation_cache import lookup_simulation_cache, store_simulation_results, simulation_cache_key
+from svc.simulation_stats import record_transition
 from svc.logger import setup_logger
 
 simulation_url = 'https://api.worldquantbrain.com/simulations'
@@ -16,22 +27,66 @@ simulation_url = 'https://api.worldquantbrain.com/simulations'
 logger = setup_logger(__name__)
 lock = threading.Lock()
 
+# 回测引擎中执行阻塞HTTP/数据库调用的线程数
+SIMULATE_IO_WORKERS = 32
+# 并发获取多Alpha回测子任务结果的线程数
+CHILD_FETCH_WORKERS = 10
+# 提交失败(非429)后重新尝试提交前的等待秒数
+SUBMIT_RETRY_INTERVAL = 5
+# 平台未返回Retry-After时两次查询进度的间隔秒数
+DEFAULT_POLL_INTERVAL = 5
+# 单个回测任务的超时秒数
+SIMULATE_TIMEOUT = 3600
+# 回测结果中只属于首次回测记录的平台标识，用缓存填充其他记录时不复制
+CACHE_IDENTIFIER_FIELDS = ('alpha_id', 'simulate_id')
+# 从回测日志恢复的任务的最大回测数(各账号的并发上限见 svc.account_pool)
+MAX_CONCURRENT_SIMULATIONS = 10
+# 认领待回测记录的租约秒数，超时未提交的记录可被其他进程重新认领
+SIMULATE_LEASE_SECONDS = 300
+# 认领待回测记录的顺序：优先级高的先回测
+SIMULATE_CLAIM_ORDER = "priority DESC, id"
+# 每个任务预取的待回测记录数(按批次计)，用于凑满批次并在槽位空出时立即补充
+SIMULATE_PREFETCH_BATCHES = 3
+# 回测日志续约间隔秒数
+JOURNAL_RENEW_INTERVAL = 60
+
 @st.cache_resource
 def get_simulate_task_manager():
     return SimulateTaskManager()
 
 
 class SimulateTaskManager:
+    """
+    回测任务管理器
+
+    在后台线程中运行一个asyncio事件循环：每个地区/延迟任务对应一个提交协程，
+    每个进行中的回测对应一个独立的跟踪协程，按平台返回的Retry-After各自等待后查询进度。
+    阻塞的HTTP与数据库调用在线程池中执行，因此提交与查询可以并发进行。
+    回测分派到账号池中负载最低的账号，每个账号有独立的AIMD并发控制器，429时减小该账号的并发窗口，
+    提交成功后逐步恢复；回测的进度查询与结果获取使用提交它的账号。
+    多个任务同时运行时每个任务最多占用总并发窗口的平均份额，避免单个任务占满所有槽位。
+    已提交的回测记录在回测日志中，重启后通过 recover_simulations 继续查询未结束的回测。
+    """
+
     def __init__(self):
-        self.session = get_auto_login_session()
-        self.simulate_submit_thread = None
-        self.simulate_check_thread = None
+        self.accounts: AccountPool = get_account_pool()
+        self.session = self.accounts.get(None).session
         self.simulate_tasks = DefaultDict(dict)
         self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[threading.Thread] = None
+        self._task_futures: Dict[str, Future] = {}
+        self._wake_events: Dict[str, asyncio.Event] = {}
+        self._tracked_simulate_ids = set()
+        self.journal = SimulationJournal()
+        # 查询键为 (账号名, simulate_id)，用提交回测的账号查询进度
+        self.poller = PollScheduler(lambda key: poll_progress(self.accounts.get(key[0]).session, key[1]),
+                                    max_batch=SIMULATE_IO_WORKERS)
+        self.recover_simulations()
 
     def start_simulate(self, query, n_tasks_max=10, batch_size=10):
         logger.info("Simulate_query: %s", query)
-        task_id = f"{query.get('region')}-delay{query.get('delay')}"
+        task_id = get_task_id(query)
 
         if self.simulate_tasks.get(task_id):
             task_info = self.simulate_tasks.get(task_id)
@@ -55,73 +110,227 @@ class SimulateTaskManager:
             self.simulate_tasks[task_id] = simulate_info
             logger.info("Simulate task %s is started.", task_id)
 
-        if self.simulate_submit_thread is None:
-            self.simulate_submit_thread = threading.Thread(target=self.start_auto_submit, daemon=True)
-            self.simulate_submit_thread.start()
-            logger.info("Simulate SUBMIT is started.")
-        else:
-            logger.info("Simulate SUBMIT is already running.")
-
-        if self.simulate_check_thread is None:
-            self.simulate_check_thread = threading.Thread(target=self.start_monitoring, daemon=True)
-            self.simulate_check_thread.start()
-            logger.info("Simulate CHECK is started.")
-        else:
-            logger.info("Simulate CHECK is already running.")
+        self._schedule_task(task_id)
 
     def stop_simulate(self, query):
-        task_id = f"{query.get('region')}-delay{query.get('delay')}"
+        task_id = get_task_id(query)
         task_info = self.simulate_tasks.get(task_id)
         if task_info:
             task_info['stop'] = True
+            self._wake(task_id)
             logger.info(f"Simulate task {task_id} is stopped.")
         else:
             logger.info(f"Simulate task {task_id} is not running.")
 
-    def start_auto_submit(self):
-        # 提交回测任务
-        while True:
-
-            time.sleep(0.5)
+    def recover_simulations(self):
+        """
+        从回测日志接管上次运行(或已退出的其他进程)未结束的回测，继续查询进度而不重新回测。
+        接管的任务处于停止提交状态，只跟踪已有回测直到结束。
+        """
+        entries = self.journal.recover()
+        recovered_task_ids = set()
 
-            # completed_task_ids = [task_id for task_id, task_info in self.simulate_tasks.items() if len(task_info['simulate_ids']) == 0 and task_info['stop']]
-
-            # for task_id in completed_task_ids:
-            #     self.simulate_tasks.pop(task_id)
+        for entry in entries:
+            task_id = entry['task_id']
+            task_info = self.simulate_tasks.get(task_id)
+            if not task_info:
+                task_info = {
+                    'query': entry['query'],
+                    'stop': True,
+                    "batch_size": 10,
+                    'n_tasks_max': MAX_CONCURRENT_SIMULATIONS,
+                    'n_tasks': 0,
+                    'simulate_ids': {},
+                }
+                self.simulate_tasks[task_id] = task_info
+
+            with lock:
+                task_info['simulate_ids'][entry['simulate_id']] = {
+                    'ids': entry['alpha_ids'],
+                    'start_time': entry['start_time'],
+                    'account': self.accounts.get(entry.get('account')).name,
+                    'recovered': True,
+                }
+                task_info['n_tasks'] = len(task_info['simulate_ids'])
+            # 回测已在平台上运行，直接占用提交账号的并发槽位
+            self.accounts.get(entry.get('account')).controller.force_acquire()
+            recovered_task_ids.add(task_id)
+
+        for task_id in recovered_task_ids:
+            logger.info("Simulate task %s is recovered with %s simulations.", task_id,
+                        len(self.simulate_tasks[task_id]['simulate_ids']))
+            self._schedule_task(task_id)
+
+    def _schedule_task(self, task_id):
+        """为任务启动提交协程，已在运行时唤醒它"""
+        loop = self._ensure_loop()
+
+        with self._lock:
+            future = self._task_futures.get(task_id)
+            if future is None or future.done():
+                self._task_futures[task_id] = asyncio.run_coroutine_threadsafe(self._run_task(task_id), loop)
+                logger.info("Simulate ENGINE task %s is scheduled.", task_id)
+            else:
+                self._wake(task_id)
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        """启动(或复用)运行回测引擎事件循环的后台线程"""
+        with self._lock:
+            if self._loop is None or self._loop_thread is None or not self._loop_thread.is_alive():
+                loop = asyncio.new_event_loop()
+                loop.set_default_executor(ThreadPoolExecutor(max_workers=SIMULATE_IO_WORKERS,
+                                                             thread_name_prefix="simulate-io"))
+                thread = threading.Thread(target=loop.run_forever, name="simulate-engine", daemon=True)
+                thread.start()
+                self._loop, self._loop_thread = loop, thread
+                asyncio.run_coroutine_threadsafe(self._renew_journal(), loop)
+                asyncio.run_coroutine_threadsafe(self.poller.run(), loop)
+                logger.info("Simulate ENGINE is started.")
+            return self._loop
+
+    async def _renew_journal(self):
+        """定期为本进程持有的回测日志条目续约"""
+        while True:
+            await asyncio.sleep(JOURNAL_RENEW_INTERVAL)
+            if self._tracked_simulate_ids:
+                await asyncio.to_thread(self.journal.renew)
+
+    def _wake(self, task_id):
+        """唤醒等待空闲槽位的提交协程(线程安全)"""
+        event = self._wake_events.get(task_id)
+        if event is not None and self._loop is not None:
+            self._loop.call_soon_threadsafe(event.set)
+
+    def _wake_all(self):
+        """共享槽位释放后唤醒所有任务的提交协程"""
+        for task_id in list(self._wake_events):
+            self._wake(task_id)
+
+    def _task_limit(self, task_info) -> int:
+        """任务当前可占用的最大回测数：不超过 n_tasks_max，也不超过各运行中任务对并发窗口的平均份额"""
+        n_active = sum(1 for info in list(self.simulate_tasks.values()) if not info['stop']) or 1
+        fair_share = max(1, math.ceil(self.accounts.window / n_active))
+        return min(task_info['n_tasks_max'], fair_share)
+
+    def status(self) -> dict:
+        """回测状态：账号池的并发窗口(含各账号详情)与各任务详情"""
+        return {
+            "concurrency": self.accounts.snapshot(),
+            "poller": self.poller.snapshot(),
+            "tasks": self.simulate_tasks,
+        }
+
+    async def _run_task(self, task_id):
+        """一个地区/延迟任务的提交协程：有空闲槽位时提交新回测，并为每个回测启动跟踪协程"""
+        task_info = self.simulate_tasks[task_id]
+        wake = asyncio.Event()
+        self._wake_events[task_id] = wake
+        trackers = set()
+        table_name = get_table_name(task_info['query'])
+        batch_size = task_info.get('batch_size', 10)
+        packer = BatchPacker(batch_size, capacity=batch_size * SIMULATE_PREFETCH_BATCHES)
+
+        def track(simulate_id):
+            self._tracked_simulate_ids.add(simulate_id)
+            tracker = asyncio.create_task(self._track_simulation(task_id, task_info, simulate_id, table_name))
+            trackers.add(tracker)
+            tracker.add_done_callback(trackers.discard)
 
+        try:
+            # 接管任务中尚未被跟踪的回测(如从回测日志恢复的回测)
+            for simulate_id in list(task_info['simulate_ids']):
+                if simulate_id not in self._tracked_simulate_ids:
+                    track(simulate_id)
+
+            while True:
+                wake.clear()
+                table_name = get_table_name(task_info['query'])
+
+                task_limit = self._task_limit(task_info)
+                if not task_info['stop'] and len(task_info['simulate_ids']) < task_limit \
+                        and self.accounts.has_capacity():
+                    new_simulate_ids = await asyncio.to_thread(submit_simulation_task, self.session, task_info,
+                                                               journal=self.journal, max_tasks=task_limit,
+                                                               packer=packer, accounts=self.accounts)
+                    for simulate_id in new_simulate_ids:
+                        track(simulate_id)
+
+                    if not new_simulate_ids and not task_info['stop'] and self.accounts.has_capacity() \
+                            and len(task_info['simulate_ids']) < task_limit:
+                        # 有空闲槽位却提交失败，稍后重试
+                        await asyncio.sleep(SUBMIT_RETRY_INTERVAL)
+                        continue
+
+                if task_info['stop'] and len(packer):
+                    # 停止提交后释放预取缓冲区中的记录
+                    await asyncio.to_thread(release_records, table_name, packer.drain())
+
+                if task_info['stop'] and not trackers:
+                    break
+
+                # 等待某个回测完成或用户操作后再检查是否有空闲槽位
+                await wake.wait()
+        except Exception as e:
+            logger.error("Simulate ENGINE task %s failed: %s", task_id, e, exc_info=True)
+        finally:
+            if len(packer):
+                await asyncio.to_thread(release_records, table_name, packer.drain())
+            self._wake_events.pop(task_id, None)
             with self._lock:
-                todo_task_infos = [task_info for task_id, task_info in self.simulate_tasks.items() if not task_info['stop']]
-
-            if len(todo_task_infos) == 0:
-                self.simulate_submit_thread = None
-                logger.info("Simulate SUBMIT is stopped.")
-                break
+                if self.simulate_tasks.get(task_id) is task_info and task_info['stop'] and not task_info['simulate_ids']:
+                    self.simulate_tasks.pop(task_id)
+            logger.info("Simulate task %s is completed.", task_id)
 
-            for task_info in todo_task_infos:
-                submit_simulation_task(self.session, task_info)
+    async def _track_simulation(self, task_id, task_info, simulate_id, table_name):
+        """跟踪单个回测：由查询调度器在Retry-After到期时查询进度，完成后保存结果并释放槽位"""
+        simulate_info = task_info['simulate_ids'][simulate_id]
+        account = self.accounts.get(simulate_info.get('account'))
+        journal_status = None
+        retry_after = 0
 
-    def start_monitoring(self):
-        # 检测回测任务执行状态
-        while True:
+        try:
+            while True:
+                progress_complete, response, retry_after = await self.poller.poll((account.name, simulate_id),
+                                                                                  retry_after)
+
+                if progress_complete:
+                    simulate_info.update({'end_time': time.time()})
+                    await asyncio.to_thread(handle_simulate_result, account.session, task_info, simulate_id, response,
+                                            table_name)
+                    journal_status = response.get('status') or 'COMPLETED'
+                    break
+
+                simulate_info.update(response)
+                time_used = time.time() - simulate_info.get('start_time')
+                simulate_info['time_used'] = time_used
 
-            time.sleep(1)
+                if time_used > SIMULATE_TIMEOUT:
+                    simulate_info.update({'end_time': time.time(), 'error': 'timeout'})
+                    logger.warning("Simulate timeout: %s", simulate_id)
+                    journal_status = 'TIMEOUT'
+                    break
 
-            with self._lock:
-                completed_task_ids = [task_id for task_id, task_info in self.simulate_tasks.items() if len(task_info['simulate_ids']) == 0 and task_info['stop']]
-                # logger.info("completed_task_ids: %s", completed_task_ids)
+                logger.info("Simulate IN PROGRESS %s: %s", simulate_id, response)
+        except Exception as e:
+            # 异常退出时保留日志条目，租约过期后可被重新接管
+            logger.error("Track simulation %s failed: %s", simulate_id, e, exc_info=True)
+        finally:
+            if journal_status:
+                await asyncio.to_thread(self.journal.record_finished, simulate_id, journal_status)
+            self._tracked_simulate_ids.discard(simulate_id)
+            with lock:
+                task_info['simulate_ids'].pop(simulate_id, None)
+                task_info['n_tasks'] = len(task_info['simulate_ids'])
+            account.controller.release()
+            self._wake_all()
 
-                for task_id in completed_task_ids:
-                    self.simulate_tasks.pop(task_id)
 
-                todo_task_infos = [task_info for task_id, task_info in self.simulate_tasks.items()]
+def get_task_id(query: dict) -> str:
+    return f"{query.get('region')}-delay{query.get('delay')}"
 
-            if len(todo_task_infos) == 0:
-                self.simulate_check_thread = None
-                logger.info("Simulate CHECK is stopped.")
-                break
 
-            for task_info in todo_task_infos:
-                check_simulate_task(self.session, task_info)
+def get_table_name(query: dict) -> str:
+    return f"{query['region'].lower()}_alphas" if query.get('region') else 'all_alphas'
 
 
 def create_simulation_data(r: dict):
@@ -153,59 +362,177 @@ def submit_simulation(s:AutoLoginSession, sim_data_list: list = None):
     return simulation_response
 
 
-def submit_simulation_task(session: AutoLoginSession, simulate_info: dict):
-    while len(simulate_info['simulate_ids']) < simulate_info['n_tasks_max'] and not simulate_info['stop']:
+def submit_simulation_task(session: AutoLoginSession, simulate_info: dict, controller: AIMDController = None,
+                           journal: SimulationJournal = None, max_tasks: int = None,
+                           packer: BatchPacker = None, accounts: AccountPool = None) -> list:
+    """
+    在空闲槽位内提交回测，返回本次新提交成功的simulate_id列表
+
+    待回测记录按优先级从高到低通过 claim_table_rows 认领后放入预取缓冲区，多个进程/任务不会重复提交同一条记录；
+    缓冲区按 region/universe/delay 分组打包成满批次再提交，未能提交的记录立即释放，提交成功的记录被标记为 simulated=-1。
+    表达式与设置相同的回测结果已在缓存中的记录直接写入缓存结果，不再提交回测。
+
+    Args:
+        session: 登录会话
+        simulate_info: 任务信息
+        controller: 共享的并发控制器，每提交一批占用一个槽位；为None时仅受任务的n_tasks_max限制
+        journal: 回测日志，提交成功的回测会被记录以便重启后恢复
+        max_tasks: 本任务最多同时进行的回测数，默认为任务的n_tasks_max
+        packer: 任务的预取缓冲区，在多次调用间保留未提交的记录；为None时使用临时缓冲区并在返回前释放
+        accounts: 账号池，每批分派给负载最低且有空闲槽位的账号(使用该账号的会话与并发控制器)，
+            指定时忽略 session 与 controller
+    """
+    new_simulate_ids = []
+    max_tasks = max_tasks or simulate_info['n_tasks_max']
+    batch_size = simulate_info.get('batch_size', 10)
+    table_name = get_table_name(simulate_info['query'])
+    temporary_packer = packer is None
+    if temporary_packer:
+        packer = BatchPacker(batch_size, capacity=batch_size * SIMULATE_PREFETCH_BATCHES)
+
+    # 在缓冲区中停留过久的记录租约即将过期，释放后重新认领
+    release_records(table_name, packer.drain_stale(SIMULATE_LEASE_SECONDS / 2))
+
+    while len(simulate_info['simulate_ids']) < max_tasks and not simulate_info['stop']:
+
+        account = None
+        if accounts:
+            # 每批分派给负载最低且有空闲槽位的账号，所有账号都已满时停止
+            account = accounts.select()
+            if not account:
+                break
+        elif controller and not controller.has_capacity():
+            break
+
+        exhausted = False
+        if packer.free > 0:
+            _, records = claim_table_rows(table_name, simulate_info['query'], limit=packer.free,
+                                          lease_seconds=SIMULATE_LEASE_SECONDS, order_by=SIMULATE_CLAIM_ORDER)
+            exhausted = len(records) < packer.free
+
+            cached_ids = set(fill_from_simulation_cache(table_name, records))
+            packer.add([record for record in records if record.get('id') not in cached_ids])
 
-        table_name = f"{simulate_info['query']['region'].lower()}_alphas" if simulate_info['query']['region'] else 'all_alphas'
-        records = query_table(table_name, simulate_info['query'], limit=simulate_info.get('batch_size', 10))
-        ids = [record.get('id') for record in records]
-        # logger.info('len(records): %s', len(records))
-        # logger.info('records: %s', records)
+        if len(packer) == 0:
+            if exhausted:
+                logger.info("No more records to simulate.")
+                simulate_info['stop'] = True
+            break
 
-        if len(records) == 0:
-            logger.info("No more records to simulate.")
-            simulate_info['stop'] = True
+        batch = packer.pop_batch(force=exhausted)
+        if not batch:
+            # 等待更多兼容设置的记录凑满批次
             break
 
-        sim_data_list = []
-        first_region = records[0].get('region')
+        ids = [record.get('id') for record in batch]
+        try:
+            sim_data_list = [create_simulation_data(record) for record in batch]
+            if account:
+                simulate_id = submit_one_batch(ids, account.session, sim_data_list, simulate_info, table_name,
+                                               account.controller, journal, account.name)
+            else:
+                simulate_id = submit_one_batch(ids, session, sim_data_list, simulate_info, table_name, controller, journal)
+        except Exception as e:
+            # 已从缓冲区取出的批次不会再被 drain 释放，出错时同样需要释放认领
+            logger.error("Failed to submit batch %s: %s", ids, e)
+            simulate_id = None
+        if not simulate_id:
+            # 未提交成功的记录释放认领，允许立即被重新认领；本轮停止，交由调用方决定何时重试
+            release_records(table_name, batch)
+            break
+        new_simulate_ids.append(simulate_id)
 
-        for record in records:
+    if temporary_packer:
+        release_records(table_name, packer.drain())
 
-            if record.get('region') != first_region or len(sim_data_list)==simulate_info.get('batch_size', 10):
-                submit_one_batch(ids, session, sim_data_list, simulate_info, table_name)
-                sim_data_list = []
-                first_region = record.get('region')
+    return new_simulate_ids
 
-            sim_data = create_simulation_data(record)
-            sim_data_list.append(sim_data)
 
-        submit_one_batch(ids, session, sim_data_list, simulate_info, table_name)
+def release_records(table_name, records):
+    """按认领令牌释放记录的认领"""
+    ids_by_token = {}
+    for record in records:
+        ids_by_token.setdefault(record.get('claim_token'), []).append(record.get('id'))
+    for token, ids in ids_by_token.items():
+        if token:
+            release_claim(table_name, token, ids)
 
 
-def submit_one_batch(ids, session, sim_data_list, simulate_info, table_name):
-    simulation_response = submit_simulation(session, sim_data_list if len(sim_data_list) > 1 else sim_data_list[0])
+def fill_from_simulation_cache(table_name, records) -> list:
+    """
+    用回测结果缓存填充已回测过相同表达式与设置的记录，返回已填充的记录id
+    """
+    cached = lookup_simulation_cache(records)
+    if not cached:
+        return []
+
+    # 缓存中的 alpha_id/simulate_id 属于首次回测的记录，不复制：填充的记录没有平台标识，
+    # 是已回测Alpha的重复，不参与分组最优Alpha的检查与提交
+    batch_update_table(table_name, [
+        {'conditions': {'id': record_id},
+         'updates': {**{k: v for k, v in result.items() if k not in CACHE_IDENTIFIER_FIELDS},
+                     'claim_token': None, 'lease_expires_at': None}}
+        for record_id, result in cached.items()
+    ])
+    record_transition(table_name, list(cached), 0, 1)
+    logger.info("Filled %s records from simulation cache.", len(cached))
+    return list(cached)
+
+
+def submit_one_batch(ids, session, sim_data_list, simulate_info, table_name, controller: AIMDController = None,
+                     journal: SimulationJournal = None, account: str = None) -> Optional[str]:
+    if controller and not controller.try_acquire():
+        return None
+
+    try:
+        simulation_response = submit_simulation(session, sim_data_list if len(sim_data_list) > 1 else sim_data_list[0])
+    except Exception as e:
+        # 超时、连接断开等网络异常：归还槽位，记录的认领由调用方释放
+        logger.error("Simulate submit error: %s", e)
+        if controller:
+            controller.release()
+        return None
     if simulation_response.status_code == 429:
         logger.warning("Simulate FAILED: %s", simulation_response.content.decode())
         # Simulation failed: {"detail": "CONCURRENT_SIMULATION_LIMIT_EXCEEDED"}
-        simulate_info['n_tasks_max'] = simulate_info['n_tasks_max'] - 1
-        return
+        if controller:
+            controller.release()
+            controller.on_throttled()
+        else:
+            simulate_info['n_tasks_max'] = simulate_info['n_tasks_max'] - 1
+        return None
     if simulation_response.status_code != 201:
         logger.error("Simulation response status: %s", simulation_response.status_code)
         logger.error("Simulation failed: %s", simulation_response.content.decode())
         # print(json.dumps(sim_data_list, indent=4, ensure_ascii=False))
-        return
+        if controller:
+            controller.release()
+        return None
+    if controller:
+        controller.on_success()
     progress_url = simulation_response.headers['Location']
     logger.info("Simulate SUBMITTED: %s", progress_url)
     simulate_id = progress_url.split('/')[-1]
     # logger.info("simulate_id: %s", simulate_id)
     update_table(table_name, {'id': ids}, {'simulated': -1, 'simulate_id': simulate_id})
+    record_transition(table_name, ids, 0, -1)
+    start_time = time.time()
+    if journal:
+        journal.record_submitted(simulate_id, get_task_id(simulate_info['query']), table_name,
+                                 simulate_info['query'], ids, start_time, account)
     with lock:
-        simulate_info['simulate_ids'][simulate_id] = {'ids': ids, 'start_time': time.time()}
+        simulate_info['simulate_ids'][simulate_id] = {'ids': ids, 'start_time': start_time, 'account': account}
         simulate_info['n_tasks'] = len(simulate_info['simulate_ids'])
+    return simulate_id
 
 
-def check_progress(s:AutoLoginSession, simulate_id):
+def poll_progress(s: AutoLoginSession, simulate_id):
+    """
+    查询一次回测进度，不阻塞等待
+
+    Returns:
+        (是否完成, 响应JSON, 下次查询前应等待的秒数)
+    """
     simulation_progress = s.get(f"{simulation_url}/{simulate_id}")
 
     # logger.info(f"{simulation_url}/{simulate_id} check_progress result: %s", simulation_progress.json())
@@ -214,38 +541,66 @@ def check_progress(s:AutoLoginSession, simulate_id):
     if simulation_progress.status_code == 504:
         logger.warning("Simulate 504 FAILED: %s", simulation_progress.content.decode())
         # 504 Gateway Time - out
-        return False, {'errr': '504 Gateway Time - out'}
-    
+        return False, {'errr': '504 Gateway Time - out'}, DEFAULT_POLL_INTERVAL
+
     # 添加响应检查
     if not simulation_progress.ok:
         logger.error("Failed to check progress for %s. Status code: %s", simulate_id, simulation_progress.status_code)
         logger.error("Response content: %s", simulation_progress.content.decode('utf-8') if simulation_progress.content else "Empty response")
-        return True, {}
-
-    if simulation_progress.headers.get("Retry-After", 0) == 0:
-        # 检查响应内容是否可以解析为JSON
-        try:
-            response_json = simulation_progress.json()
-            return True, response_json
-        except json.JSONDecodeError as e:
-            logger.error("Failed to decode JSON for progress check %s. Error: %s", simulate_id, str(e))
-            logger.error("Response content: %s", simulation_progress.content.decode('utf-8') if simulation_progress.content else "Empty response")
-            return True, {}
+        return True, {}, 0
 
-    sleep(float(simulation_progress.headers["Retry-After"]))
+    retry_after = float(simulation_progress.headers.get("Retry-After", 0))
 
     # 检查响应内容是否可以解析为JSON
     try:
         response_json = simulation_progress.json()
-        return False, response_json
     except json.JSONDecodeError as e:
         logger.error("Failed to decode JSON for progress check %s. Error: %s", simulate_id, str(e))
         logger.error("Response content: %s", simulation_progress.content.decode('utf-8') if simulation_progress.content else "Empty response")
-        return False, {}
+        response_json = {}
+
+    return retry_after == 0, response_json, retry_after
+
+
+def check_progress(s:AutoLoginSession, simulate_id):
+    """查询一次回测进度，未完成时按Retry-After阻塞等待后返回"""
+    progress_complete, response_json, retry_after = poll_progress(s, simulate_id)
+    if not progress_complete:
+        sleep(retry_after)
+    return progress_complete, response_json
+
+
+def handle_simulate_result(session: AutoLoginSession, task_info, simulate_id, response, table_name):
+    """回测结束后保存结果；回测失败时记录失败原因"""
+    ids = task_info['simulate_ids'][simulate_id]['ids']
+    if response.get("status") in ["COMPLETE", "WARNING"]:
+        time_used = time.time() - task_info['simulate_ids'][simulate_id].get('start_time')
+        logger.info("Completed simulations in %s seconds: %s", int(time_used), simulate_id)
+        # 结果只写入本次提交的记录，使回测状态计数与实际更新的记录一致
+        if response.get("alpha"):
+            save_alpha_simulate_result(response.get('alpha'), simulate_id, session, table_name, ids=ids)
+        else:
+            save_simulate_result(session, simulate_id, table_name=table_name, ids=ids)
+        record_transition(table_name, ids, -1, 1)
+    else:
+        logger.error("Fail simulations: %s", simulate_id)
+        logger.error("Fail reasons: \n%s", json.dumps(response, indent=4, ensure_ascii=False))
+
+        update_table(table_name, {'id': ids}, {'simulated': -2, 'fail_reasons': json.dumps(response)})
+        record_transition(table_name, ids, -1, -2)
+
+        for child in response.get('children', []):
+            error_url = f"{simulation_url}/{child}"
+            logger.error("Error: %s", error_url)
+
+            error_response = session.get(error_url)
+            logger.error("Error response: %s", error_response.status_code)
+            logger.error("Error response content: %s", error_response.content.decode('utf-8') if error_response.content else "Empty response")
 
 
 def check_simulate_task(session: AutoLoginSession, task_info):
-    table_name = f"{task_info['query']['region'].lower()}_alphas" if task_info['query']['region'] else 'all_alphas'
+    """依次查询任务中所有进行中回测的进度(同步方式，回测引擎使用各自的跟踪协程)"""
+    table_name = get_table_name(task_info['query'])
     completed_simulate_ids = [simulate_id for simulate_id, simulate_info in task_info['simulate_ids'].items()
                               if simulate_info.get('end_time') is not None]
 
@@ -262,35 +617,14 @@ def check_simulate_task(session: AutoLoginSession, task_info):
         if progress_complete:
             # logger.info("progress_data: %s", response)
             simulate_info.update({'end_time': time.time()})
-
-            if response.get("status") in ["COMPLETE", "WARNING"]:
-                time_used = time.time() - simulate_info.get('start_time')
-                logger.info("Completed simulations in %s seconds: %s", int(time_used), simulate_id)
-                if response.get("alpha"):
-                    save_alpha_simulate_result(response.get('alpha'), simulate_id, session, table_name)
-                else:
-                    save_simulate_result(session, simulate_id, table_name=table_name)
-            else:
-                logger.error("Fail simulations: %s", simulate_id)
-                logger.error("Fail reasons: \n%s", json.dumps(response, indent=4, ensure_ascii=False))
-
-                ids = task_info['simulate_ids'][simulate_id]['ids']
-                update_table(table_name, {'id': ids}, {'simulated': -2, 'fail_reasons': json.dumps(response)})
-
-                for child in response.get('children', []):
-                    error_url = f"{simulation_url}/{child}"
-                    logger.error("Error: %s", error_url)
-
-                    error_response = session.get(error_url)
-                    logger.error("Error response: %s", error_response.status_code)
-                    logger.error("Error response content: %s", error_response.content.decode('utf-8') if error_response.content else "Empty response")
+            handle_simulate_result(session, task_info, simulate_id, response, table_name)
 
         else:
             simulate_info.update(response)
             time_used = time.time() - simulate_info.get('start_time')
             simulate_info['time_used'] = time_used
 
-            if time_used > 3600:
+            if time_used > SIMULATE_TIMEOUT:
                 simulate_info.update({'end_time': time.time(), 'error': 'timeout'})
                 logger.warning("Simulate timeout: %s", simulate_id)
 
@@ -301,11 +635,13 @@ def get_unsimulated_records(query, limit=10):
     """
     获取未模拟的记录
     """
-    table_name = f"{query.get('region').lower()}_alphas" if query.get('region') else "all_alphas"
-    return query_table(table_name, query, limit=limit)
+    return query_table(get_table_name(query), query, limit=limit)
 
 
-def save_simulate_result(s: AutoLoginSession, simulate_id, table_name=None):
+def save_simulate_result(s: AutoLoginSession, simulate_id, table_name=None, ids=None):
+    """
+    获取回测结果并写回数据库，ids 不为None时只更新这些记录(按表达式与设置匹配到的其他记录不更新)
+    """
     try:
         response = s.get(f"{simulation_url}/{simulate_id}")
     except Exception as e:
@@ -334,54 +670,91 @@ def save_simulate_result(s: AutoLoginSession, simulate_id, table_name=None):
         return
 
     if response_json.get('alpha'):
-        save_alpha_simulate_result(response_json.get('alpha'), simulate_id, s, table_name)
+        save_alpha_simulate_result(response_json.get('alpha'), simulate_id, s, table_name, ids=ids)
         return
 
-    for child in response_json.get('children', []):
-        url = f"{simulation_url}/{child}"
-        response = s.get(url)
+    # 并发获取所有子任务的回测结果，最后一次性批量写回数据库
+    children = response_json.get('children', [])
+    if not children:
+        return
 
-        try_count = 0
-        while response.status_code == 504 and try_count < 5:
-            try_count += 1
-            logger.warning("504 Gateway Timeout for CHILD simulation %s. Retrying... %s", simulate_id, try_count)
-            sleep(5)
-            response = s.get(url)
+    with ThreadPoolExecutor(max_workers=min(len(children), CHILD_FETCH_WORKERS),
+                            thread_name_prefix="simulate-child") as executor:
+        result_updates = [result_update for result_update in executor.map(lambda child: fetch_child_simulate_result(s, child), children)
+                          if result_update]
 
-        # 检查子任务响应
-        if not response.ok:
-            logger.error("Failed to get CHILD simulation %s. Status code: %s", child, response.status_code)
-            logger.error("Response content: %s", response.content.decode('utf-8') if response.content else "Empty response")
-            continue
+    if result_updates:
+        batch_update_table(table_name, [scope_result_update(item, ids) for item in result_updates])
+        store_simulation_results(result_updates)
+        update_alpha_rankings(table_name, [item['updates']['alpha_id'] for item in result_updates])
 
-        if not response.content:
-            logger.error("Empty response received for CHILD simulation %s", child)
-            continue
 
-        try:
-            child_response_json = response.json()
-        except json.JSONDecodeError as e:
-            logger.error("Failed to decode JSON for CHILD simulation %s. Error: %s", child, str(e))
-            logger.error("Response content: %s", response.content.decode('utf-8') if response.content else "Empty response")
-            continue
+def fetch_child_simulate_result(s: AutoLoginSession, child):
+    """
+    获取单个子回测及其alpha详情，返回 build_alpha_simulate_result 的结果，失败时返回None
+    """
+    url = f"{simulation_url}/{child}"
+    # 504 已由会话的重试策略按退避重试
+    response = s.get(url)
+
+    # 检查子任务响应
+    if not response.ok:
+        logger.error("Failed to get CHILD simulation %s. Status code: %s", child, response.status_code)
+        logger.error("Response content: %s", response.content.decode('utf-8') if response.content else "Empty response")
+        return None
+
+    if not response.content:
+        logger.error("Empty response received for CHILD simulation %s", child)
+        return None
+
+    try:
+        child_response_json = response.json()
+    except json.JSONDecodeError as e:
+        logger.error("Failed to decode JSON for CHILD simulation %s. Error: %s", child, str(e))
+        logger.error("Response content: %s", response.content.decode('utf-8') if response.content else "Empty response")
+        return None
+
+    # 检查响应中是否包含 'alpha' 字段
+    if 'alpha' not in child_response_json:
+        logger.error("Missing 'alpha' field in response for child simulation %s", child)
+        logger.error("Response content: %s", json.dumps(child_response_json, indent=2))
+        return None
+
+    alpha_id = child_response_json['alpha']
+    try:
+        return build_alpha_simulate_result(alpha_id, child, s)
+    except Exception as e:
+        logger.error("Failed to build simulate result for alpha %s: %s", alpha_id, e)
+        return None
+
 
-        # 检查响应中是否包含 'alpha' 字段
-        if 'alpha' not in child_response_json:
-            logger.error("Missing 'alpha' field in response for child simulation %s", child)
-            logger.error("Response content: %s", json.dumps(child_response_json, indent=2))
-            continue
+def save_alpha_simulate_result(alpha_id, simulate_id, s, table_name, ids=None):
+    result_update = build_alpha_simulate_result(alpha_id, simulate_id, s)
+    if result_update:
+        result_update = scope_result_update(result_update, ids)
+        update_table(table_name, updates=result_update['updates'], conditions=result_update['conditions'])
+        store_simulation_results([result_update])
+        update_alpha_rankings(table_name, [result_update['updates']['alpha_id']])
 
-        alpha_id = child_response_json['alpha']
-        # regular = response.json()['regular']
 
-        save_alpha_simulate_result(alpha_id, child, s, table_name)
+def scope_result_update(result_update, ids=None):
+    """回测结果的更新条件限定为 ids 中的记录，ids 为None时不限定"""
+    if ids is None:
+        return result_update
+    return {**result_update, 'conditions': {'id': list(ids), **result_update['conditions']}}
 
 
-def save_alpha_simulate_result(alpha_id, simulate_id, s, table_name):
+def build_alpha_simulate_result(alpha_id, simulate_id, s):
+    """
+    获取alpha回测结果并构造数据库更新操作，格式与 batch_update_table 的更新项一致
+
+    Returns:
+        {'conditions': {...}, 'updates': {...}, 'cache_key': 回测结果缓存键}，获取失败时返回None
+    """
     r = get_alpha_one(s, alpha_id)
     if not r:
         logger.error("Failed to get alpha simulate result: %s", alpha_id)
-        return
+        return None
     checks = r.get('is').get('checks')
     # 解析检查结果
     # passed = all(item["result"] == "PASS" for item in checks)
@@ -423,8 +796,10 @@ def save_alpha_simulate_result(alpha_id, simulate_id, s, table_name):
         'delay': r['settings']['delay'],
         'neutralization': r['settings']['neutralization']
     }
-    # table_name = f"{r['settings']['region'].lower()}_alphas"
-    update_table(table_name, updates=set_data, conditions=where_data)
+    cache_key = simulation_cache_key(where_data['alpha'], where_data['region'], where_data['universe'],
+                                     where_data['delay'], r['settings'].get('decay'), where_data['neutralization'],
+                                     r['settings'].get('truncation'))
+    return {'conditions': where_data, 'updates': set_data, 'cache_key': cache_key}
 
 def get_long_short_count_from_yearly_stats(alpha_id):
     url = f"https://api.worldquantbrain.com/alphas/{alpha_id}/recordsets/yearly-stats"
@@ -437,16 +812,14 @@ def get_long_short_count_from_yearly_stats(alpha_id):
     return long_count + short_count
 
 
-def get_alpha_one(s: AutoLoginSession, alpha_id, retry=0):
+def get_alpha_one(s: AutoLoginSession, alpha_id):
     url = f"https://api.worldquantbrain.com/alphas/{alpha_id}"
+    # 504 已由会话的重试策略按退避重试
     response = s.get(url)
 
     if response.status_code == 504:
-        logger.warning("Timeout error when getting alpha %s, retried %s", alpha_id, retry)
-        if retry > 3:
-            logger.error("Timeout error when getting alpha %s, retried %s", alpha_id, retry)
-            return {}
-        return get_alpha_one(s, alpha_id, retry + 1)
+        logger.error("Timeout error when getting alpha %s", alpha_id)
+        return {}
     
     # 添加响应检查
     if not response.ok:
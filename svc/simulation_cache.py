@@ -0,0 +1,95 @@
+import hashlib
+import json
+import re
+from typing import Any, Dict, List
+
+from svc.database import db_connection
+from svc.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+SIMULATION_CACHE_TABLE = "simulation_cache"
+# 与 create_simulation_data 中的固定设置保持一致
+DEFAULT_TRUNCATION = 0.01
+
+
+def normalize_expression(expression: str) -> str:
+    """规范化Alpha表达式：去掉所有空白与末尾分号，使仅格式不同的表达式得到相同的键"""
+    return re.sub(r"\s+", "", expression or "").rstrip(";")
+
+
+def simulation_cache_key(alpha: str, region: str, universe: str, delay: Any, decay: Any, neutralization: str,
+                         truncation: float = DEFAULT_TRUNCATION) -> str:
+    """
+    回测结果缓存键：规范化表达式与回测设置的哈希
+    """
+    content = json.dumps([
+        normalize_expression(alpha), region, universe, int(delay or 0), int(decay or 0), neutralization,
+        float(truncation if truncation is not None else DEFAULT_TRUNCATION),
+    ])
+    return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+
+def record_cache_key(record: Dict[str, Any]) -> str:
+    """待回测记录的缓存键"""
+    return simulation_cache_key(record.get('alpha'), record.get('region'), record.get('universe'), record.get('delay'),
+                                record.get('decay'), record.get('neutralization'))
+
+
+def lookup_simulation_cache(records: List[Dict[str, Any]]) -> Dict[Any, Dict[str, Any]]:
+    """
+    查找已有回测结果的记录
+
+    Returns:
+        {记录id: 回测结果(可直接用于更新该记录)}
+    """
+    keys = {record['id']: record_cache_key(record) for record in records}
+    if not keys:
+        return {}
+
+    try:
+        with db_connection() as connection:
+            cursor = connection.cursor(dictionary=True)
+            unique_keys = list(set(keys.values()))
+            cursor.execute(
+                f"SELECT cache_key, result FROM {SIMULATION_CACHE_TABLE} "
+                f"WHERE cache_key IN ({','.join(['%s'] * len(unique_keys))})",
+                unique_keys
+            )
+            cached = {row['cache_key']: json.loads(row['result']) for row in cursor.fetchall()}
+            cursor.close()
+    except Exception as e:
+        logger.error(f"查询回测结果缓存失败: {e}")
+        return {}
+
+    return {record_id: cached[key] for record_id, key in keys.items() if key in cached}
+
+
+def store_simulation_results(results: List[Dict[str, Any]]) -> int:
+    """
+    写入回测结果缓存
+
+    Args:
+        results: build_alpha_simulate_result 的返回值列表，需包含 cache_key 与 updates
+
+    Returns:
+        写入的行数
+    """
+    rows = [(item['cache_key'], json.dumps(item['updates'])) for item in results if item.get('cache_key')]
+    if not rows:
+        return 0
+
+    try:
+        with db_connection() as connection:
+            cursor = connection.cursor()
+            cursor.executemany(
+                f"INSERT INTO {SIMULATION_CACHE_TABLE} (cache_key, result) VALUES (%s, %s) "
+                f"ON DUPLICATE KEY UPDATE result = VALUES(result)",
+                rows
+            )
+            connection.commit()
+            cursor.close()
+            return len(rows)
+    except Exception as e:
+        logger.error(f"写入回测结果缓存失败: {e}")
+        return 0
@@ -0,0 +1,175 @@
+from typing import Any, Dict, List
+
+from svc.database import db_connection
+from svc.logger import setup_logger
+from svc.query_cache import invalidate_query_cache
+
+logger = setup_logger(__name__)
+
+SIMULATION_STATS_TABLE = "simulation_stats"
+# 计数分组字段，与回测页面的筛选条件一致
+STATS_GROUP_FIELDS = ("region", "universe", "delay", "phase", "category")
+# 分组字段为NULL时在计数表中的取值(计数表的主键列不允许NULL)
+_GROUP_SELECT = "IFNULL(region, ''), IFNULL(universe, ''), IFNULL(delay, 0), IFNULL(phase, 0), IFNULL(category, '')"
+
+
+def _group_key(record: Dict[str, Any]) -> tuple:
+    return (record.get('region') or '', record.get('universe') or '', record.get('delay') or 0,
+            record.get('phase') or 0, record.get('category') or '')
+
+
+def record_transition(table_name: str, ids: List[Any], from_state: int, to_state: int) -> int:
+    """
+    记录一批记录的回测状态变化：ids 中当前为 to_state 的记录从 from_state 计数移到 to_state 计数
+
+    调用方需在更新 simulated 之后调用，且这些记录更新前确为 from_state(如由本进程认领或提交的记录)
+
+    Returns:
+        计入状态变化的记录数
+    """
+    if not ids:
+        return 0
+
+    try:
+        with db_connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(
+                f"""
+                SELECT {_GROUP_SELECT}, COUNT(*) FROM {table_name}
+                WHERE id IN ({','.join(['%s'] * len(ids))}) AND simulated = %s
+                GROUP BY {', '.join(STATS_GROUP_FIELDS)}
+                """,
+                list(ids) + [to_state]
+            )
+            groups = cursor.fetchall()
+            if groups:
+                rows = []
+                for *group, count in groups:
+                    rows.append((table_name, *group, from_state, -count))
+                    rows.append((table_name, *group, to_state, count))
+                _add_counts(cursor, rows)
+            connection.commit()
+            cursor.close()
+            invalidate_query_cache(table_name)
+            return sum(group[-1] for group in groups)
+    except Exception as e:
+        logger.error(f"更新回测状态计数失败: {e}")
+        return 0
+
+
+def _add_counts(cursor, rows: List[tuple]):
+    cursor.executemany(
+        f"""
+        INSERT INTO {SIMULATION_STATS_TABLE} (table_name, region, universe, delay, phase, category, simulated, count)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE count = count + VALUES(count)
+        """,
+        rows
+    )
+
+
+def stats_group_key(record: Dict[str, Any]) -> tuple:
+    """
+    待插入记录在计数表中的 (分组字段..., simulated)，作为 bulk_insert_records 的 group_key
+    """
+    return (*_group_key(record), record.get('simulated') or 0)
+
+
+def refresh_simulation_stats(table_name: str, inserted_groups: Dict[tuple, int]) -> int:
+    """
+    插入新记录后按实际插入数增加所在分组的计数
+
+    Args:
+        table_name: 插入记录的表
+        inserted_groups: bulk_insert_records(..., group_key=stats_group_key) 返回的 groups，{stats_group_key: 插入数}
+
+    Returns:
+        增加的记录数
+    """
+    rows = [(table_name, *key, count) for key, count in sorted(inserted_groups.items()) if count]
+    if not rows:
+        return 0
+
+    try:
+        with db_connection() as connection:
+            cursor = connection.cursor()
+            _add_counts(cursor, rows)
+            connection.commit()
+            cursor.close()
+            invalidate_query_cache(table_name)
+            return sum(row[-1] for row in rows)
+    except Exception as e:
+        logger.error(f"更新回测状态计数失败: {e}")
+        return 0
+
+
+def rebuild_simulation_stats(table_name: str) -> int:
+    """
+    从回测记录表全量重建回测状态计数(首次启用或数据修复时使用)
+
+    Returns:
+        重建后的计数行数
+    """
+    try:
+        with db_connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(f"DELETE FROM {SIMULATION_STATS_TABLE} WHERE table_name = %s", (table_name,))
+            cursor.execute(
+                f"""
+                INSERT INTO {SIMULATION_STATS_TABLE} (table_name, region, universe, delay, phase, category, simulated, count)
+                SELECT %s, {_GROUP_SELECT}, simulated, COUNT(*) FROM {table_name}
+                GROUP BY {', '.join(STATS_GROUP_FIELDS)}, simulated
+                """,
+                (table_name,)
+            )
+            connection.commit()
+            affected_rows = cursor.rowcount
+            cursor.close()
+            invalidate_query_cache(table_name)
+            logger.info("Rebuilt %s simulation stats rows for %s.", affected_rows, table_name)
+            return affected_rows
+    except Exception as e:
+        logger.error(f"重建回测状态计数失败: {e}")
+        return 0
+
+
+def query_simulation_stats(table_name: str, universe: str = None, delay: int = None, phase: int = None,
+                           category: str = None) -> List[Dict[str, Any]]:
+    """
+    从计数表读取按 category、simulated 汇总的记录数，格式与 query_alphas_simulation_stats 一致
+
+    Returns:
+        [{'category': ..., 'simulated': ..., 'count': ...}]
+    """
+    try:
+        with db_connection() as connection:
+            cursor = connection.cursor(dictionary=True)
+            query = f"""
+            SELECT category, simulated, CAST(SUM(count) AS SIGNED) as count
+            FROM {SIMULATION_STATS_TABLE}
+            WHERE table_name = %s
+            """
+            params = [table_name]
+
+            if universe is not None:
+                query += " AND universe = %s"
+                params.append(universe)
+            if delay is not None:
+                query += " AND delay = %s"
+                params.append(delay)
+            if phase is not None:
+                query += " AND phase = %s"
+                params.append(phase)
+            if category is not None:
+                query += " AND category = %s"
+                params.append(category)
+
+            query += " GROUP BY category, simulated HAVING SUM(count) > 0 ORDER BY category, simulated"
+
+            cursor.execute(query, params)
+            results = cursor.fetchall()
+            cursor.close()
+            return results
+    except Exception as e:
+        logger.error(f"查询回测状态计数失败: {e}")
+        return []
@@ -1,4 +1,3 @@
-import logging
 import threading
 from typing import Any, List, Dict
 
@@ -9,11 +8,17 @@ import json
 from ai.alpha_desc_updater import get_alpha_desc_related_info, update_brain_alpha_desc
 from ai.ask_ai import ask_dashscope, ai_prompt
 from svc.auth import get_auto_login_session, AutoLoginSession
+from svc.check_cache import invalidate_check_cache
 from svc.database import update_table
 from svc.logger import setup_logger
+from svc.rate_limit import get_retry_after
+from svc.submitted_alphas import sync_submitted_alphas, query_submitted_alphas
 
 logger = setup_logger(__name__)
 
+# 提交进行中且响应缺少有效 Retry-After 时的等待秒数
+SUBMIT_RETRY_AFTER = 60
+
 @st.cache_resource
 def get_submit_task_manager():
     return SubmitTaskManager()
@@ -55,6 +60,10 @@ def submit_task(records: List[Dict[str, Any]], status: Dict[str, Any], manager=N
     max_submit_count = status.get("max_submit_count", 4)
     session = get_auto_login_session()
 
+    # 跳过已在平台上提交过的Alpha(如在其他地方提交的)
+    sync_submitted_alphas(session)
+    submitted_ids = {row['alpha_id'] for row in query_submitted_alphas(status.get('region'))}
+
     for idx, record in enumerate(records, start=1):
         status.update({
             "progress": f'{idx}/{len(records)}',
@@ -87,6 +96,12 @@ def submit_task(records: List[Dict[str, Any]], status: Dict[str, Any], manager=N
 
             return None
             
+        if record['alpha_id'] in submitted_ids:
+            table_name = f"{record['region'].lower()}_alphas" if status.get('region') else "all_alphas"
+            update_table(table_name, {'alpha_id': record['alpha_id']}, {'submitted': 1})
+            logger.info(f"Alpha {record['alpha_id']} is already submitted, skipped.")
+            continue
+
         success, error = submit_alpha(session, record['alpha_id'], record['region'], status)
 
         if success:
@@ -134,44 +149,12 @@ def submit_task(records: List[Dict[str, Any]], status: Dict[str, Any], manager=N
     return None
 
 
-def get_submitted_alphas_brain(s: AutoLoginSession):
-    result = []
-    done = False
-
-    # url_params = {
-    #     'limit': 10,
-    #     'offset': 0,
-    #     'status!': 'UNSUBMITTEDIS-FAIL',
-    #     'order': '-dateSubmitted',
-    #     'hidden': 'false'
-    # }
-
-    url = "https://api.worldquantbrain.com:443/users/self/alphas?hidden=false&limit=100&offset=0&order=-dateSubmitted&status%21=UNSUBMITTED%1FIS-FAIL"
-
-    while not done:
-        print(f"Fetching alphas from {url}...")
-        response = s.get(url)
-
-        if response.status_code == 200:
-            result.extend(response.json().get("results"))
-
-            if response.json().get("next"):
-                next_url = response.json().get("next")
-                # 确保next_url使用HTTPS协议
-                if not next_url.startswith("https"):
-                    next_url = next_url.replace("http", "https", 1)
-                url = next_url
-            else:
-                done = True
-
-        elif response.status_code == 400:
-            logging.getLogger(__name__).error(f"Bad request: {response.status_code} - {response.text}")
-            return None
-        else:
-            logging.getLogger(__name__).error(f"Failed to fetch alphas: {response.status_code} - {response.text}")
-            return None
-
-    return result
+def get_submitted_alphas_brain(s: AutoLoginSession, region: str = None):
+    """
+    获取已提交的Alpha(平台返回的原始数据)：先增量同步到 submitted_alphas 表，再从表中读取
+    """
+    sync_submitted_alphas(s)
+    return [row['data'] for row in query_submitted_alphas(region)]
 
 
 def submit_alpha(s: AutoLoginSession, alpha_id, region, task_info=None):
@@ -216,12 +199,14 @@ def submit_alpha(s: AutoLoginSession, alpha_id, region, task_info=None):
             })
             logger.info(f'Submitting alpha {alpha_id}... time used: {round(time.time() - time_start)}.')
 
-            time.sleep(60)  # float(response.headers["Retry-After"])
+            time.sleep(get_retry_after(response, SUBMIT_RETRY_AFTER))
             response = s.get(url)
 
     if response.status_code == 200 or response.status_code == 404:
         table_name = f"{region.lower()}_alphas" if task_info.get('region') else "all_alphas"
         update_table(table_name, {'alpha_id': alpha_id}, {'submitted': 1})
+        # 已提交集合变化，依赖它的检查结果(如自相关性)需重新检查
+        invalidate_check_cache()
         logger.info(f"Alpha {alpha_id} submitted successfully with status code {response.status_code}")
         return True, None
 
@@ -239,6 +224,7 @@ def submit_alpha(s: AutoLoginSession, alpha_id, region, task_info=None):
             error = 'ALREADY_SUBMITTED'
             table_name = f"{region.lower()}_alphas" if task_info.get('region') else "all_alphas"
             update_table(table_name, {'alpha_id': alpha_id}, {'submitted': 1})
+            invalidate_check_cache()
 
         else:
             # 检查未通过的情形，如sharp值小于1.58
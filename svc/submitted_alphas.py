@@ -0,0 +1,179 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from svc.auth import AutoLoginSession
+from svc.check_cache import invalidate_check_cache
+from svc.database import db_connection
+from svc.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+SUBMITTED_ALPHAS_TABLE = "submitted_alphas"
+SUBMITTED_ALPHAS_URL = "https://api.worldquantbrain.com/users/self/alphas"
+# 每页Alpha数量(平台上限100)
+SUBMITTED_PAGE_SIZE = 100
+# 并发获取剩余分页的线程数
+SUBMITTED_FETCH_WORKERS = 4
+# 重复获取已同步的Alpha时更新的字段(平台上的状态、指标或名称可能已变化)
+SUBMITTED_UPDATE_COLUMNS = ('name', 'sharp', 'fitness', 'data')
+
+
+def parse_date_submitted(value: Optional[str]) -> Optional[datetime]:
+    """平台返回的提交时间(如 2025-08-08T04:12:33-04:00)转换为不带时区的UTC时间"""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def build_submitted_record(alpha: Dict[str, Any]) -> Dict[str, Any]:
+    """平台返回的已提交Alpha转换为 submitted_alphas 表的记录"""
+    settings = alpha.get('settings') or {}
+    metrics = alpha.get('is') or {}
+    return {
+        'alpha_id': alpha.get('id'),
+        'region': settings.get('region'),
+        'universe': settings.get('universe'),
+        'delay': settings.get('delay'),
+        'name': alpha.get('name'),
+        'alpha': (alpha.get('regular') or {}).get('code'),
+        'sharp': metrics.get('sharpe'),
+        'fitness': metrics.get('fitness'),
+        'date_submitted': parse_date_submitted(alpha.get('dateSubmitted')),
+        'data': json.dumps(alpha),
+    }
+
+
+def get_high_water_mark() -> Optional[datetime]:
+    """本地已同步的最新提交时间(UTC)，未同步过时返回None"""
+    try:
+        with db_connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(f"SELECT MAX(date_submitted) FROM {SUBMITTED_ALPHAS_TABLE}")
+            (high_water_mark,) = cursor.fetchone()
+            cursor.close()
+            return high_water_mark
+    except Exception as e:
+        logger.error(f"查询已提交Alpha同步位置失败: {e}")
+        return None
+
+
+def fetch_submitted_page(s: AutoLoginSession, offset: int, since: Optional[datetime] = None) -> Optional[Dict[str, Any]]:
+    """获取一页已提交Alpha(按提交时间倒序)，since 指定时只返回该时间及之后提交的Alpha"""
+    params = {
+        "limit": SUBMITTED_PAGE_SIZE,
+        "offset": offset,
+        "status!": "UNSUBMITTED\x1FIS-FAIL",
+        "order": "-dateSubmitted",
+        "hidden": "false",
+    }
+    if since is not None:
+        params["dateSubmitted>"] = since.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+    response = s.get(SUBMITTED_ALPHAS_URL, params=params)
+    if response.status_code != 200:
+        logger.error(f"Failed to fetch submitted alphas (offset {offset}): {response.status_code} - {response.text}")
+        return None
+    return response.json()
+
+
+def sync_submitted_alphas(s: AutoLoginSession, max_workers: int = SUBMITTED_FETCH_WORKERS) -> int:
+    """
+    增量同步已提交Alpha到 submitted_alphas 表
+
+    只获取本地最新提交时间(高水位)前1秒之后提交的Alpha：先获取第一页得到总数 count，
+    再并发获取剩余分页。高水位附近已同步的Alpha会被重复获取，写入时更新其名称、指标与原始数据。
+    有新增的Alpha时说明已提交集合已变化，清除检查结果缓存。
+
+    Returns:
+        新增的Alpha数量，同步失败时返回0
+    """
+    high_water_mark = get_high_water_mark()
+    since = high_water_mark - timedelta(seconds=1) if high_water_mark else None
+    first = fetch_submitted_page(s, 0, since)
+    if first is None:
+        return 0
+
+    alphas = list(first.get('results') or [])
+    offsets = range(SUBMITTED_PAGE_SIZE, first.get('count') or 0, SUBMITTED_PAGE_SIZE)
+    if offsets:
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="submitted-sync") as executor:
+            pages = list(executor.map(lambda offset: fetch_submitted_page(s, offset, since), offsets))
+        if any(page is None for page in pages):
+            # 部分分页失败时不写入，避免高水位越过缺失的Alpha
+            return 0
+        for page in pages:
+            alphas.extend(page.get('results') or [])
+
+    records = [build_submitted_record(alpha) for alpha in alphas if alpha.get('id')]
+    inserted = upsert_submitted_records(records)
+    logger.info("Synced submitted alphas since %s: %s fetched, %s new.", high_water_mark, len(records), inserted)
+    if inserted:
+        invalidate_check_cache()
+    return inserted
+
+
+def upsert_submitted_records(records: List[Dict[str, Any]]) -> int:
+    """
+    写入已提交Alpha：新的Alpha插入，已存在的更新 SUBMITTED_UPDATE_COLUMNS 中的字段
+
+    Returns:
+        新增的Alpha数量，写入失败时返回0
+    """
+    if not records:
+        return 0
+
+    columns = list(records[0].keys())
+    alpha_ids = [record['alpha_id'] for record in records]
+    try:
+        with db_connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(
+                f"SELECT alpha_id FROM {SUBMITTED_ALPHAS_TABLE} WHERE alpha_id IN ({','.join(['%s'] * len(alpha_ids))})",
+                alpha_ids
+            )
+            existing = {row[0] for row in cursor.fetchall()}
+            cursor.executemany(
+                f"INSERT INTO {SUBMITTED_ALPHAS_TABLE} ({', '.join(columns)}) "
+                f"VALUES ({', '.join(['%s'] * len(columns))}) "
+                f"ON DUPLICATE KEY UPDATE {', '.join(f'{col} = VALUES({col})' for col in SUBMITTED_UPDATE_COLUMNS)}",
+                [[record.get(col) for col in columns] for record in records]
+            )
+            connection.commit()
+            cursor.close()
+            return len(set(alpha_ids) - existing)
+    except Exception as e:
+        logger.error(f"写入已提交Alpha失败: {e}")
+        return 0
+
+
+def query_submitted_alphas(region: str = None) -> List[Dict[str, Any]]:
+    """
+    查询本地已同步的已提交Alpha，data 字段已解析为平台返回的原始数据
+
+    Args:
+        region: 地区，None表示查询所有地区
+    """
+    try:
+        with db_connection() as connection:
+            cursor = connection.cursor(dictionary=True)
+            query = f"SELECT * FROM {SUBMITTED_ALPHAS_TABLE}"
+            params = []
+            if region is not None:
+                query += " WHERE region = %s"
+                params.append(region)
+            query += " ORDER BY date_submitted DESC"
+            cursor.execute(query, params)
+            results = cursor.fetchall()
+            cursor.close()
+    except Exception as e:
+        logger.error(f"查询已提交Alpha失败: {e}")
+        return []
+
+    for row in results:
+        row['data'] = json.loads(row['data']) if row.get('data') else {}
+    return results
@@ -0,0 +1,90 @@
+import unittest
+
+from svc.alpha_query import query_checkable_alpha_details
+from svc.alpha_ranking import rebuild_alpha_rankings, ALPHA_RANKINGS_TABLE
+from svc.database import db_connection, bulk_insert_records
+
+TEST_TABLE = "tst_alphas"
+
+
+class TestAlphaRanking(unittest.TestCase):
+    """测试分组最优Alpha：按阶段/neutralization筛选后再取分组最优(需要数据库)"""
+
+    @classmethod
+    def setUpClass(cls):
+        with db_connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {ALPHA_RANKINGS_TABLE} (
+                table_name varchar(32) NOT NULL,
+                region varchar(3) NOT NULL,
+                universe varchar(32) NOT NULL,
+                delay tinyint(4) NOT NULL,
+                phase int(11) NOT NULL DEFAULT 0,
+                neutralization varchar(32) NOT NULL DEFAULT '',
+                name varchar(128) NOT NULL DEFAULT '',
+                template varchar(32) NOT NULL DEFAULT '',
+                alpha_row_id int(11) NOT NULL,
+                score float NOT NULL DEFAULT 0,
+                updated_at datetime DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                PRIMARY KEY (table_name, region, universe, delay, phase, neutralization, name, template)
+            )
+            """)
+            cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {TEST_TABLE} (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                alpha_id varchar(32) DEFAULT NULL,
+                region varchar(3) DEFAULT NULL,
+                universe varchar(32) DEFAULT NULL,
+                delay tinyint(4) DEFAULT NULL,
+                phase int(11) DEFAULT NULL,
+                neutralization varchar(32) DEFAULT NULL,
+                name varchar(128) DEFAULT NULL,
+                template varchar(32) DEFAULT NULL,
+                category varchar(32) DEFAULT NULL,
+                simulated tinyint(4) DEFAULT 0,
+                passed tinyint(4) DEFAULT 0,
+                sharp float DEFAULT NULL,
+                fitness float DEFAULT NULL,
+                score float GENERATED ALWAYS AS (ABS(sharp * fitness)) STORED
+            )
+            """)
+            connection.commit()
+            cursor.close()
+
+    @classmethod
+    def tearDownClass(cls):
+        with db_connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(f"DELETE FROM {ALPHA_RANKINGS_TABLE} WHERE table_name = %s", (TEST_TABLE,))
+            cursor.execute(f"DROP TABLE IF EXISTS {TEST_TABLE}")
+            connection.commit()
+            cursor.close()
+
+    def setUp(self):
+        with db_connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(f"TRUNCATE TABLE {TEST_TABLE}")
+            connection.commit()
+            cursor.close()
+
+        base = {'region': 'TST', 'universe': 'TOP3000', 'delay': 1, 'name': 'close', 'template': 'gen',
+                'category': 'price', 'simulated': 1, 'passed': 0}
+        bulk_insert_records(TEST_TABLE, [
+            {**base, 'alpha_id': 'p1', 'phase': 1, 'neutralization': 'SUBINDUSTRY', 'sharp': 1.5, 'fitness': 1.0},
+            # 同一分组中分数更高的二阶段中性化变体
+            {**base, 'alpha_id': 'p2', 'phase': 2, 'neutralization': 'CROWDING', 'sharp': 2.0, 'fitness': 1.5},
+        ])
+        rebuild_alpha_rankings(TEST_TABLE)
+
+    def test_filtered_group_keeps_its_best(self):
+        query = query_checkable_alpha_details.__wrapped__
+
+        self.assertEqual([row['alpha_id'] for row in query(region='TST', phase=1)], ['p1'])
+        self.assertEqual([row['alpha_id'] for row in query(region='TST', neutralization='SUBINDUSTRY')], ['p1'])
+        # 不筛选时每个分组只返回分数最高的一条
+        self.assertEqual([row['alpha_id'] for row in query(region='TST')], ['p2'])
+
+
+if __name__ == '__main__':
+    unittest.main()
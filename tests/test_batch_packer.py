@@ -0,0 +1,45 @@
+import unittest
+
+from svc.batch_packer import BatchPacker
+
+
+def make_records(region, n, start=0, priority=0):
+    return [{'id': f"{region}-{start + i}", 'region': region, 'universe': 'TOP3000', 'delay': 1, 'priority': priority}
+            for i in range(n)]
+
+
+class TestBatchPacker(unittest.TestCase):
+    """测试按兼容设置打包满批次"""
+
+    def test_packs_full_batches_by_settings(self):
+        packer = BatchPacker(batch_size=3, capacity=10, max_wait=60)
+        # 不同地区交错的记录也能打包成满批次
+        packer.add(make_records('USA', 2) + make_records('EUR', 3, priority=5) + make_records('USA', 1, start=2))
+
+        batch = packer.pop_batch()
+        self.assertEqual([r['region'] for r in batch], ['EUR'] * 3)
+        batch = packer.pop_batch()
+        self.assertEqual([r['id'] for r in batch], ['USA-0', 'USA-1', 'USA-2'])
+        self.assertIsNone(packer.pop_batch())
+
+    def test_partial_batch_only_when_forced(self):
+        packer = BatchPacker(batch_size=3, capacity=10, max_wait=60)
+        packer.add(make_records('USA', 2))
+        self.assertIsNone(packer.pop_batch())
+        self.assertEqual(len(packer.pop_batch(force=True)), 2)
+        self.assertEqual(len(packer), 0)
+
+        packer = BatchPacker(batch_size=3, capacity=10, max_wait=0)
+        packer.add(make_records('USA', 1))
+        self.assertEqual(len(packer.pop_batch()), 1)
+
+    def test_drain_stale(self):
+        packer = BatchPacker(batch_size=3, capacity=10)
+        packer.add(make_records('USA', 2))
+        self.assertEqual(packer.drain_stale(60), [])
+        self.assertEqual(len(packer.drain_stale(-1)), 2)
+        self.assertEqual(len(packer), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+
+from svc.check_cache import split_submission_checks, is_cacheable, lookup_check_cache, store_check_result, \
+    invalidate_check_cache, CHECK_CACHE_TABLE
+from svc.database import db_connection
+
+TEST_ALPHA_IDS = ['TESTchk1', 'TESTchk2']
+
+
+class TestCheckCache(unittest.TestCase):
+    """测试检查结果缓存的检查项拆分"""
+
+    def test_split_submission_checks(self):
+        checks = [
+            {'name': 'LOW_SHARPE', 'result': 'PASS'},
+            {'name': 'SELF_CORRELATION', 'result': 'FAIL'},
+            {'name': 'REGULAR_SUBMISSION', 'result': 'FAIL', 'limit': 4, 'value': 4},
+        ]
+        alpha_checks, context = split_submission_checks(checks)
+        self.assertEqual([check['name'] for check in alpha_checks], ['LOW_SHARPE', 'SELF_CORRELATION'])
+        self.assertEqual(context, {'REGULAR_SUBMISSION': 4})
+
+    def test_pending_checks_not_cacheable(self):
+        self.assertTrue(is_cacheable([{'name': 'LOW_SHARPE', 'result': 'PASS'}]))
+        self.assertFalse(is_cacheable([{'name': 'SELF_CORRELATION', 'result': 'PENDING'}]))
+        self.assertFalse(is_cacheable([]))
+
+
+class TestCheckCacheDatabase(unittest.TestCase):
+    """测试检查结果缓存的写入、查找与过期(需要数据库)"""
+
+    @classmethod
+    def setUpClass(cls):
+        with db_connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {CHECK_CACHE_TABLE} (
+                alpha_id varchar(32) NOT NULL,
+                checks json DEFAULT NULL,
+                submission_context json DEFAULT NULL,
+                checked_at datetime DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (alpha_id),
+                KEY idx_checked_at (checked_at)
+            )
+            """)
+            connection.commit()
+            cursor.close()
+
+    def setUp(self):
+        invalidate_check_cache(TEST_ALPHA_IDS)
+
+    def tearDown(self):
+        invalidate_check_cache(TEST_ALPHA_IDS)
+
+    def test_store_and_lookup(self):
+        checks = [
+            {'name': 'LOW_SHARPE', 'result': 'PASS'},
+            {'name': 'SELF_CORRELATION', 'result': 'FAIL'},
+        ]
+        self.assertTrue(store_check_result('TESTchk1', checks))
+        self.assertFalse(store_check_result('TESTchk2', [{'name': 'SELF_CORRELATION', 'result': 'PENDING'}]))
+
+        self.assertEqual(lookup_check_cache(TEST_ALPHA_IDS), {'TESTchk1': checks})
+
+    def test_expired_results_not_returned(self):
+        store_check_result('TESTchk1', [{'name': 'LOW_SHARPE', 'result': 'FAIL'}])
+        with db_connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(f"UPDATE {CHECK_CACHE_TABLE} SET checked_at = DATE_SUB(NOW(), INTERVAL 2 HOUR) "
+                           f"WHERE alpha_id = %s", ('TESTchk1',))
+            connection.commit()
+            cursor.close()
+
+        self.assertEqual(lookup_check_cache(['TESTchk1'], ttl=3600), {})
+        self.assertIn('TESTchk1', lookup_check_cache(['TESTchk1'], ttl=3 * 3600))
+
+
+if __name__ == '__main__':
+    unittest.main()
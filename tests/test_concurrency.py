@@ -0,0 +1,43 @@
+import unittest
+
+from svc.concurrency import AIMDController
+
+
+class TestAIMDController(unittest.TestCase):
+    """测试AIMD并发控制器"""
+
+    def test_acquire_respects_window(self):
+        controller = AIMDController(initial_window=2, max_window=10)
+        self.assertTrue(controller.try_acquire())
+        self.assertTrue(controller.try_acquire())
+        self.assertFalse(controller.try_acquire())
+
+        controller.release()
+        self.assertTrue(controller.has_capacity())
+        self.assertEqual(controller.in_flight, 1)
+
+    def test_throttle_halves_window_then_probes_up(self):
+        controller = AIMDController(initial_window=8, max_window=10, backoff_cooldown=0)
+        controller.on_throttled()
+        self.assertEqual(controller.window, 4)
+
+        # 约每个窗口的成功提交后窗口+1，最终恢复到上限
+        for _ in range(200):
+            controller.on_success()
+        self.assertEqual(controller.window, 10)
+
+    def test_backoff_cooldown_and_min_window(self):
+        controller = AIMDController(initial_window=8, min_window=1, backoff_cooldown=60)
+        controller.on_throttled()
+        controller.on_throttled()
+        self.assertEqual(controller.window, 4)
+        self.assertEqual(controller.snapshot()["throttles"], 2)
+        self.assertEqual(controller.snapshot()["backoffs"], 1)
+
+        controller = AIMDController(initial_window=1, min_window=1, backoff_cooldown=0)
+        controller.on_throttled()
+        self.assertEqual(controller.window, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,14 @@
+import os
+import time
 import unittest
 import mysql.connector
 import streamlit as st
 
-from svc.database import insert_record, batch_insert_records, query_table, update_table
+from svc.database import insert_record, batch_insert_records, query_table, update_table, get_pool_stats, db_connection, \
+    bulk_insert_records, batch_update_table, claim_table_rows, release_claim, query_table_page, count_table, iter_table_rows
+from svc.logger import setup_logger
+
+logger = setup_logger(__name__)
 
 
 class TestDatabaseOperations(unittest.TestCase):
@@ -30,10 +36,25 @@ class TestDatabaseOperations(unittest.TestCase):
                 name VARCHAR(100) NOT NULL,
                 age INT,
                 email VARCHAR(100),
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                region VARCHAR(3) DEFAULT 'USA',
+                claim_token VARCHAR(32) DEFAULT NULL,
+                lease_expires_at DATETIME DEFAULT NULL
             )
             """
             cursor.execute(create_table_sql)
+
+            # 创建带唯一键的测试表，用于测试重复记录被忽略
+            create_unique_table_sql = """
+            CREATE TABLE IF NOT EXISTS test_unique_users (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                name VARCHAR(100) NOT NULL,
+                age INT,
+                email VARCHAR(100),
+                UNIQUE KEY idx_email (email)
+            )
+            """
+            cursor.execute(create_unique_table_sql)
             
             connection.commit()
             cursor.close()
@@ -60,6 +81,7 @@ class TestDatabaseOperations(unittest.TestCase):
             # 删除测试表
             drop_table_sql = "DROP TABLE IF EXISTS test_users"
             cursor.execute(drop_table_sql)
+            cursor.execute("DROP TABLE IF EXISTS test_unique_users")
             
             connection.commit()
             cursor.close()
@@ -84,6 +106,7 @@ class TestDatabaseOperations(unittest.TestCase):
             # 清空测试表数据
             truncate_table_sql = "TRUNCATE TABLE test_users"
             cursor.execute(truncate_table_sql)
+            cursor.execute("TRUNCATE TABLE test_unique_users")
             
             connection.commit()
             cursor.close()
@@ -173,6 +196,156 @@ class TestDatabaseOperations(unittest.TestCase):
         self.assertEqual(len(results), 1)
         self.assertEqual(results[0]['age'], 25)
 
+    def test_batch_update_table(self):
+        """测试批量更新合并为CASE WHEN语句后每行得到各自的值"""
+        batch_insert_records('test_users', [
+            {'name': f'用户{i}', 'age': 20, 'email': f'user{i}@example.com'} for i in range(100)
+        ])
+
+        updates = [{'conditions': {'email': f'user{i}@example.com'}, 'updates': {'age': 30 + i % 50, 'name': f'新用户{i}'}}
+                   for i in range(100)]
+        # 多字段条件与列表条件
+        updates.append({'conditions': {'email': ['user0@example.com', 'user1@example.com'], 'name': '新用户0'},
+                        'updates': {'age': 99}})
+
+        affected_rows = batch_update_table('test_users', updates, chunk_size=30)
+        self.assertEqual(affected_rows, 101)
+
+        results = {r['email']: r for r in query_table('test_users', {}, limit=None)}
+        self.assertEqual(results['user0@example.com']['age'], 99)
+        self.assertEqual(results['user1@example.com']['age'], 31)
+        self.assertEqual(results['user57@example.com']['age'], 37)
+        self.assertEqual(results['user57@example.com']['name'], '新用户57')
+
+    def test_claim_table_rows(self):
+        """测试认领记录互不重叠，释放或租约过期后可被重新认领"""
+        batch_insert_records('test_users', [
+            {'name': f'用户{i}', 'age': 20, 'email': f'user{i}@example.com'} for i in range(25)
+        ])
+
+        token1, rows1 = claim_table_rows('test_users', {'age': 20}, limit=10)
+        token2, rows2 = claim_table_rows('test_users', {'age': 20}, limit=10)
+        token3, rows3 = claim_table_rows('test_users', {'age': 20}, limit=10)
+
+        self.assertEqual((len(rows1), len(rows2), len(rows3)), (10, 10, 5))
+        ids = [r['id'] for r in rows1 + rows2 + rows3]
+        self.assertEqual(len(set(ids)), 25)
+        self.assertEqual(claim_table_rows('test_users', {'age': 20})[1], [])
+
+        # 释放部分记录后可立即重新认领
+        self.assertEqual(release_claim('test_users', token1, [rows1[0]['id'], rows1[1]['id']]), 2)
+        _, rows = claim_table_rows('test_users', {'age': 20})
+        self.assertEqual(sorted(r['id'] for r in rows), sorted([rows1[0]['id'], rows1[1]['id']]))
+
+        # 租约过期的记录会被重新认领
+        update_table('test_users', {'claim_token': token2}, {'lease_expires_at': '2000-01-01 00:00:00'})
+        _, rows = claim_table_rows('test_users', {'age': 20}, limit=20)
+        self.assertEqual(sorted(r['id'] for r in rows), sorted(r['id'] for r in rows2))
+
+    def test_query_table_page(self):
+        """测试按 id 键集分页：逐页读取不重复、不遗漏，逐块迭代得到全部记录"""
+        batch_insert_records('test_users', [
+            {'name': f'用户{i}', 'age': 20 + i % 2, 'email': f'user{i}@example.com'} for i in range(25)
+        ])
+
+        pages = []
+        after_id = None
+        while True:
+            rows = query_table_page('test_users', {'age': 20}, after_id=after_id, limit=5)
+            if not rows:
+                break
+            pages.append(rows)
+            after_id = rows[-1]['id']
+
+        self.assertEqual([len(rows) for rows in pages], [5, 5, 3])
+        ids = [row['id'] for rows in pages for row in rows]
+        self.assertEqual(ids, sorted(set(ids)))
+        self.assertEqual(count_table('test_users', {'age': 20}), 13)
+
+        chunks = list(iter_table_rows('test_users', {}, chunk_size=10))
+        self.assertEqual([len(rows) for rows in chunks], [10, 10, 5])
+
+    def test_bulk_insert_records_counts(self):
+        """测试批量插入从迭代器读取数据，并统计插入与重复忽略的行数"""
+        insert_record('test_unique_users', {'name': '张三', 'age': 25, 'email': 'user0@example.com'})
+
+        records = ({'name': f'用户{i}', 'age': i % 80, 'email': f'user{i}@example.com'} for i in range(1000))
+        result = bulk_insert_records('test_unique_users', records)
+
+        self.assertEqual(result['rows'], 1000)
+        self.assertEqual(result['inserted'], 999)
+        self.assertEqual(result['ignored'], 1)
+        self.assertGreaterEqual(result['statements'], 1)
+        self.assertEqual(len(query_table('test_unique_users', {}, limit=None)), 1000)
+
+    def test_bulk_insert_records_groups(self):
+        """测试按分组统计实际插入数，重复记录不计入其分组"""
+        insert_record('test_unique_users', {'name': '张三', 'age': 20, 'email': 'user0@example.com'})
+
+        records = [{'name': f'用户{i}', 'age': 20 if i < 3 else 30, 'email': f'user{i}@example.com'} for i in range(5)]
+        result = bulk_insert_records('test_unique_users', records, group_key=lambda record: record['age'])
+
+        self.assertEqual(result['groups'], {20: 2, 30: 2})
+        self.assertEqual(result['statements'], 2)
+
+    def test_bulk_insert_many_rows(self):
+        """测试大量记录通过多行INSERT全部写入"""
+        n_rows = 5000
+        rows = [{'name': f'用户{i}', 'age': i % 80, 'email': f'bench{i}@example.com'} for i in range(n_rows)]
+
+        result = bulk_insert_records('test_users', iter(rows))
+
+        self.assertEqual(result['inserted'], n_rows)
+        self.assertLess(result['statements'], n_rows)
+        self.assertEqual(count_table('test_users', {}), n_rows)
+
+    @unittest.skipUnless(os.environ.get("BRAIN_LIT_BENCHMARK"), "设置环境变量 BRAIN_LIT_BENCHMARK=1 时运行")
+    def test_bulk_insert_benchmark(self):
+        """对比逐行INSERT(原 batch_insert_records 的实现方式)与多行INSERT写入相同记录的耗时，只记录结果不断言"""
+        n_rows = 5000
+        rows = [{'name': f'用户{i}', 'age': i % 80, 'email': f'bench{i}@example.com'} for i in range(n_rows)]
+
+        time_start = time.time()
+        with db_connection() as connection:
+            cursor = connection.cursor()
+            query = "INSERT IGNORE INTO test_users (name, age, email) VALUES (%s, %s, %s)"
+            for row in rows:
+                cursor.execute(query, [row['name'], row['age'], row['email']])
+            connection.commit()
+            cursor.close()
+        row_at_a_time_seconds = time.time() - time_start
+
+        self.setUp()
+
+        time_start = time.time()
+        result = bulk_insert_records('test_users', iter(rows))
+        bulk_seconds = time.time() - time_start
+
+        logger.info("Insert %s rows: row-at-a-time %.2fs, bulk %.2fs (%s statements)",
+                    n_rows, row_at_a_time_seconds, bulk_seconds, result['statements'])
+
+    def test_connection_pool_reuse(self):
+        """测试连接池复用连接，连续查询不会重复创建连接"""
+        query_table('test_users', {})
+        creates_before = get_pool_stats()['creates']
+
+        for _ in range(10):
+            query_table('test_users', {})
+
+        stats = get_pool_stats()
+        self.assertEqual(stats['creates'], creates_before)
+        self.assertGreaterEqual(stats['checkouts'], 11)
+        self.assertEqual(stats['in_use'], 0)
+
+        # 上下文管理器退出后连接归还连接池
+        with db_connection() as connection:
+            self.assertEqual(get_pool_stats()['in_use'], 1)
+            cursor = connection.cursor()
+            cursor.execute("SELECT 1")
+            self.assertEqual(cursor.fetchall(), [(1,)])
+            cursor.close()
+        self.assertEqual(get_pool_stats()['in_use'], 0)
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
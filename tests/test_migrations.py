@@ -0,0 +1,109 @@
+import unittest
+
+from svc.database import db_connection, bulk_insert_records
+from svc.migrations import ALPHA_TABLE_MIGRATIONS, SCHEMA_MIGRATIONS_TABLE, apply_migrations, \
+    ensure_migrations_table, explain_hot_queries, get_applied_versions, is_full_scan
+
+TEST_TABLE = "test_migration_alphas"
+
+
+class TestMigrations(unittest.TestCase):
+    """测试回测记录表迁移，并用 EXPLAIN 检查热点查询没有退化为全表扫描"""
+
+    @classmethod
+    def setUpClass(cls):
+        """按迁移前的表结构(只有主键与唯一键)创建测试表并写入数据，再执行全部迁移"""
+        with db_connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(f"DROP TABLE IF EXISTS {TEST_TABLE}")
+            ensure_migrations_table(cursor)
+            cursor.execute(f"DELETE FROM {SCHEMA_MIGRATIONS_TABLE} WHERE table_name = %s", (TEST_TABLE,))
+            cursor.execute(
+                f"""
+                CREATE TABLE {TEST_TABLE} (
+                    id int(11) NOT NULL AUTO_INCREMENT,
+                    region varchar(3) DEFAULT NULL,
+                    universe varchar(32) DEFAULT NULL,
+                    delay tinyint(4) DEFAULT NULL,
+                    alpha varchar(512) DEFAULT NULL,
+                    decay int(11) DEFAULT NULL,
+                    neutralization varchar(32) DEFAULT NULL,
+                    phase int(11) DEFAULT NULL,
+                    simulated tinyint(4) DEFAULT 0,
+                    simulate_id varchar(32) DEFAULT NULL,
+                    sharp float DEFAULT NULL,
+                    fitness float DEFAULT NULL,
+                    passed tinyint(4) DEFAULT NULL,
+                    alpha_id varchar(32) DEFAULT NULL,
+                    category varchar(32) DEFAULT NULL,
+                    dataset varchar(32) DEFAULT NULL,
+                    submitted tinyint(1) DEFAULT '0',
+                    template varchar(32) DEFAULT NULL,
+                    PRIMARY KEY (id),
+                    UNIQUE KEY idx_unique_fields (region, delay, universe, neutralization, decay, alpha)
+                )
+                """
+            )
+            connection.commit()
+            cursor.close()
+
+        universes = ["TOP3000", "TOP1000", "TOP500", "TOP200"]
+        datasets = [f"dataset{i}" for i in range(20)]
+        records = [{
+            'region': 'USA', 'universe': universes[i % 4], 'delay': i % 2, 'alpha': f"rank(close_{i})", 'decay': 4,
+            'neutralization': 'SUBINDUSTRY', 'phase': 1 + i % 3, 'simulated': 1 if i % 5 else 0,
+            'simulate_id': f"sim{i}", 'sharp': (i % 30) / 10, 'fitness': (i % 20) / 10, 'passed': i % 3 - 1,
+            'alpha_id': f"alpha{i}", 'category': f"category{i % 10}", 'dataset': datasets[i % 20],
+            'submitted': 1 if i % 50 == 0 else 0, 'template': 'ts_basic',
+        } for i in range(5000)]
+        bulk_insert_records(TEST_TABLE, records)
+
+        cls.executed = apply_migrations(TEST_TABLE)
+
+        with db_connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(f"ANALYZE TABLE {TEST_TABLE}")
+            cursor.fetchall()
+            cursor.close()
+
+    @classmethod
+    def tearDownClass(cls):
+        with db_connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(f"DROP TABLE IF EXISTS {TEST_TABLE}")
+            cursor.execute(f"DELETE FROM {SCHEMA_MIGRATIONS_TABLE} WHERE table_name = %s", (TEST_TABLE,))
+            connection.commit()
+            cursor.close()
+
+    def test_all_migrations_applied(self):
+        """全部迁移按版本执行，再次执行时没有待执行的迁移"""
+        versions = [version for version, _, _ in ALPHA_TABLE_MIGRATIONS]
+        self.assertEqual(self.executed, versions)
+        self.assertEqual(get_applied_versions(TEST_TABLE), versions)
+        self.assertEqual(apply_migrations(TEST_TABLE), [])
+
+    def test_score_generated_column(self):
+        """score 生成列等于 abs(sharp*fitness)"""
+        with db_connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(f"SELECT COUNT(*) FROM {TEST_TABLE} WHERE ABS(score - ABS(sharp * fitness)) > 1e-4")
+            (mismatched,) = cursor.fetchone()
+            cursor.close()
+        self.assertEqual(mismatched, 0)
+
+    def test_hot_queries_use_indexes(self):
+        """热点查询不能退化为全表扫描"""
+        for name, plan in explain_hot_queries(TEST_TABLE).items():
+            with self.subTest(query=name):
+                self.assertFalse(is_full_scan(plan), f"{name} 全表扫描: {plan}")
+
+    def test_is_full_scan(self):
+        """识别 MySQL 与 OceanBase 的全表扫描执行计划"""
+        self.assertTrue(is_full_scan([{'table': 'usa_alphas', 'type': 'ALL', 'key': None}]))
+        self.assertFalse(is_full_scan([{'table': 'usa_alphas', 'type': 'ref', 'key': 'idx_simulate_id'}]))
+        self.assertTrue(is_full_scan([{'Query Plan': '|0 |TABLE FULL SCAN|usa_alphas|1000 |'}]))
+        self.assertFalse(is_full_scan([{'Query Plan': '|0 |TABLE RANGE SCAN|usa_alphas(idx_simulate_id)|1 |'}]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import asyncio
+import time
+import unittest
+
+from svc.poll_scheduler import PollScheduler
+
+
+class TestPollScheduler(unittest.TestCase):
+    """测试按截止时间调度的进度查询"""
+
+    def test_polls_at_deadline_in_batches(self):
+        polled = []
+
+        def poll(key):
+            polled.append((key, time.monotonic()))
+            return key.upper()
+
+        async def main():
+            scheduler = PollScheduler(poll, tick=0.05)
+            runner = asyncio.create_task(scheduler.run())
+            start = time.monotonic()
+            results = await asyncio.gather(
+                scheduler.poll("a", 0.2),
+                scheduler.poll("b", 0.22),
+                scheduler.poll("c", 0),
+            )
+            runner.cancel()
+            return start, results, scheduler.snapshot()
+
+        start, results, stats = asyncio.run(main())
+
+        self.assertEqual(results, ["A", "B", "C"])
+        self.assertEqual(polled[0][0], "c")
+        self.assertEqual({key for key, _ in polled[1:]}, {"a", "b"})
+        # a 与 b 的截止时间在同一个 tick 内，合并为一批
+        self.assertEqual(stats["batches"], 2)
+        self.assertGreaterEqual(polled[1][1] - start, 0.19)
+        self.assertEqual(stats["pending"], 0)
+
+    def test_max_batch_bounds_in_flight_polls(self):
+        active = []
+        peak = []
+
+        def poll(key):
+            active.append(key)
+            peak.append(len(active))
+            time.sleep(0.05)
+            active.remove(key)
+            return key
+
+        async def main():
+            scheduler = PollScheduler(poll, tick=0.01, max_batch=2)
+            runner = asyncio.create_task(scheduler.run())
+            first = [scheduler.poll(i) for i in range(2)]
+            await asyncio.sleep(0.02)
+            # 第一批仍在进行中，之后到期的查询要等其完成后才发送
+            results = await asyncio.gather(*first, *(scheduler.poll(i) for i in range(2, 5)))
+            runner.cancel()
+            return results, scheduler.snapshot()
+
+        results, stats = asyncio.run(main())
+
+        self.assertEqual(results, list(range(5)))
+        self.assertLessEqual(max(peak), 2)
+        self.assertEqual((stats["polls"], stats["in_flight"]), (5, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
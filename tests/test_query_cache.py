@@ -0,0 +1,42 @@
+import unittest
+
+from svc.query_cache import QueryCache, normalize_params
+
+
+class TestQueryCache(unittest.TestCase):
+    """测试查询结果缓存的键规范化、过期、按表失效与命中统计"""
+
+    def test_normalize_params(self):
+        self.assertEqual(normalize_params({'region': 'USA', 'dataset_ids': ['a', 'b']}),
+                         normalize_params({'dataset_ids': ('a', 'b'), 'region': 'USA'}))
+        self.assertNotEqual(normalize_params({'region': 'USA'}), normalize_params({'region': 'ASI'}))
+
+    def test_hit_miss_and_invalidate(self):
+        cache = QueryCache(ttl=60, max_entries=10)
+        cache.put(('q', 1), 'usa_alphas', [{'id': 1}])
+        cache.put(('q', 2), 'asi_alphas', [{'id': 2}])
+
+        self.assertEqual(cache.get(('q', 1)), [{'id': 1}])
+        self.assertIsNone(cache.get(('q', 3)))
+
+        self.assertEqual(cache.invalidate('usa_alphas'), 1)
+        self.assertIsNone(cache.get(('q', 1)))
+        self.assertEqual(cache.get(('q', 2)), [{'id': 2}])
+
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['invalidations'], stats['entries']), (2, 2, 1, 1))
+
+    def test_ttl_and_eviction(self):
+        cache = QueryCache(ttl=-1, max_entries=10)
+        cache.put(('q', 1), 'usa_alphas', [{'id': 1}])
+        self.assertIsNone(cache.get(('q', 1)))
+
+        cache = QueryCache(ttl=60, max_entries=2)
+        for i in range(3):
+            cache.put(('q', i), 'usa_alphas', [{'id': i}])
+        self.assertIsNone(cache.get(('q', 0)))
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+import time
+import unittest
+
+from svc.rate_limit import TokenBucket, RateLimiter, get_endpoint_family
+
+
+class TestRateLimit(unittest.TestCase):
+    """测试按接口族的令牌桶限速"""
+
+    def test_endpoint_family(self):
+        self.assertEqual(get_endpoint_family("https://api.worldquantbrain.com/simulations/abc"), "simulations")
+        self.assertEqual(get_endpoint_family("https://api.worldquantbrain.com/alphas/abc/check"), "alphas")
+        self.assertEqual(get_endpoint_family("https://api.worldquantbrain.com/users/self/alphas?limit=100"), "alphas")
+        self.assertEqual(get_endpoint_family("https://api.worldquantbrain.com/data-fields/close"), "data-fields")
+        self.assertEqual(get_endpoint_family("https://api.worldquantbrain.com/authentication"), "default")
+
+    def test_bucket_allows_burst_then_waits(self):
+        bucket = TokenBucket(rate=10, capacity=2)
+        self.assertEqual(bucket.reserve(), 0)
+        self.assertEqual(bucket.reserve(), 0)
+        self.assertAlmostEqual(bucket.reserve(), 0.1, delta=0.02)
+
+    def test_throttle_blocks_family_only(self):
+        limiter = RateLimiter({"alphas": {"rate": 100, "capacity": 10}})
+        limiter.on_throttled("https://api.worldquantbrain.com/alphas/abc/check", 0.2)
+
+        start = time.monotonic()
+        limiter.acquire("https://api.worldquantbrain.com/simulations/abc")
+        self.assertLess(time.monotonic() - start, 0.05)
+
+        limiter.acquire("https://api.worldquantbrain.com/alphas/abc/check")
+        self.assertGreaterEqual(time.monotonic() - start, 0.15)
+        self.assertEqual(limiter.snapshot()["alphas"]["throttles"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
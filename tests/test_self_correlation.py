@@ -0,0 +1,42 @@
+import unittest
+
+import numpy as np
+
+from svc.self_correlation import parse_pnl_records, build_return_matrix, align_to_axis, correlations, daily_returns
+
+
+class TestSelfCorrelation(unittest.TestCase):
+    """测试本地自相关性估算"""
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.dates = np.arange(20200101, 20200101 + 200, dtype=np.int32)
+        self.base = rng.normal(size=200).cumsum().astype(np.float32)
+        self.other = rng.normal(size=200).cumsum().astype(np.float32)
+
+    def test_parse_pnl_records(self):
+        data = {
+            "schema": {"properties": [{"name": "date"}, {"name": "pnl"}]},
+            "records": [["2020-01-03", 2.0], ["2020-01-02", 1.0]],
+        }
+        dates, pnl = parse_pnl_records(data)
+        self.assertEqual(dates.tolist(), [20200102, 20200103])
+        self.assertEqual(pnl.dtype, np.float32)
+        self.assertEqual(pnl.tolist(), [1.0, 2.0])
+
+    def test_correlations(self):
+        axis, matrix = build_return_matrix([(self.dates, self.base), (self.dates, self.other)])
+        dates, values = daily_returns((self.dates, self.base * 2))
+        corr = correlations(matrix, align_to_axis(axis, dates, values))
+        self.assertAlmostEqual(corr[0], 1.0, places=5)
+        self.assertLess(abs(corr[1]), 0.5)
+
+    def test_insufficient_overlap(self):
+        axis, matrix = build_return_matrix([(self.dates[:30], self.base[:30])])
+        dates, values = daily_returns((self.dates, self.base))
+        corr = correlations(matrix, align_to_axis(axis, dates, values))
+        self.assertTrue(np.isnan(corr[0]))
+
+
+if __name__ == '__main__':
+    unittest.main()
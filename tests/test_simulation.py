@@ -2,10 +2,12 @@ import time
 import unittest
 from typing import DefaultDict
 
+from svc.account_pool import Account, AccountPool
 from svc.auth import AutoLoginSession
+from svc.concurrency import AIMDController
 from svc.logger import setup_logger
 from svc.simulate import get_unsimulated_records, check_progress, \
-    submit_simulation_task, check_simulate_task
+    submit_simulation_task, check_simulate_task, submit_one_batch
 
 logger = setup_logger(__name__)
 
@@ -14,6 +16,37 @@ class TestMain(unittest.TestCase):
         # 添加测试代码
         self.assertEqual(1, 1)
 
+    def test_submit_one_batch_releases_slot_on_error(self):
+        """提交回测时网络异常不会一直占用并发槽位"""
+        class FailingSession:
+            def post(self, *args, **kwargs):
+                raise ConnectionError("connection reset by peer")
+
+        controller = AIMDController(initial_window=1, max_window=1)
+        simulate_info = {'simulate_ids': {}, 'n_tasks_max': 1, 'query': {'region': 'USA'}}
+
+        for _ in range(3):
+            self.assertIsNone(submit_one_batch([1], FailingSession(), [{}], simulate_info, 'usa_alphas', controller))
+        self.assertEqual(controller.in_flight, 0)
+        self.assertTrue(controller.has_capacity())
+
+    def test_failed_submit_keeps_account_available(self):
+        """账号提交回测时网络异常，该账号的并发槽位被归还，账号池仍可选择该账号"""
+        class FailingSession:
+            def post(self, *args, **kwargs):
+                raise TimeoutError("read timed out")
+
+        pool = AccountPool([Account("second@example.com", FailingSession(), max_concurrency=2)])
+        simulate_info = {'simulate_ids': {}, 'n_tasks_max': 2, 'query': {'region': 'USA'}}
+
+        for _ in range(5):
+            account = pool.select()
+            self.assertIsNotNone(account)
+            self.assertIsNone(submit_one_batch([1], account.session, [{}], simulate_info, 'usa_alphas',
+                                               account.controller, account=account.name))
+        self.assertEqual(pool.in_flight, 0)
+        self.assertTrue(pool.has_capacity())
+
     def test_get_unsimulated_records(self):
         query = {
             'region': 'JPN',
@@ -0,0 +1,20 @@
+import unittest
+
+from svc.simulation_cache import normalize_expression, simulation_cache_key
+
+
+class TestSimulationCache(unittest.TestCase):
+    """测试回测结果缓存键"""
+
+    def test_normalize_expression(self):
+        self.assertEqual(normalize_expression(" rank( close ) ;\n"), "rank(close)")
+
+    def test_cache_key_ignores_formatting(self):
+        key = simulation_cache_key("rank(close)", "USA", "TOP3000", 1, 6, "SUBINDUSTRY")
+        self.assertEqual(key, simulation_cache_key("rank( close );", "USA", "TOP3000", "1", 6, "SUBINDUSTRY", 0.01))
+        self.assertNotEqual(key, simulation_cache_key("rank(close)", "USA", "TOP3000", 1, 6, "INDUSTRY"))
+        self.assertNotEqual(key, simulation_cache_key("rank(close)", "USA", "TOP3000", 1, 4, "SUBINDUSTRY"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+
+from worker import sync_simulate_status
+
+
+class StubSimulateTaskManager:
+    """只提供 worker 读取进度所用接口的回测任务管理器"""
+
+    def __init__(self, simulate_tasks):
+        self.simulate_tasks = simulate_tasks
+
+    def status(self):
+        return {
+            "concurrency": {"window": 10, "in_flight": 2, "accounts": {}},
+            "poller": {},
+            "tasks": self.simulate_tasks,
+        }
+
+
+class TestWorker(unittest.TestCase):
+    """测试 worker 回测任务的进度同步"""
+
+    def test_sync_simulate_status(self):
+        manager = StubSimulateTaskManager({'USA_1': {'n_tasks': 2, 'simulate_ids': {'s1': {}, 's2': {}}}})
+        status = {}
+
+        self.assertTrue(sync_simulate_status(manager, 'USA_1', status))
+        self.assertEqual(status['n_tasks'], 2)
+        self.assertEqual(status['simulate_ids'], ['s1', 's2'])
+        self.assertEqual(status['concurrency']['in_flight'], 2)
+
+    def test_sync_finished_task(self):
+        status = {}
+        self.assertFalse(sync_simulate_status(StubSimulateTaskManager({}), 'USA_1', status))
+        self.assertEqual(status['status'], "COMPLETED")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,197 @@
+import argparse
+import multiprocessing
+import signal
+import time
+from typing import Any, Dict
+
+from svc.logger import setup_logger
+from svc.pipeline import STAGES, run_stage_worker
+
+# 设置logger
+logger = setup_logger(__name__)
+
+# simulate 任务同步进度的间隔秒数
+SIMULATE_STATUS_INTERVAL = 5
+
+
+def run_generate_job(payload: Dict[str, Any], status: Dict[str, Any]):
+    """
+    生成高一阶Alpha并入库
+
+    payload: {"region", "delay", "target_level": "2"/"3", "phase"}
+    """
+    from gen.phase2_gen import get_phase1_alphas
+    from gen.phase3_gen import get_phase2_alphas
+    from gen.utils import build_next_level_records
+    from svc.database import bulk_insert_records, update_table
+    from svc.simulation_stats import refresh_simulation_stats, stats_group_key
+
+    region = payload.get('region') or 'all'
+    target_level = str(payload.get('target_level', '2'))
+    query = get_phase1_alphas if target_level == "2" else get_phase2_alphas
+    records = query(region, delay=payload.get('delay', 1))
+    if not records:
+        status.update({"status": "COMPLETED", "details": "没有可用于生成的Alpha"})
+        return
+
+    new_records = build_next_level_records(records, target_level, region, payload.get('phase', 9))
+
+    table_name = f"{region.lower()}_alphas"
+    result = bulk_insert_records(table_name, new_records, group_key=stats_group_key)
+    refresh_simulation_stats(table_name, result.pop('groups'))
+    update_table(table_name, {'id': [r['id'] for r in records]}, {"used": int(target_level)})
+
+    status.update({
+        "status": "COMPLETED",
+        "details": f"新增 {result['inserted']} 条，重复忽略 {result['ignored']} 条",
+        **result,
+    })
+
+
+def run_simulate_job(payload: Dict[str, Any], status: Dict[str, Any]):
+    """
+    持续回测满足条件的Alpha，直到页面发送停止指令
+
+    payload: {"query", "n_tasks_max", "batch_size"}
+    worker 退出时直接返回，进行中的回测由回测日志在下次启动时接管
+    """
+    from svc.simulate import get_simulate_task_manager, get_task_id
+
+    query = payload['query']
+    task_id = get_task_id(query)
+    manager = get_simulate_task_manager()
+    manager.start_simulate(query, payload.get('n_tasks_max', 10), batch_size=payload.get('batch_size', 10))
+
+    stop_sent = False
+    while True:
+        time.sleep(SIMULATE_STATUS_INTERVAL)
+        if not sync_simulate_status(manager, task_id, status):
+            return
+
+        if status.get('shutdown'):
+            return
+        if status.get('stop') and not stop_sent:
+            # 停止提交新回测，等待进行中的回测完成并保存结果
+            manager.stop_simulate(query)
+            status['details'] = "Stopping, waiting for running simulations..."
+            stop_sent = True
+
+
+def sync_simulate_status(manager, task_id: str, status: Dict[str, Any]) -> bool:
+    """
+    将回测任务的进度与并发窗口同步到任务状态
+
+    Returns:
+        任务是否仍在运行，已结束时将任务状态设为COMPLETED并返回False
+    """
+    task_info = manager.simulate_tasks.get(task_id)
+    if task_info is None:
+        status.update({"status": "COMPLETED", "details": "Simulate task is completed"})
+        return False
+
+    status.update({
+        "n_tasks": task_info.get('n_tasks'),
+        "simulate_ids": list(task_info.get('simulate_ids', {})),
+        "concurrency": manager.status()["concurrency"],
+    })
+    return True
+
+
+def run_check_job(payload: Dict[str, Any], status: Dict[str, Any]):
+    """
+    检查满足条件的Alpha
+
+    payload: 与检查页面相同的查询参数 {"region", "universe", "delay", "phase_value", "chosen_category", "sharp_val", "fitness_val"}，
+        可选 "max_workers" 指定同时进行的检查数，"after" 为页面当前页的起始位置 (rank_score, id)
+    """
+    from svc.alpha_query import query_checkable_alpha_details
+    from svc.check import check_one_batch, CHECK_WORKERS
+
+    records = query_checkable_alpha_details(
+        payload.get('region'), payload.get('universe'), payload.get('delay'), payload.get('phase_value'),
+        payload.get('chosen_category'), payload.get('sharp_val', 1.0), payload.get('fitness_val', 0.8),
+        after=payload.get('after')
+    )
+    status['query'] = payload
+    check_one_batch(records, status, max_workers=int(payload.get('max_workers') or CHECK_WORKERS))
+
+
+def run_submit_job(payload: Dict[str, Any], status: Dict[str, Any]):
+    """
+    提交选中的Alpha
+
+    payload: {"records", "max_submit_count", "region"}
+    """
+    from svc.submit import submit_task
+
+    status.update({
+        "region": payload.get('region'),
+        "submitted_count": 0,
+        "max_submit_count": payload.get('max_submit_count', 4),
+    })
+    submit_task(payload.get('records', []), status)
+
+
+STAGE_RUNNERS = {
+    "generate": run_generate_job,
+    "simulate": run_simulate_job,
+    "check": run_check_job,
+    "submit": run_submit_job,
+}
+
+
+def stage_process(stage: str, index: int, shutdown, poll_interval: float):
+    """worker 子进程入口：忽略 Ctrl+C，由主进程通过 shutdown 事件统一停止"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda signum, frame: shutdown.set())
+    run_stage_worker(stage, STAGE_RUNNERS[stage], shutdown, poll_interval, worker=f"{stage}-{index}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="brain-lit 流水线 worker，独立于Streamlit执行 生成→回测→检查→提交 任务")
+    parser.add_argument("--stages", default=",".join(STAGES),
+                        help=f"要运行的阶段，逗号分隔，默认: {','.join(STAGES)}")
+    for stage in STAGES:
+        parser.add_argument(f"--{stage}-workers", type=int, default=1, help=f"{stage} 阶段的并行进程数")
+    parser.add_argument("--poll-interval", type=float, default=5, help="没有待执行任务时的轮询间隔秒数")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    stages = [stage.strip() for stage in args.stages.split(",") if stage.strip()]
+    unknown = [stage for stage in stages if stage not in STAGES]
+    if unknown:
+        raise SystemExit(f"未知的阶段: {unknown}")
+
+    # spawn 方式启动子进程，避免 fork 时复制父进程的数据库连接与会话
+    ctx = multiprocessing.get_context("spawn")
+    shutdown = ctx.Event()
+    processes = []
+
+    for stage in stages:
+        for index in range(getattr(args, f"{stage}_workers")):
+            process = ctx.Process(target=stage_process, args=(stage, index, shutdown, args.poll_interval),
+                                  name=f"brain-lit-{stage}-{index}")
+            process.start()
+            processes.append(process)
+
+    logger.info("Pipeline worker is started with %s processes: %s", len(processes), [p.name for p in processes])
+
+    def handle_signal(signum, frame):
+        logger.info("Received signal %s, shutting down workers...", signum)
+        shutdown.set()
+
+    signal.signal(signal.SIGINT, handle_signal)
+    signal.signal(signal.SIGTERM, handle_signal)
+
+    # 等待子进程完成当前任务后退出
+    for process in processes:
+        while process.is_alive():
+            process.join(1)
+
+    logger.info("Pipeline worker is stopped.")
+
+
+if __name__ == "__main__":
+    main()